@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 from passlib.context import CryptContext
 
@@ -13,7 +13,8 @@ from app.models.user import (
     UserProfileRead,
     UserProfileUpdate,
 )
-from app.models.system import SystemDefault
+from app.db.query_stats import statement_stats
+from app.services.settingsCache import settings_cache
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -123,11 +124,7 @@ def get_public_profile(user_id: int, db: Session = Depends(get_db)) -> UserProfi
 
     # 如果头像为空，从系统默认设置获取
     if not profile.avatar:
-        default_avatar_query = select(SystemDefault).where(
-            SystemDefault.category == "user",
-            SystemDefault.key_name == "default_avatar"
-        )
-        default_avatar_record = db.exec(default_avatar_query).first()
+        default_avatar_record = settings_cache.get_default("user", "default_avatar")
         if default_avatar_record:
             profile.avatar = default_avatar_record.key_value
         else:
@@ -174,3 +171,25 @@ def update_my_profile(
     db.commit()
     db.refresh(profile)
     return profile
+
+
+# ========== SQL 查询统计 ==========
+@router.get("/sql-stats")
+def get_sql_stats(
+    limit: int = Query(20, ge=1, le=200, description="返回的语句条数"),
+    order_by: str = Query("total_time", pattern="^(total_time|count|max_time)$", description="排序字段"),
+    _: UserRead = Depends(get_current_admin),
+) -> dict:
+    """获取本进程按累计耗时排序的SQL语句统计和最近的慢请求（需要管理员权限）"""
+    return {
+        "statements": statement_stats.top(limit, order_by),
+        "slow_requests": list(statement_stats.slow_requests),
+        "dropped_statements": statement_stats.dropped,
+    }
+
+
+@router.delete("/sql-stats")
+def reset_sql_stats(_: UserRead = Depends(get_current_admin)) -> dict:
+    """清空本进程的SQL语句统计（需要管理员权限）"""
+    statement_stats.reset()
+    return {"message": "SQL统计已清空"}
@@ -10,7 +10,6 @@ from fastapi import (
 )
 from sqlmodel import Session, select, func, and_, or_
 import os
-import uuid
 from datetime import datetime
 
 from app.api.routers.auth import get_current_admin, get_current_user
@@ -24,6 +23,9 @@ from app.models.attachment import (
     AttachmentStatus,
 )
 from app.models.user import UserRead
+from app.services.blobStore import release_blob, unlink_released
+from app.services.imageDerivatives import image_derivatives, probe_dimensions
+from app.services.uploadStorage import save_upload_blob_sync
 
 router = APIRouter(prefix="/attachments", tags=["attachments"])
 
@@ -151,35 +153,16 @@ def get_attachment(
     return AttachmentRead.model_validate(attachment)
 
 
-@router.post("/upload", response_model=AttachmentRead)
-def upload_attachment(
-    file: UploadFile = File(...),
-    title: Optional[str] = Form(None),
-    description: Optional[str] = Form(None),
-    tags: Optional[str] = Form(None),
-    is_public: bool = Form(True),
-    is_featured: bool = Form(False),
-    related_type: Optional[str] = Form(None),
-    related_id: Optional[int] = Form(None),
-    current_user: UserRead = Depends(get_current_user),
-    db: Session = Depends(get_db)
-) -> AttachmentRead:
-    """上传附件"""
-    print(f"接收到的表单数据: title={title}, description={description}, "
-          f"tags={tags}")  # 调试信息
-    # 生成唯一文件名
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-
-    # 确定文件分类
+def classify_upload(content_type: Optional[str]):
+    """根据 MIME 类型确定文件分类和存储目录"""
     file_category = FileCategory.OTHER
-    if file.content_type and file.content_type.startswith('image/'):
+    if content_type and content_type.startswith('image/'):
         file_category = FileCategory.IMAGE
-    elif file.content_type and file.content_type.startswith('video/'):
+    elif content_type and content_type.startswith('video/'):
         file_category = FileCategory.VIDEO
-    elif file.content_type and file.content_type.startswith('audio/'):
+    elif content_type and content_type.startswith('audio/'):
         file_category = FileCategory.AUDIO
-    elif file.content_type and file.content_type in [
+    elif content_type and content_type in [
         'application/pdf',
         'application/msword',
         'application/vnd.openxmlformats-officedocument.'
@@ -200,39 +183,50 @@ def upload_attachment(
     else:
         upload_dir = "uploads/others"
 
-    # 确保目录存在
-    os.makedirs(upload_dir, exist_ok=True)
+    return file_category, upload_dir
+
+
+def create_attachment_record(
+    db: Session,
+    *,
+    file_path: str,
+    original_name: str,
+    content_type: Optional[str],
+    file_category: FileCategory,
+    file_size: int,
+    uploaded_by: int,
+    title: Optional[str] = None,
+    description: Optional[str] = None,
+    tags: Optional[str] = None,
+    is_public: bool = True,
+    is_featured: bool = False,
+    related_type: Optional[str] = None,
+    related_id: Optional[int] = None,
+    blob_sha256: Optional[str] = None,
+    commit: bool = True,
+) -> AttachmentRead:
+    """为已保存到磁盘的文件创建附件记录（内容存储的引用随记录一起提交）
 
-    file_path = os.path.join(upload_dir, unique_filename)
+    commit=False 时只 flush，由调用方提交事务。
+    """
+    unique_filename = os.path.basename(file_path)
+    file_extension = os.path.splitext(unique_filename)[1].lower()
     file_url = f"/{file_path}"
 
-    # 保存文件
-    with open(file_path, "wb") as buffer:
-        content = file.file.read()
-        buffer.write(content)
-
-    # 获取文件大小
-    file_size = len(content)
-
-    # 如果是图片，获取尺寸信息
-    width = None
-    height = None
+    # 如果是图片，从文件头读取尺寸信息
+    dimensions = None
     if file_category == FileCategory.IMAGE:
-        try:
-            from PIL import Image
-            with Image.open(file_path) as img:
-                width, height = img.size
-        except ImportError:
-            pass  # PIL不可用，跳过尺寸获取
+        dimensions = probe_dimensions(file_path)
+    width, height = dimensions or (None, None)
 
     # 创建附件记录
     attachment_data = AttachmentCreate(
         filename=unique_filename,
-        original_name=file.filename,
+        original_name=original_name,
         file_path=file_path,
         file_url=file_url,
         file_size=file_size,
-        file_type=file.content_type or "application/octet-stream",
+        file_type=content_type or "application/octet-stream",
         file_extension=file_extension,
         file_category=file_category,
         width=width,
@@ -242,19 +236,69 @@ def upload_attachment(
         tags=tags,
         is_public=is_public,
         is_featured=is_featured,
-        uploaded_by=current_user.id,
+        uploaded_by=uploaded_by,
         related_type=related_type,
-        related_id=related_id
+        related_id=related_id,
+        blob_sha256=blob_sha256,
     )
 
     attachment = Attachment.model_validate(attachment_data)
     db.add(attachment)
-    db.commit()
-    db.refresh(attachment)
+    if commit:
+        db.commit()
+        db.refresh(attachment)
+    else:
+        db.flush()
+
+    if dimensions is not None:
+        image_derivatives.pregenerate(file_path, dimensions)
 
     return AttachmentRead.model_validate(attachment)
 
 
+@router.post("/upload", response_model=AttachmentRead)
+def upload_attachment(
+    file: UploadFile = File(...),
+    title: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    is_public: bool = Form(True),
+    is_featured: bool = Form(False),
+    related_type: Optional[str] = Form(None),
+    related_id: Optional[int] = Form(None),
+    current_user: UserRead = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> AttachmentRead:
+    """上传附件"""
+    print(f"接收到的表单数据: title={title}, description={description}, "
+          f"tags={tags}")  # 调试信息
+    file_extension = os.path.splitext(file.filename)[1].lower()
+
+    # 确定文件分类和存储路径
+    file_category, upload_dir = classify_upload(file.content_type)
+
+    # 分块保存到内容存储，相同内容只保留一份
+    stored = save_upload_blob_sync(db, file, upload_dir, file_extension)
+
+    return create_attachment_record(
+        db,
+        file_path=stored.path,
+        original_name=file.filename,
+        content_type=file.content_type,
+        file_category=file_category,
+        file_size=stored.size,
+        uploaded_by=current_user.id,
+        title=title,
+        description=description,
+        tags=tags,
+        is_public=is_public,
+        is_featured=is_featured,
+        related_type=related_type,
+        related_id=related_id,
+        blob_sha256=stored.sha256,
+    )
+
+
 @router.put("/{attachment_id}", response_model=AttachmentRead)
 def update_attachment(
     attachment_id: int,
@@ -322,6 +366,14 @@ def restore_attachment(
     return {"message": "附件恢复成功"}
 
 
+def release_attachment_file(db: Session, attachment: Attachment) -> Optional[str]:
+    """释放附件对文件的引用，返回提交后需要删除的文件路径"""
+    if attachment.blob_sha256:
+        return release_blob(db, attachment.blob_sha256)
+    # 内容存储之前的旧附件独占文件
+    return attachment.file_path
+
+
 @router.delete("/{attachment_id}/hard-delete")
 def hard_delete_attachment(
     attachment_id: int,
@@ -336,18 +388,14 @@ def hard_delete_attachment(
     if attachment.status != AttachmentStatus.DELETED:
         raise HTTPException(status_code=400, detail="只能永久删除已删除的附件")
 
-    # 删除文件
-    try:
-        if attachment.file_path and os.path.exists(attachment.file_path):
-            os.remove(attachment.file_path)
-    except Exception as e:
-        print(f"删除文件失败: {e}")
-        # 继续删除数据库记录，即使文件删除失败
-
-    # 从数据库中删除记录
+    # 释放文件引用，并从数据库中删除记录
+    released_path = release_attachment_file(db, attachment)
     db.delete(attachment)
     db.commit()
 
+    # 删除文件（仅在没有其他附件引用同一内容时）
+    unlink_released(db, [released_path])
+
     return {"message": "附件永久删除成功"}
 
 
@@ -375,21 +423,18 @@ def batch_hard_delete_attachments(
         raise HTTPException(status_code=404, detail="没有找到可删除的附件")
 
     deleted_count = 0
+    released_paths = []
     for attachment in attachments:
-        # 删除文件
-        try:
-            if attachment.file_path and os.path.exists(attachment.file_path):
-                os.remove(attachment.file_path)
-        except Exception as e:
-            print(f"删除文件失败: {e}")
-            # 继续删除数据库记录，即使文件删除失败
-
-        # 从数据库中删除记录
+        # 释放文件引用，并从数据库中删除记录
+        released_paths.append(release_attachment_file(db, attachment))
         db.delete(attachment)
         deleted_count += 1
 
     db.commit()
 
+    # 删除引用归零的文件
+    unlink_released(db, released_paths)
+
     return {"message": f"成功永久删除 {deleted_count} 个附件"}
 
 
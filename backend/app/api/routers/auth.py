@@ -18,7 +18,7 @@ from app.core.security import (
 )
 from app.db.session import get_db
 from app.models.user import User, UserRead, UserProfile
-from app.models.system import SystemDefault
+from app.services.settingsCache import settings_cache
 
 # 创建一个FastAPI路由器，前缀为/auth，标签为auth
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -287,11 +287,7 @@ def get_user_avatar(
     )
 
     # 查询系统默认头像
-    default_avatar_query = select(SystemDefault).where(
-        SystemDefault.category == "user",
-        SystemDefault.key_name == "default_avatar"
-    )
-    default_avatar_record = db.exec(default_avatar_query).first()
+    default_avatar_record = settings_cache.get_default("user", "default_avatar")
     default_avatar_url = (
         default_avatar_record.key_value
         if default_avatar_record
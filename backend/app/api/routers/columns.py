@@ -2,7 +2,7 @@
 专栏管理API路由
 """
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, func, select
@@ -10,6 +10,7 @@ from sqlmodel import Session, func, select
 from app.api.routers.auth import get_current_admin, get_current_user_optional
 from app.db.session import get_session
 from app.models.columns import (
+    ColumnPostsListResponse,
     Columns,
     ColumnsCreate,
     ColumnsListResponse,
@@ -91,11 +92,9 @@ def list_columns(
         offset = (page - 1) * limit
         columns = session.exec(statement.offset(offset).limit(limit)).all()
 
-        # 构建响应数据
-        items = []
-        for column in columns:
-            column_data = get_column_with_details(session, column.id)
-            items.append(column_data)
+        # 构建响应数据（仅包含文章数量等聚合信息，文章列表通过
+        # GET /columns/{column_id}/posts 分页获取）
+        items = load_columns_summary(session, columns)
 
         return ColumnsListResponse(
             items=items,
@@ -144,6 +143,54 @@ def get_column(
     return get_column_with_details(session, column_id)
 
 
+@router.get("/{column_id}/posts", response_model=ColumnPostsListResponse)
+def list_column_posts(
+    *,
+    session: Session = Depends(get_session),
+    column_id: int,
+    page: int = Query(1, ge=1, description="页码"),
+    limit: int = Query(10, ge=1, le=100, description="每页数量"),
+    current_user=Depends(get_current_user_optional)
+):
+    """分页获取专栏中的文章"""
+    column = session.get(Columns, column_id)
+    if not column or column.is_deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="专栏不存在"
+        )
+
+    # 非管理员只能查看可见的专栏
+    if ((not current_user or not getattr(current_user, 'is_admin', False))
+            and not column.is_visible):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="专栏不存在"
+        )
+
+    total = session.exec(
+        select(func.count(PostColumns.id))
+        .join(Post, Post.id == PostColumns.post_id)
+        .where(*_column_post_filters(column_id))
+    ).one()
+
+    offset = (page - 1) * limit
+    posts_query = session.exec(
+        _column_posts_statement(column_id).offset(offset).limit(limit)
+    ).all()
+
+    return ColumnPostsListResponse(
+        items=[
+            _column_post_item(post, post_column)
+            for post, post_column in posts_query
+        ],
+        total=total,
+        page=page,
+        limit=limit,
+        has_more=(page * limit) < total,
+    )
+
+
 @router.put("/{column_id}", response_model=ColumnsRead)
 def update_column(
     *,
@@ -286,48 +333,45 @@ def remove_post_from_column(
     session.commit()
 
 
-def get_column_with_details(session: Session, column_id: int) -> ColumnsRead:
-    """获取包含详细信息的专栏"""
-    # 获取专栏
-    column = session.get(Columns, column_id)
-    if not column:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="专栏不存在"
-        )
+def _column_post_filters(column_id: int) -> list:
+    """专栏文章的筛选条件：属于该专栏、未删除且已发布"""
+    return [
+        PostColumns.column_id == column_id,
+        Post.is_deleted == 0,
+        Post.is_published == 1,
+    ]
 
-    # 获取用户信息
-    user_profile = session.exec(
-        select(UserProfile).where(UserProfile.user_id == column.user_id)
-    ).first()
 
-    # 获取专栏文章
-    posts_query = session.exec(
+def _column_posts_statement(column_id: int):
+    """专栏文章查询（按专栏内排序和创建时间排序）"""
+    return (
         select(Post, PostColumns)
         .join(PostColumns, Post.id == PostColumns.post_id)
-        .where(
-            PostColumns.column_id == column_id,
-            Post.is_deleted == 0,
-            Post.is_published == 1
-        )
+        .where(*_column_post_filters(column_id))
         .order_by(
             PostColumns.sort_order.asc(), Post.created_at.desc()
         )
-    ).all()
+    )
 
-    posts = []
-    for post, post_column in posts_query:
-        posts.append({
-            "id": post.id,
-            "title": post.title,
-            "summary": post.summary,
-            "cover_image_url": post.cover_image_url,
-            "created_at": post.created_at,
-            "updated_at": post.updated_at,
-            "sort_order": post_column.sort_order,
-        })
 
-    # 构建响应
+def _column_post_item(post: Post, post_column: PostColumns) -> dict:
+    return {
+        "id": post.id,
+        "title": post.title,
+        "summary": post.summary,
+        "cover_image_url": post.cover_image_url,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at,
+        "sort_order": post_column.sort_order,
+    }
+
+
+def _build_column_read(
+    column: Columns,
+    post_count: int,
+    user_nickname: Optional[str],
+    posts: Optional[List[dict]] = None,
+) -> ColumnsRead:
     return ColumnsRead(
         id=column.id,
         name=column.name,
@@ -337,10 +381,80 @@ def get_column_with_details(session: Session, column_id: int) -> ColumnsRead:
         is_visible=column.is_visible,
         is_deleted=column.is_deleted,
         user_id=column.user_id,
-        post_count=len(posts),  # 使用实际查询到的文章数量
+        post_count=post_count,
         view_count=column.view_count,
         created_at=column.created_at,
         updated_at=column.updated_at,
-        user_nickname=user_profile.nickname if user_profile else None,
+        user_nickname=user_nickname,
         posts=posts,
     )
+
+
+def load_columns_summary(
+    session: Session, columns: List[Columns]
+) -> List[ColumnsRead]:
+    """批量构建专栏列表项
+
+    文章数量通过一条按 post_columns.column_id 分组的聚合查询得到，
+    作者昵称一次批量取回，不加载文章正文。
+    """
+    if not columns:
+        return []
+
+    column_ids = [column.id for column in columns]
+    post_counts = dict(session.exec(
+        select(PostColumns.column_id, func.count(PostColumns.id))
+        .join(Post, Post.id == PostColumns.post_id)
+        .where(
+            PostColumns.column_id.in_(column_ids),
+            Post.is_deleted == 0,
+            Post.is_published == 1
+        )
+        .group_by(PostColumns.column_id)
+    ).all())
+
+    user_ids = {column.user_id for column in columns}
+    nicknames = dict(session.exec(
+        select(UserProfile.user_id, UserProfile.nickname)
+        .where(UserProfile.user_id.in_(user_ids))
+    ).all())
+
+    return [
+        _build_column_read(
+            column,
+            post_counts.get(column.id, 0),
+            nicknames.get(column.user_id),
+        )
+        for column in columns
+    ]
+
+
+def get_column_with_details(session: Session, column_id: int) -> ColumnsRead:
+    """获取包含详细信息的专栏"""
+    # 获取专栏
+    column = session.get(Columns, column_id)
+    if not column:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="专栏不存在"
+        )
+
+    # 获取用户信息
+    user_profile = session.exec(
+        select(UserProfile).where(UserProfile.user_id == column.user_id)
+    ).first()
+
+    # 获取专栏文章
+    posts_query = session.exec(_column_posts_statement(column_id)).all()
+    posts = [
+        _column_post_item(post, post_column)
+        for post, post_column in posts_query
+    ]
+
+    # 构建响应
+    return _build_column_read(
+        column,
+        len(posts),  # 使用实际查询到的文章数量
+        user_profile.nickname if user_profile else None,
+        posts,
+    )
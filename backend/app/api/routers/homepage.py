@@ -12,6 +12,7 @@ from app.models.homepage import (
     HomePageSettingsUpdate,
 )
 from app.models.system import SystemDefault
+from app.services.settingsCache import settings_cache
 
 
 router = APIRouter(prefix="/homepage", tags=["homepage"])
@@ -117,3 +118,4 @@ def sync_system_defaults(db: Session, settings: HomePageSettings) -> None:
         str(int(settings.show_live2d)),
         "boolean",
     )
+    settings_cache.invalidate()
@@ -1,29 +1,170 @@
 # backend/app/api/routers/local_music.py
+import asyncio
 import os
-import uuid
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import Response
 from sqlmodel import Session, select, func
 
 from app.db.session import get_db
-from app.models.local_music import LocalMusic, MusicPlaylist, PlaylistMusic
+from app.models.local_music import (
+    LocalMusic,
+    MusicPlaylist,
+    PlaylistMusic,
+    PlaylistOrderUpdate,
+)
 from app.models.user import User
 from app.models.system_setting import SystemSetting, SettingType
 from app.api.routers.auth import get_current_user
+from app.services.audioMetadata import AudioMetadata, probe_music_file
+from app.services.settingsCache import settings_cache
+from app.services.blobStore import release_path, unlink_released
+from app.services.mediaServing import etag_matches
+from app.services.musicSearchIndex import music_search_index
+from app.services.playlistManifest import NO_PUBLIC_PLAYLIST_MESSAGE, playlist_manifest
+from app.services.playlistOrder import append_rank, move_track, rank_after, reorder
+from app.services.uploadStorage import save_upload_blob
 
 router = APIRouter(tags=["local-music"])
 
 # 支持的音乐格式
 ALLOWED_FORMATS = {'.mp3', '.wav', '.ogg', '.m4a', '.flac'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_COVER_SIZE = 5 * 1024 * 1024  # 5MB
+
+
+def create_music_record(
+    db: Session,
+    *,
+    file_url: str,
+    title: Optional[str] = None,
+    artist: Optional[str] = None,
+    album: Optional[str] = None,
+    genre: Optional[str] = None,
+    year: Optional[str] = None,
+    lyrics: Optional[str] = None,
+    cover_image_url: Optional[str] = None,
+    playlist_id: Optional[str] = None,
+    metadata: Optional[AudioMetadata] = None,
+    original_filename: Optional[str] = None,
+    commit: bool = True,
+) -> dict:
+    """为已保存到磁盘的音乐文件创建记录，并按需加入播放列表
+
+    表单中填写的字段优先，未填写的字段使用文件内的标签，
+    标题都没有时使用原始文件名。
+    commit=False 时只 flush，由调用方提交事务后再调用 music_record_committed。
+    """
+    metadata = metadata or AudioMetadata()
+
+    # 处理年份字段
+    year_value = None
+    if year and year.strip():
+        try:
+            year_value = int(year)
+        except ValueError:
+            year_value = None
+
+    title = (title or "").strip() or metadata.title
+    if not title and original_filename:
+        title = os.path.splitext(os.path.basename(original_filename))[0]
+
+    # 创建数据库记录
+    music = LocalMusic(
+        title=title or "未知歌曲",
+        artist=artist or metadata.artist or "未知艺术家",
+        album=album or metadata.album,
+        genre=genre or metadata.genre,
+        year=year_value or metadata.year,
+        lyrics=lyrics,
+        file_url=file_url,
+        duration=metadata.duration_seconds,
+        bitrate=metadata.bitrate,
+        sample_rate=metadata.sample_rate,
+        cover_image_url=cover_image_url,
+    )
+
+    db.add(music)
+    db.flush()
+
+    # 如果指定了播放列表，添加到播放列表中
+    playlist_added = False
+    if playlist_id and playlist_id.strip():
+        try:
+            playlist_id_int = int(playlist_id)
+            playlist = db.get(MusicPlaylist, playlist_id_int)
+            if playlist and playlist.is_active:
+                # 检查是否已经在播放列表中
+                existing = db.exec(
+                    select(PlaylistMusic).where(
+                        PlaylistMusic.playlist_id == playlist_id_int,
+                        PlaylistMusic.track_id == music.id
+                    )
+                ).first()
+
+                if not existing:
+                    playlist_music = PlaylistMusic(
+                        playlist_id=playlist_id_int,
+                        track_id=music.id,
+                        position=append_rank(db, playlist_id_int)
+                    )
+                    db.add(playlist_music)
+                    db.flush()
+                    playlist_added = True
+                    print(
+                        f"DEBUG: 音乐 {music.id} 已添加到播放列表 {playlist_id_int}"
+                    )
+                else:
+                    print(
+                        f"DEBUG: 音乐 {music.id} 已在播放列表 {playlist_id_int} 中"
+                    )
+        except ValueError:
+            print(f"DEBUG: 无效的播放列表ID: {playlist_id}")
+
+    record = {
+        "id": music.id,
+        "title": music.title,
+        "artist": music.artist,
+        "album": music.album,
+        "genre": music.genre,
+        "year": music.year,
+        "duration": music.duration,
+        "bitrate": music.bitrate,
+        "sample_rate": music.sample_rate,
+        "file_url": music.file_url,
+        "cover_image_url": music.cover_image_url,
+        "playlist_added": playlist_added
+    }
+    if commit:
+        db.commit()
+        music_record_committed(db, record)
+    return record
+
+
+def music_record_committed(db: Session, record: dict) -> None:
+    """音乐记录提交后更新搜索索引，加入了播放列表时使公开播放列表清单失效"""
+    music = db.get(LocalMusic, record["id"])
+    if music is not None:
+        music_search_index.upsert(music)
+    if record["playlist_added"]:
+        playlist_manifest.invalidate()
 
 
 @router.post("/upload")
 async def upload_music(
     file: UploadFile = File(...),
-    title: str = Form(...),
+    title: Optional[str] = Form(None),
     artist: Optional[str] = Form(None),
     album: Optional[str] = Form(None),
     genre: Optional[str] = Form(None),
@@ -34,7 +175,7 @@ async def upload_music(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """上传音乐文件"""
+    """上传音乐文件（标题、艺术家等未填写时从文件标签读取）"""
 
     # 检查文件格式
     file_extension = os.path.splitext(file.filename)[1].lower()
@@ -44,156 +185,145 @@ async def upload_music(
             detail=f"不支持的文件格式。支持的格式: {', '.join(ALLOWED_FORMATS)}"
         )
 
-    # 检查文件大小
-    if file.size and file.size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件太大。最大支持 {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-
-    # 生成唯一文件名
-    file_id = str(uuid.uuid4())
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    filename = f"{file_id}{file_extension}"
-
-    # 创建上传目录
     upload_dir = "uploads/music"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, filename)
+
+    # 分块保存到内容存储（相同内容只保留一份），超过大小限制时立即中止
+    stored = await save_upload_blob(
+        db, file, upload_dir, file_extension, MAX_FILE_SIZE
+    )
+    file_path = stored.path
+    # 本次登记到内容存储的文件，失败时一并清理
+    stored_paths = [file_path]
 
     try:
-        # 保存音乐文件
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-
-        # 处理年份字段
-        year_value = None
-        if year and year.strip():
-            try:
-                year_value = int(year)
-            except ValueError:
-                year_value = None
-
-        # 创建数据库记录
-        music = LocalMusic(
+        # 处理封面图片（在创建记录前保存，失败时不会留下无效记录）
+        cover_image_url = None
+        if cover_image:
+            cover_extension = os.path.splitext(cover_image.filename)[1].lower()
+            stored_cover = await save_upload_blob(
+                db, cover_image, upload_dir, cover_extension, MAX_COVER_SIZE
+            )
+            stored_paths.append(stored_cover.path)
+            cover_image_url = f"/{stored_cover.path}"
+
+        # 从文件头读取时长、码率和标签，没有上传封面时使用内嵌封面
+        metadata, embedded_cover_url = await asyncio.to_thread(
+            probe_music_file, db, file_path, cover_image_url is None
+        )
+        if embedded_cover_url:
+            stored_paths.append(embedded_cover_url.lstrip('/'))
+
+        # 文件引用计数随音乐记录一起提交
+        return create_music_record(
+            db,
+            file_url=f"/{file_path}",
             title=title,
-            artist=artist or "未知艺术家",
+            artist=artist,
             album=album,
             genre=genre,
-            year=year_value,
+            year=year,
             lyrics=lyrics,
-            file_url=f"/uploads/music/{filename}",
-            duration=180,  # 默认3分钟，后续可以从文件元数据获取
+            cover_image_url=cover_image_url or embedded_cover_url,
+            playlist_id=playlist_id,
+            metadata=metadata,
+            original_filename=file.filename,
         )
 
-        db.add(music)
-        db.commit()
-        db.refresh(music)
-
-        # 处理封面图片
-        if cover_image:
-            cover_id = str(uuid.uuid4())
-            cover_extension = os.path.splitext(cover_image.filename)[1].lower()
-            cover_filename = f"{cover_id}{cover_extension}"
-            cover_path = os.path.join(upload_dir, cover_filename)
-
-            with open(cover_path, "wb") as buffer:
-                cover_content = await cover_image.read()
-                buffer.write(cover_content)
-
-            music.cover_image_url = f"/uploads/music/{cover_filename}"
-            db.commit()
-
-        # 如果指定了播放列表，添加到播放列表中
-        playlist_added = False
-        if playlist_id and playlist_id.strip():
-            try:
-                playlist_id_int = int(playlist_id)
-                playlist = db.get(MusicPlaylist, playlist_id_int)
-                if playlist and playlist.is_active:
-                    # 检查是否已经在播放列表中
-                    existing = db.exec(
-                        select(PlaylistMusic).where(
-                            PlaylistMusic.playlist_id == playlist_id_int,
-                            PlaylistMusic.track_id == music.id
-                        )
-                    ).first()
-
-                    if not existing:
-                        playlist_music = PlaylistMusic(
-                            playlist_id=playlist_id_int,
-                            track_id=music.id,
-                            position=0
-                        )
-                        db.add(playlist_music)
-                        db.commit()
-                        playlist_added = True
-                        print(
-                            f"DEBUG: 音乐 {music.id} 已添加到播放列表 {playlist_id_int}"
-                        )
-                    else:
-                        print(
-                            f"DEBUG: 音乐 {music.id} 已在播放列表 {playlist_id_int} 中"
-                        )
-            except ValueError:
-                print(f"DEBUG: 无效的播放列表ID: {playlist_id}")
-
-        return {
-            "id": music.id,
-            "title": music.title,
-            "artist": music.artist,
-            "album": music.album,
-            "genre": music.genre,
-            "year": music.year,
-            "file_url": music.file_url,
-            "cover_image_url": music.cover_image_url,
-            "playlist_added": playlist_added
-        }
-
     except Exception as e:
-        # 如果数据库操作失败，删除已上传的文件
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # 如果数据库操作失败，回滚引用计数并删除未被引用的新文件
+        db.rollback()
+        unlink_released(db, stored_paths)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
 
 
 @router.get("/list")
 async def get_music_list(
-    page: int = 1,
-    page_size: int = 20,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
     genre: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """获取音乐列表"""
+    """获取音乐列表（search 支持中文、拼音全拼和首字母）"""
 
-    # 构建查询
-    query = select(LocalMusic).where(LocalMusic.is_active.is_(True))
-
-    # 搜索过滤
-    if search:
-        query = query.where(
-            LocalMusic.title.contains(search) |
-            LocalMusic.artist.contains(search) |
-            LocalMusic.album.contains(search)
-        )
-
-    # 类型过滤
-    if genre:
-        query = query.where(LocalMusic.genre == genre)
-
-    # 分页
     offset = (page - 1) * page_size
-    query = query.offset(offset).limit(page_size)
 
-    musics = db.exec(query).all()
+    if search and search.strip():
+        # 通过搜索索引得到按相关度排序的全部结果，再按页读取记录
+        # 索引按间隔从数据库增量同步，放到线程中执行
+        music_ids = await asyncio.to_thread(
+            music_search_index.search, search, genre=genre
+        )
+        total = len(music_ids)
+        page_ids = music_ids[offset:offset + page_size]
+        rows = {}
+        if page_ids:
+            rows = {
+                music.id: music
+                for music in db.exec(
+                    select(LocalMusic).where(
+                        LocalMusic.id.in_(page_ids),
+                        LocalMusic.is_active.is_(True)
+                    )
+                ).all()
+            }
+        musics = [rows[music_id] for music_id in page_ids if music_id in rows]
+    else:
+        filters = [LocalMusic.is_active.is_(True)]
+        if genre:
+            filters.append(LocalMusic.genre == genre)
+        total = db.exec(select(func.count(LocalMusic.id)).where(*filters)).one()
+        musics = db.exec(
+            select(LocalMusic)
+            .where(*filters)
+            .order_by(LocalMusic.id)
+            .offset(offset)
+            .limit(page_size)
+        ).all()
 
     return {
         "musics": musics,
         "page": page,
         "page_size": page_size,
-        "total": len(musics)
+        "total": total
+    }
+
+
+@router.get("/search/suggest")
+async def suggest_music(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """按前缀补全曲目（标题、艺术家、专辑或其拼音以 q 开头）"""
+
+    music_ids = await asyncio.to_thread(music_search_index.suggest, q, limit=limit)
+    if not music_ids:
+        return {"musics": []}
+
+    rows = {
+        music.id: music
+        for music in db.exec(
+            select(LocalMusic).where(
+                LocalMusic.id.in_(music_ids),
+                LocalMusic.is_active.is_(True)
+            )
+        ).all()
+    }
+    return {
+        "musics": [
+            {
+                "id": music.id,
+                "title": music.title,
+                "artist": music.artist,
+                "album": music.album,
+                "cover_image_url": music.cover_image_url,
+            }
+            for music in (rows.get(music_id) for music_id in music_ids)
+            if music is not None
+        ]
     }
 
 
@@ -235,35 +365,10 @@ async def get_music_file(
 
 
 @router.get("/settings/auto-play")
-async def get_auto_play_setting(
-    db: Session = Depends(get_db)
-):
-    """获取自动播放设置"""
-
-    # 查询自动播放设置
-    statement = select(SystemSetting).where(
-        SystemSetting.category == "music",
-        SystemSetting.key_name == "auto_play"
-    )
-    setting = db.exec(statement).first()
-
-    if not setting:
-        # 如果不存在，创建默认设置
-        setting = SystemSetting(
-            category="music",
-            key_name="auto_play",
-            key_value="false",
-            key_type=SettingType.boolean,
-            description="进入博客时是否自动播放音乐",
-            is_editable=True,
-            is_public=True
-        )
-        db.add(setting)
-        db.commit()
-        db.refresh(setting)
-
+async def get_auto_play_setting():
+    """获取自动播放设置（未设置时为 false）"""
     return {
-        "auto_play": setting.key_value.lower() == "true"
+        "auto_play": playlist_manifest.auto_play()
     }
 
 
@@ -299,6 +404,7 @@ async def update_auto_play_setting(
 
     db.commit()
     db.refresh(setting)
+    settings_cache.invalidate()
 
     return {
         "auto_play": auto_play,
@@ -306,59 +412,27 @@ async def update_auto_play_setting(
     }
 
 
-@router.get("/settings/public-playlist")
-async def get_public_playlist(
-    db: Session = Depends(get_db)
-):
-    """获取公开的播放列表（用于博客首页播放）"""
+@router.get("/settings/player-manifest")
+async def get_player_manifest(request: Request):
+    """播放器启动数据：公开的播放列表和自动播放设置（支持 If-None-Match）"""
+    body, etag = playlist_manifest.body()
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    # 查询公开的播放列表
-    statement = select(MusicPlaylist).where(
-        MusicPlaylist.is_public.is_(True),
-        MusicPlaylist.is_active.is_(True)
-    )
-    public_playlist = db.exec(statement).first()
 
-    if not public_playlist:
+@router.get("/settings/public-playlist")
+async def get_public_playlist():
+    """获取公开的播放列表（用于博客首页播放）"""
+    playlist = playlist_manifest.public_playlist()
+    if playlist is None:
         return {
             "playlist": None,
-            "message": "没有公开的播放列表"
+            "message": NO_PUBLIC_PLAYLIST_MESSAGE
         }
-
-    # 获取播放列表中的音乐
-    playlist_musics_statement = select(PlaylistMusic, LocalMusic).join(
-        LocalMusic, PlaylistMusic.track_id == LocalMusic.id
-    ).where(
-        PlaylistMusic.playlist_id == public_playlist.id,
-        LocalMusic.is_active.is_(True)
-    ).order_by(PlaylistMusic.position)
-
-    playlist_musics = db.exec(playlist_musics_statement).all()
-
-    musics = []
-    for playlist_music, music in playlist_musics:
-        musics.append({
-            "id": music.id,
-            "title": music.title,
-            "artist": music.artist,
-            "album": music.album,
-            "duration": music.duration,
-            "file_url": music.file_url,
-            "cover_image_url": music.cover_image_url,
-            "genre": music.genre,
-            "year": music.year
-        })
-
-    return {
-        "playlist": {
-            "id": public_playlist.id,
-            "name": public_playlist.name,
-            "description": public_playlist.description,
-            "cover_image_url": public_playlist.cover_image_url,
-            "music_count": len(musics),
-            "musics": musics
-        }
-    }
+    return {"playlist": playlist}
 
 
 @router.delete("/{music_id}")
@@ -373,18 +447,19 @@ async def delete_music(
     if not music:
         raise HTTPException(status_code=404, detail="音乐不存在")
 
-    # 软删除
+    # 软删除，并释放音乐文件和封面的引用（重复删除时不再释放）
+    released_paths = []
+    if music.is_active:
+        for url in (music.file_url, music.cover_image_url):
+            if url and url.startswith('/'):
+                released_paths.append(release_path(db, url.lstrip('/')))
     music.is_active = False
     db.commit()
+    music_search_index.remove(music_id)
+    playlist_manifest.invalidate()
 
-    # 删除文件
-    if music.file_url:
-        file_path = music.file_url.lstrip('/')
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"删除文件失败: {e}")
+    # 删除文件（仅在没有其他记录引用同一内容时）
+    unlink_released(db, released_paths)
 
     return {"message": "音乐删除成功"}
 
@@ -400,14 +475,19 @@ async def get_playlists(
         select(MusicPlaylist).where(MusicPlaylist.is_active.is_(True))
     ).all()
 
-    # 为每个播放列表计算音乐数量并创建包含music_count的字典
+    # 一次分组统计所有播放列表的音乐数量
+    counts = {}
+    if playlists:
+        counts = dict(
+            db.exec(
+                select(PlaylistMusic.playlist_id, func.count(PlaylistMusic.id))
+                .where(PlaylistMusic.playlist_id.in_([p.id for p in playlists]))
+                .group_by(PlaylistMusic.playlist_id)
+            ).all()
+        )
+
     playlists_with_count = []
     for playlist in playlists:
-        music_count = db.exec(
-            select(func.count(PlaylistMusic.id)).where(
-                PlaylistMusic.playlist_id == playlist.id
-            )
-        ).first()
 
         playlist_dict = {
             "id": playlist.id,
@@ -423,7 +503,7 @@ async def get_playlists(
             "user_id": playlist.user_id,
             "created_at": playlist.created_at,
             "updated_at": playlist.updated_at,
-            "music_count": music_count or 0
+            "music_count": counts.get(playlist.id, 0)
         }
         playlists_with_count.append(playlist_dict)
 
@@ -466,6 +546,7 @@ async def create_playlist(
     db.add(playlist)
     db.commit()
     db.refresh(playlist)
+    playlist_manifest.invalidate()
 
     return playlist
 
@@ -512,6 +593,7 @@ async def update_playlist(
     playlist.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(playlist)
+    playlist_manifest.invalidate()
 
     return playlist
 
@@ -531,6 +613,7 @@ async def delete_playlist(
     # 软删除
     playlist.is_active = False
     db.commit()
+    playlist_manifest.invalidate()
 
     return {"message": "播放列表删除成功"}
 
@@ -552,7 +635,7 @@ async def get_playlist_musics(
     ).where(
         PlaylistMusic.playlist_id == playlist_id,
         LocalMusic.is_active.is_(True)
-    ).order_by(PlaylistMusic.position)
+    ).order_by(PlaylistMusic.position, PlaylistMusic.id)
 
     playlist_musics = db.exec(playlist_musics_statement).all()
 
@@ -577,10 +660,11 @@ async def get_playlist_musics(
 async def add_music_to_playlist(
     playlist_id: int,
     music_id: int = Form(...),
+    after_music_id: Optional[int] = Form(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """添加音乐到播放列表"""
+    """添加音乐到播放列表（默认追加到末尾，指定 after_music_id 时插入到其后）"""
 
     playlist = db.get(MusicPlaylist, playlist_id)
     if not playlist or not playlist.is_active:
@@ -601,14 +685,20 @@ async def add_music_to_playlist(
     if existing:
         raise HTTPException(status_code=400, detail="音乐已在播放列表中")
 
+    position = (
+        append_rank(db, playlist_id)
+        if after_music_id is None
+        else rank_after(db, playlist_id, after_music_id)
+    )
     playlist_music = PlaylistMusic(
         playlist_id=playlist_id,
         track_id=music_id,
-        position=0
+        position=position
     )
 
     db.add(playlist_music)
     db.commit()
+    playlist_manifest.invalidate()
 
     return {"message": "音乐已添加到播放列表"}
 
@@ -634,5 +724,47 @@ async def remove_music_from_playlist(
 
     db.delete(playlist_music)
     db.commit()
+    playlist_manifest.invalidate()
 
     return {"message": "音乐已从播放列表移除"}
+
+
+@router.put("/playlists/{playlist_id}/musics/{music_id}/move")
+async def move_music_in_playlist(
+    playlist_id: int,
+    music_id: int,
+    after_music_id: Optional[int] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """移动播放列表中的音乐到 after_music_id 之后（不指定时移到最前面）"""
+
+    playlist = db.get(MusicPlaylist, playlist_id)
+    if not playlist or not playlist.is_active:
+        raise HTTPException(status_code=404, detail="播放列表不存在")
+
+    entry = move_track(db, playlist_id, music_id, after_music_id)
+    db.commit()
+    playlist_manifest.invalidate()
+
+    return {"message": "音乐顺序已更新", "position": entry.position}
+
+
+@router.put("/playlists/{playlist_id}/order")
+async def reorder_playlist(
+    playlist_id: int,
+    order: PlaylistOrderUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """按给定顺序整体重排播放列表（在一个事务中完成）"""
+
+    playlist = db.get(MusicPlaylist, playlist_id)
+    if not playlist or not playlist.is_active:
+        raise HTTPException(status_code=404, detail="播放列表不存在")
+
+    reorder(db, playlist_id, order.music_ids)
+    db.commit()
+    playlist_manifest.invalidate()
+
+    return {"message": "播放列表顺序已更新"}
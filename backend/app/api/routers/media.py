@@ -0,0 +1,100 @@
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.responses import Response
+
+from app.services.downloadCounter import download_counter
+from app.services.imageDerivatives import (
+    choose_format,
+    image_derivatives,
+    is_resizable,
+    media_type,
+    snap_width,
+)
+from app.services.mediaServing import FileRangeResponse, media_response
+
+logger = logging.getLogger(__name__)
+
+# 挂载在 /uploads，优先于静态文件目录匹配
+router = APIRouter(prefix="/uploads", tags=["media"])
+
+UPLOAD_ROOT = "uploads"
+IMAGE_DIR = "images"
+
+# 缩略图由原图生成，配置变化时内容会变，不使用 immutable
+DERIVATIVE_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _media_path(directory: str, filename: str) -> str:
+    for part in (directory, filename):
+        if part != os.path.basename(part) or part.startswith("."):
+            raise HTTPException(status_code=404, detail="文件不存在")
+    return os.path.join(UPLOAD_ROOT, directory, filename)
+
+
+def _count_download(request: Request, response: Response, file_url: str) -> None:
+    """完整下载或从头开始的 Range 请求记一次下载"""
+    if request.method != "GET":
+        return
+    if response.status_code == 200 or (
+        isinstance(response, FileRangeResponse) and response.start == 0
+    ):
+        download_counter.add(file_url)
+
+
+async def serve_image(
+    request: Request,
+    filename: str,
+    w: Optional[int] = None,
+    fmt: Optional[str] = None,
+) -> Response:
+    """返回原图，或指定宽度时返回缓存的缩略图"""
+    file_path = _media_path(IMAGE_DIR, filename)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="图片不存在")
+
+    if w is None or not is_resizable(file_path):
+        return await media_response(request, file_path)
+
+    output_format = choose_format(fmt, request.headers.get("accept"))
+    try:
+        derivative = await image_derivatives.get(
+            file_path, snap_width(w), output_format
+        )
+    except Exception as e:
+        # 生成失败（如图片损坏）时退回原图
+        logger.warning(f"获取缩略图失败 {filename}: {e}")
+        return await media_response(request, file_path)
+
+    # 未显式指定格式时按 Accept 协商，缓存需区分
+    headers = {"Vary": "Accept"} if fmt is None else None
+    return await media_response(
+        request,
+        derivative,
+        media_type=media_type(output_format),
+        cache_control=DERIVATIVE_CACHE_CONTROL,
+        headers=headers,
+    )
+
+
+@router.api_route("/images/{filename}", methods=["GET", "HEAD"])
+async def get_image(
+    filename: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="缩略图宽度"),
+    fmt: Optional[str] = Query(
+        None, pattern="^(webp|jpeg)$", description="缩略图格式"
+    ),
+) -> Response:
+    """图片地址，支持 ?w= 缩略图"""
+    return await serve_image(request, filename, w, fmt)
+
+
+@router.api_route("/{directory}/{filename}", methods=["GET", "HEAD"])
+async def get_media(directory: str, filename: str, request: Request) -> Response:
+    """音乐、视频和附件等文件，支持 Range 和条件请求"""
+    response = await media_response(request, _media_path(directory, filename))
+    _count_download(request, response, f"/{UPLOAD_ROOT}/{directory}/{filename}")
+    return response
@@ -1,5 +1,6 @@
+from collections import defaultdict
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Set
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import Session, select, func
@@ -41,10 +42,10 @@ def create_moment(
 
     # 如果有图片，创建图片关联
     if moment.image_ids:
+        # 验证图片是否存在
+        valid_ids = _existing_attachment_ids(session, moment.image_ids)
         for i, image_id in enumerate(moment.image_ids):
-            # 验证图片是否存在
-            attachment = session.get(Attachment, image_id)
-            if attachment:
+            if image_id in valid_ids:
                 moment_image = MomentsImages(
                     moment_id=db_moment.id,
                     attachment_id=image_id,
@@ -115,11 +116,8 @@ def list_moments(
 
         moments = session.exec(statement).all()
 
-        # 获取详细信息
-        moment_details = []
-        for moment in moments:
-            detail = get_moment_with_details(session, moment.id)
-            moment_details.append(detail)
+        # 批量获取详细信息
+        moment_details = load_moments_details(session, moments)
 
         return MomentsListResponse(
             items=moment_details,
@@ -155,7 +153,7 @@ def get_moment(
             detail="说说不存在"
         )
 
-    return get_moment_with_details(session, moment_id)
+    return load_moments_details(session, [moment])[0]
 
 
 @router.put("/{moment_id}", response_model=MomentsRead)
@@ -193,9 +191,11 @@ def update_moment(
             session.delete(img)
 
         # 添加新的图片关联
+        valid_ids = _existing_attachment_ids(
+            session, moment_update.image_ids
+        )
         for i, image_id in enumerate(moment_update.image_ids):
-            attachment = session.get(Attachment, image_id)
-            if attachment:
+            if image_id in valid_ids:
                 moment_image = MomentsImages(
                     moment_id=moment_id,
                     attachment_id=image_id,
@@ -209,7 +209,7 @@ def update_moment(
     session.commit()
     session.refresh(moment)
 
-    return get_moment_with_details(session, moment_id)
+    return load_moments_details(session, [moment])[0]
 
 
 @router.delete("/{moment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -254,7 +254,63 @@ def toggle_moment_visibility(
     session.commit()
     session.refresh(moment)
 
-    return get_moment_with_details(session, moment_id)
+    return load_moments_details(session, [moment])[0]
+
+
+def load_moments_details(
+    session: Session, moments: List[Moments]
+) -> List[MomentsRead]:
+    """批量组装说说详情
+
+    整页说说的用户资料、图片关联和附件分别用一条 IN 查询取回，
+    再在内存中拼装，避免逐条查询带来的 N+1 问题。
+    """
+    if not moments:
+        return []
+
+    # 批量获取用户信息
+    user_ids = {moment.user_id for moment in moments}
+    profiles = {
+        profile.user_id: profile
+        for profile in session.exec(
+            select(UserProfile).where(UserProfile.user_id.in_(user_ids))
+        ).all()
+    }
+
+    # 批量获取图片关联及附件（联表一次取回）
+    moment_ids = [moment.id for moment in moments]
+    images_by_moment: Dict[int, List[dict]] = defaultdict(list)
+    image_rows = session.exec(
+        select(MomentsImages, Attachment)
+        .join(Attachment, MomentsImages.attachment_id == Attachment.id)
+        .where(MomentsImages.moment_id.in_(moment_ids))
+        .order_by(MomentsImages.sort_order)
+    ).all()
+    for moment_image, attachment in image_rows:
+        images_by_moment[moment_image.moment_id].append({
+            "id": attachment.id,
+            "url": attachment.file_url,
+            "filename": attachment.original_name,
+            "sort_order": moment_image.sort_order
+        })
+
+    # 构建响应
+    details = []
+    for moment in moments:
+        user_profile = profiles.get(moment.user_id)
+        details.append(MomentsRead(
+            id=moment.id,
+            content=moment.content,
+            is_visible=moment.is_visible,
+            is_deleted=moment.is_deleted,
+            user_id=moment.user_id,
+            created_at=moment.created_at,
+            updated_at=moment.updated_at,
+            user_nickname=user_profile.nickname if user_profile else None,
+            user_avatar=user_profile.avatar if user_profile else None,
+            images=images_by_moment.get(moment.id, [])
+        ))
+    return details
 
 
 def get_moment_with_details(session: Session, moment_id: int) -> MomentsRead:
@@ -267,40 +323,15 @@ def get_moment_with_details(session: Session, moment_id: int) -> MomentsRead:
             detail="说说不存在"
         )
 
-    # 获取用户信息
-    user_profile = session.exec(
-        select(UserProfile).where(UserProfile.user_id == moment.user_id)
-    ).first()
-
-    # 获取图片信息
-    images = []
-    moment_images = session.exec(
-        select(MomentsImages).where(MomentsImages.moment_id == moment_id)
-    ).all()
-
-    for moment_image in moment_images:
-        attachment = session.get(Attachment, moment_image.attachment_id)
-        if attachment:
-            images.append({
-                "id": attachment.id,
-                "url": attachment.file_url,
-                "filename": attachment.original_name,
-                "sort_order": moment_image.sort_order
-            })
+    return load_moments_details(session, [moment])[0]
 
-    # 按排序顺序排列图片
-    images.sort(key=lambda x: x["sort_order"])
 
-    # 构建响应
-    return MomentsRead(
-        id=moment.id,
-        content=moment.content,
-        is_visible=moment.is_visible,
-        is_deleted=moment.is_deleted,
-        user_id=moment.user_id,
-        created_at=moment.created_at,
-        updated_at=moment.updated_at,
-        user_nickname=user_profile.nickname if user_profile else None,
-        user_avatar=user_profile.avatar if user_profile else None,
-        images=images
-    )
+def _existing_attachment_ids(
+    session: Session, image_ids: List[int]
+) -> Set[int]:
+    """一次查询出实际存在的附件ID"""
+    if not image_ids:
+        return set()
+    return set(session.exec(
+        select(Attachment.id).where(Attachment.id.in_(image_ids))
+    ).all())
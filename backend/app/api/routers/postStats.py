@@ -1,5 +1,8 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from app.db.session import get_session
@@ -12,9 +15,16 @@ from app.models.postStats import (
 )
 from app.models.post import Post
 from app.models.postLikeTracking import PostLikeTracking
+from app.services.postDedup import like_filter, view_dedup
+from app.services.postStatsCounter import apply_stats_delta, counter_buffer
+from app.services.statsEventLog import event_log
+from app.services.visitorSketch import count_unique_visitors, visitor_buffer
 
 router = APIRouter()
 
+# 批量查询一次最多的文章数
+MAX_BATCH_IDS = 100
+
 
 def get_client_ip(request: Request) -> str:
     """获取客户端IP地址"""
@@ -29,6 +39,34 @@ def get_client_ip(request: Request) -> str:
     return ip
 
 
+def merge_pending_stats(
+    post_stats: Optional[PostStats], post_id: int
+) -> Optional[PostStatsRead]:
+    """合并写缓冲中尚未落库的增量，返回最新的统计数据"""
+    pending = counter_buffer.pending(post_id)
+    if post_stats is None:
+        if not any(pending.values()):
+            return None
+        # 统计行将在下次刷新时创建，此前 id 以 0 表示
+        now = datetime.utcnow()
+        data = {
+            "id": 0,
+            "post_id": post_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+    else:
+        data = post_stats.model_dump()
+    counter_buffer.apply_pending(post_id, data)
+    return PostStatsRead.model_validate(data)
+
+
+def _get_stats_row(session: Session, post_id: int) -> Optional[PostStats]:
+    return session.exec(
+        select(PostStats).where(PostStats.post_id == post_id)
+    ).first()
+
+
 @router.post("/post-stats", response_model=PostStatsRead)
 def create_post_stats(
     *,
@@ -62,6 +100,87 @@ def create_post_stats(
     return db_post_stats
 
 
+def _parse_post_ids(ids: str) -> List[int]:
+    """解析逗号分隔的文章ID（去重并保持顺序）"""
+    try:
+        post_ids = list(dict.fromkeys(
+            int(item) for item in ids.split(",") if item.strip()
+        ))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文章ID格式错误"
+        )
+    if not post_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请提供文章ID"
+        )
+    if len(post_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一次最多查询 {MAX_BATCH_IDS} 篇文章"
+        )
+    return post_ids
+
+
+# 批量接口需在 /post-stats/{post_id} 之前注册
+@router.get("/post-stats/batch")
+def get_post_stats_batch(
+    *,
+    session: Session = Depends(get_session),
+    ids: str = Query(..., description="逗号分隔的文章ID")
+):
+    """批量获取文章统计数据（一次 IN 查询，已合并未写回的增量）
+
+    返回 {"stats": {文章ID: 统计数据}}，没有统计数据的文章不出现在结果中。
+    """
+    post_ids = _parse_post_ids(ids)
+    rows = {
+        item.post_id: item
+        for item in session.exec(
+            select(PostStats).where(PostStats.post_id.in_(post_ids))
+        ).all()
+    }
+
+    stats = {}
+    for post_id in post_ids:
+        merged = merge_pending_stats(rows.get(post_id), post_id)
+        if merged is not None:
+            stats[post_id] = merged
+    return {"stats": stats}
+
+
+@router.get("/post-stats/batch/check-like")
+def check_user_like_status_batch(
+    *,
+    request: Request,
+    session: Session = Depends(get_session),
+    ids: str = Query(..., description="逗号分隔的文章ID")
+):
+    """批量检查当前IP是否点赞过这些文章
+
+    只对过滤器判定可能点赞过的文章执行一次 IN 查询。
+    """
+    post_ids = _parse_post_ids(ids)
+    user_ip = get_client_ip(request)
+
+    liked = set()
+    candidates = like_filter.candidates(session, post_ids, user_ip)
+    if candidates:
+        liked = set(session.exec(
+            select(PostLikeTracking.post_id).where(
+                PostLikeTracking.user_ip == user_ip,
+                PostLikeTracking.post_id.in_(candidates)
+            )
+        ).all())
+
+    return {
+        "likes": {post_id: post_id in liked for post_id in post_ids},
+        "user_ip": user_ip
+    }
+
+
 @router.get("/post-stats/{post_id}", response_model=PostStatsRead)
 def get_post_stats(
     *,
@@ -69,9 +188,7 @@ def get_post_stats(
     post_id: int
 ):
     """获取指定文章的统计数据"""
-    post_stats = session.exec(
-        select(PostStats).where(PostStats.post_id == post_id)
-    ).first()
+    post_stats = merge_pending_stats(_get_stats_row(session, post_id), post_id)
 
     if not post_stats:
         raise HTTPException(
@@ -92,7 +209,7 @@ def get_all_post_stats(
     """获取所有文章的统计数据"""
     statement = select(PostStats).offset(skip).limit(limit)
     post_stats = session.exec(statement).all()
-    return post_stats
+    return [merge_pending_stats(item, item.post_id) for item in post_stats]
 
 
 @router.put("/post-stats/{post_id}", response_model=PostStatsRead)
@@ -117,10 +234,13 @@ def update_post_stats(
     for field, value in post_stats_data.items():
         setattr(post_stats, field, value)
 
+    # 直接覆盖的字段不再叠加缓冲中的增量
+    counter_buffer.discard(post_id, post_stats_data.keys())
+
     session.add(post_stats)
     session.commit()
     session.refresh(post_stats)
-    return post_stats
+    return merge_pending_stats(post_stats, post_id)
 
 
 @router.patch("/post-stats/{post_id}/increment", response_model=PostStatsRead)
@@ -130,44 +250,65 @@ def increment_post_stats(
     post_id: int,
     increment_data: PostStatsIncrement
 ):
-    """增加文章统计数据（观看、点赞、分享、评论）"""
-    post_stats = session.exec(
-        select(PostStats).where(PostStats.post_id == post_id)
-    ).first()
+    """增加文章统计数据（观看、点赞、分享、评论）
 
-    if not post_stats:
-        # 如果不存在统计数据，创建一个新的
-        post_stats = PostStats(post_id=post_id)
-        session.add(post_stats)
-        session.commit()
-        session.refresh(post_stats)
-
-    # 增加各项统计数据
+    增量先写入内存缓冲，由后台任务批量原子写回数据库；
+    返回值已合并尚未写回的增量。
+    """
     increment_dict = increment_data.model_dump(exclude_unset=True)
     for field, increment_value in increment_dict.items():
         if increment_value and increment_value > 0:
-            current_value = getattr(post_stats, field, 0)
-            setattr(post_stats, field, current_value + increment_value)
+            counter_buffer.add(post_id, field, increment_value)
+            event_log.append(post_id, field, increment_value)
 
-    session.add(post_stats)
-    session.commit()
-    session.refresh(post_stats)
-    return post_stats
+    return merge_pending_stats(_get_stats_row(session, post_id), post_id)
 
 
 @router.post("/post-stats/{post_id}/view", response_model=PostStatsRead)
 def increment_view_count(
     *,
+    request: Request,
     session: Session = Depends(get_session),
     post_id: int
 ):
-    """增加文章观看次数"""
+    """增加文章观看次数（同一 IP 在窗口期内重复浏览只计一次）"""
+    user_ip = get_client_ip(request)
+    visitor_buffer.add(post_id, user_ip, request.headers.get("User-Agent"))
+    if not view_dedup.allow(post_id, user_ip):
+        return merge_pending_stats(_get_stats_row(session, post_id), post_id)
+
     increment_data = PostStatsIncrement(view_count=1)
     return increment_post_stats(
         session=session, post_id=post_id, increment_data=increment_data
     )
 
 
+@router.get("/post-stats/{post_id}/visitors")
+def get_unique_visitors(
+    *,
+    session: Session = Depends(get_session),
+    post_id: int,
+    days: int = Query(7, ge=1, le=366, description="最近多少天（含今天）"),
+    start: Optional[date] = Query(None, description="开始日期（UTC），指定时忽略 days"),
+    end: Optional[date] = Query(None, description="结束日期（UTC），默认今天"),
+):
+    """估算文章在一段日期内的独立访客数（合并每日的 HyperLogLog 草图）"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=days - 1)
+    if start > end or (end - start).days >= 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="日期范围无效（最长366天）"
+        )
+
+    return {
+        "post_id": post_id,
+        "start": start,
+        "end": end,
+        "unique_visitors": count_unique_visitors(session, post_id, start, end)
+    }
+
+
 @router.post("/post-stats/{post_id}/like", response_model=PostStatsRead)
 def increment_like_count(
     *,
@@ -175,39 +316,36 @@ def increment_like_count(
     session: Session = Depends(get_session),
     post_id: int
 ):
-    """增加文章点赞次数（带IP检测防止重复点赞）"""
+    """增加文章点赞次数（带IP检测防止重复点赞）
+
+    点赞记录和点赞数在同一个事务中写入；重复点赞由
+    (post_id, user_ip) 唯一约束拦截。
+    """
     # 获取客户端IP
     user_ip = get_client_ip(request)
 
-    # 检查是否已经点赞过
-    existing_like = session.exec(
-        select(PostLikeTracking).where(
-            PostLikeTracking.post_id == post_id,
-            PostLikeTracking.user_ip == user_ip
+    if not session.get(Post, post_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文章不存在"
         )
-    ).first()
 
-    if existing_like:
+    try:
+        session.add(PostLikeTracking(post_id=post_id, user_ip=user_ip))
+        session.flush()
+    except IntegrityError:
+        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="您已经点赞过这篇文章了"
         )
 
-    # 增加点赞次数
-    increment_data = PostStatsIncrement(like_count=1)
-    result = increment_post_stats(
-        session=session, post_id=post_id, increment_data=increment_data
-    )
-
-    # 记录点赞追踪
-    like_tracking = PostLikeTracking(
-        post_id=post_id,
-        user_ip=user_ip
-    )
-    session.add(like_tracking)
+    apply_stats_delta(session, post_id, like_count=1)
     session.commit()
+    event_log.append(post_id, "like_count", 1)
+    like_filter.add(post_id, user_ip)
 
-    return result
+    return merge_pending_stats(_get_stats_row(session, post_id), post_id)
 
 
 @router.get("/post-stats/{post_id}/check-like")
@@ -217,15 +355,17 @@ def check_user_like_status(
     session: Session = Depends(get_session),
     post_id: int
 ):
-    """检查用户是否已经点赞过这篇文章"""
+    """检查用户是否已经点赞过这篇文章（过滤器判定未点赞时不查询数据库）"""
     user_ip = get_client_ip(request)
 
-    existing_like = session.exec(
-        select(PostLikeTracking).where(
-            PostLikeTracking.post_id == post_id,
-            PostLikeTracking.user_ip == user_ip
-        )
-    ).first()
+    existing_like = None
+    if like_filter.might_contain(session, post_id, user_ip):
+        existing_like = session.exec(
+            select(PostLikeTracking).where(
+                PostLikeTracking.post_id == post_id,
+                PostLikeTracking.user_ip == user_ip
+            )
+        ).first()
 
     return {
         "is_liked": existing_like is not None,
@@ -240,39 +380,30 @@ def decrement_like_count(
     session: Session = Depends(get_session),
     post_id: int
 ):
-    """取消点赞（删除点赞记录并减少点赞数）"""
+    """取消点赞（删除点赞记录并减少点赞数，在同一个事务中完成）"""
     user_ip = get_client_ip(request)
 
-    # 查找点赞记录
-    existing_like = session.exec(
-        select(PostLikeTracking).where(
-            PostLikeTracking.post_id == post_id,
-            PostLikeTracking.user_ip == user_ip
+    table = PostLikeTracking.__table__
+    result = session.exec(
+        delete(table).where(
+            table.c.post_id == post_id,
+            table.c.user_ip == user_ip
         )
-    ).first()
-
-    if not existing_like:
+    )
+    if not result.rowcount:
+        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="未找到点赞记录"
         )
 
-    # 删除点赞记录
-    session.delete(existing_like)
+    # 减少点赞数（不会小于0）
+    apply_stats_delta(session, post_id, like_count=-1)
     session.commit()
+    event_log.append(post_id, "like_count", -1)
+    like_filter.mark_removed(post_id)
 
-    # 减少点赞数（确保不会小于0）
-    post_stats = session.exec(
-        select(PostStats).where(PostStats.post_id == post_id)
-    ).first()
-
-    if post_stats:
-        post_stats.like_count = max(0, post_stats.like_count - 1)
-        session.add(post_stats)
-        session.commit()
-        session.refresh(post_stats)
-
-    return post_stats
+    return merge_pending_stats(_get_stats_row(session, post_id), post_id)
 
 
 @router.post("/post-stats/{post_id}/share", response_model=PostStatsRead)
@@ -318,6 +449,7 @@ def delete_post_stats(
             detail="未找到该文章的统计数据"
         )
 
+    counter_buffer.discard(post_id)
     session.delete(post_stats)
     session.commit()
     return {"message": "统计数据删除成功"}
@@ -347,4 +479,4 @@ def get_popular_posts(
         .limit(limit)
     )
     post_stats = session.exec(statement).all()
-    return post_stats
+    return [merge_pending_stats(item, item.post_id) for item in post_stats]
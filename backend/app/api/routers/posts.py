@@ -1,7 +1,14 @@
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import and_, or_
 from sqlmodel import Session, select, func
 
 from app.db.session import get_db
@@ -12,55 +19,35 @@ from app.models.user import UserProfile, UserRead
 from app.models.postStats import PostStats
 from app.models.columns import PostColumns
 from app.api.routers.auth import get_current_user
+from app.services.postStatsCounter import counter_buffer
 
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
 
-@router.get("/", response_model=PostListResponse[PostRead])
-def list_posts(
-    page: int = Query(1, ge=1, description="页码"),
-    limit: int = Query(10, ge=1, le=100, description="每页数量"),
-    is_visible: Optional[bool] = Query(None, description="是否可见"),
-    is_deleted: Optional[bool] = Query(None, description="是否已删除"),
-    is_published: Optional[bool] = Query(None, description="是否已发布"),
-    include_unpublished: bool = Query(False, description="是否包含草稿"),
-    title: Optional[str] = Query(None, description="标题搜索关键词"),
-    column_id: Optional[int] = Query(None, description="专栏ID筛选"),
-    start_date: Optional[str] = Query(None, description="开始日期"),
-    end_date: Optional[str] = Query(None, description="结束日期"),
-    order_by: Optional[str] = Query(
-        "updated_at",
-        description="排序字段：created_at(创建时间) 或 updated_at(更新时间)"
-    ),
-    db: Session = Depends(get_db)
-) -> PostListResponse[PostRead]:
-    """
-    获取文章列表接口
-
-    支持分页、可见性、删除状态、标题搜索、专栏筛选和日期范围筛选，返回文章及其作者信息和统计数据。
-
-    参数:
-        page (int): 页码，从1开始，默认1
-        limit (int): 每页数量，默认10，最大100
-        is_visible (Optional[bool]): 是否可见筛选（可选）
-        is_deleted (Optional[bool]): 是否已删除筛选（可选）
-        title (Optional[str]): 标题搜索关键词（可选）
-        column_id (Optional[int]): 专栏ID筛选（可选）
-        start_date (Optional[str]): 开始日期（可选）
-        end_date (Optional[str]): 结束日期（可选）
-        db (Session): 数据库会话（依赖注入）
-
-    返回:
-        List[PostRead]: 文章列表，每项包含文章、作者信息和统计数据
-    """
-    # 构建查询，联表获取文章、用户资料和统计数据
-    statement = (
-        select(Post, UserProfile, PostStats)
-        .join(UserProfile, Post.user_id == UserProfile.user_id)
-        .outerjoin(PostStats, Post.id == PostStats.post_id)
-    )
-
+# 游标模式下总数缓存的有效期（秒）
+TOTAL_CACHE_TTL_SECONDS = 60
+# 总数缓存最多保留的筛选条件数（标题搜索词各不相同，需限制大小）
+TOTAL_CACHE_MAX_ENTRIES = 256
+
+# 筛选条件 -> (写入时间, 总数)，避免游标翻页时重复执行 COUNT(*)；按最近使用排序
+_total_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, int]]" = OrderedDict()
+_total_cache_lock = threading.Lock()
+
+
+def _apply_post_filters(
+    statement,
+    *,
+    is_visible: Optional[bool],
+    is_deleted: Optional[bool],
+    is_published: Optional[bool],
+    include_unpublished: bool,
+    title: Optional[str],
+    column_id: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str],
+):
+    """为文章查询（列表查询与计数查询共用）追加筛选条件"""
     # 处理删除状态过滤
     if is_deleted is not None:
         statement = statement.where(Post.is_deleted == is_deleted)
@@ -98,56 +85,211 @@ def list_posts(
     if end_date:
         statement = statement.where(Post.created_at <= end_date)
 
-    # 先获取总数
-    count_statement = select(func.count(Post.id))
-    # 应用相同的过滤条件
-    if is_deleted is not None:
-        count_statement = count_statement.where(Post.is_deleted == is_deleted)
-    else:
-        count_statement = count_statement.where(Post.is_deleted.is_(False))
+    return statement
 
-    if is_visible is not None:
-        count_statement = count_statement.where(Post.is_visible == is_visible)
 
-    if is_published is not None:
-        count_statement = count_statement.where(
-            Post.is_published == is_published
-        )
-    elif include_unpublished:
-        pass
+def _encode_cursor(post: Post, order_by: Optional[str]) -> str:
+    """将最后一条记录的排序键编码为不透明游标"""
+    if order_by == "created_at":
+        keys = [post.created_at.isoformat(), post.id]
     else:
-        count_statement = count_statement.where(Post.is_published.is_(True))
+        keys = [
+            post.updated_at.isoformat(),
+            post.created_at.isoformat(),
+            post.id,
+        ]
+    raw = json.dumps({"o": order_by or "updated_at", "k": keys})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, order_by: Optional[str]) -> List[Any]:
+    """解析游标，返回排序键；游标非法或与排序方式不符时返回400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        data = json.loads(raw)
+        keys = data["k"]
+        if data["o"] != (order_by or "updated_at"):
+            raise ValueError("order_by mismatch")
+        expected = 2 if order_by == "created_at" else 3
+        if len(keys) != expected:
+            raise ValueError("cursor length mismatch")
+        parsed = [datetime.fromisoformat(k) for k in keys[:-1]]
+        parsed.append(int(keys[-1]))
+        return parsed
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def _apply_cursor(statement, keys: List[Any], order_by: Optional[str]):
+    """按降序排序键追加 keyset 条件，取严格位于游标之后的记录"""
+    if order_by == "created_at":
+        created_at, post_id = keys
+        return statement.where(
+            or_(
+                Post.created_at < created_at,
+                and_(Post.created_at == created_at, Post.id < post_id),
+            )
+        )
 
-    if title:
-        count_statement = count_statement.where(Post.title.contains(title))
+    updated_at, created_at, post_id = keys
+    return statement.where(
+        or_(
+            Post.updated_at < updated_at,
+            and_(
+                Post.updated_at == updated_at,
+                Post.created_at < created_at,
+            ),
+            and_(
+                Post.updated_at == updated_at,
+                Post.created_at == created_at,
+                Post.id < post_id,
+            ),
+        )
+    )
 
-    if column_id:
-        count_statement = count_statement.join(
-            PostColumns, Post.id == PostColumns.post_id
-        ).where(PostColumns.column_id == column_id)
 
-    if start_date:
-        count_statement = count_statement.where(Post.created_at >= start_date)
-    if end_date:
-        count_statement = count_statement.where(Post.created_at <= end_date)
+def _count_posts(db: Session, cache_key: Optional[Tuple[Any, ...]],
+                 **filters) -> int:
+    """统计符合条件的文章数；传入 cache_key 时使用短期缓存"""
+    if cache_key is not None:
+        with _total_cache_lock:
+            cached = _total_cache.get(cache_key)
+            if cached and time.monotonic() - cached[0] < TOTAL_CACHE_TTL_SECONDS:
+                _total_cache.move_to_end(cache_key)
+                return cached[1]
 
+    count_statement = _apply_post_filters(
+        select(func.count(Post.id)), **filters
+    )
     total = db.exec(count_statement).one()
 
-    # 根据 order_by 参数决定排序方式
+    if cache_key is not None:
+        with _total_cache_lock:
+            _total_cache[cache_key] = (time.monotonic(), total)
+            _total_cache.move_to_end(cache_key)
+            while len(_total_cache) > TOTAL_CACHE_MAX_ENTRIES:
+                _total_cache.popitem(last=False)
+    return total
+
+
+@router.get("/", response_model=PostListResponse[PostRead])
+def list_posts(
+    page: int = Query(1, ge=1, description="页码"),
+    limit: int = Query(10, ge=1, le=100, description="每页数量"),
+    is_visible: Optional[bool] = Query(None, description="是否可见"),
+    is_deleted: Optional[bool] = Query(None, description="是否已删除"),
+    is_published: Optional[bool] = Query(None, description="是否已发布"),
+    include_unpublished: bool = Query(False, description="是否包含草稿"),
+    title: Optional[str] = Query(None, description="标题搜索关键词"),
+    column_id: Optional[int] = Query(None, description="专栏ID筛选"),
+    start_date: Optional[str] = Query(None, description="开始日期"),
+    end_date: Optional[str] = Query(None, description="结束日期"),
+    order_by: Optional[str] = Query(
+        "updated_at",
+        description="排序字段：created_at(创建时间) 或 updated_at(更新时间)"
+    ),
+    use_cursor: bool = Query(False, description="是否使用游标分页"),
+    cursor: Optional[str] = Query(
+        None, description="游标分页：上一页返回的 next_cursor"
+    ),
+    include_total: bool = Query(
+        False, description="游标分页时是否返回总数（带短期缓存）"
+    ),
+    db: Session = Depends(get_db)
+) -> PostListResponse[PostRead]:
+    """
+    获取文章列表接口
+
+    支持分页、可见性、删除状态、标题搜索、专栏筛选和日期范围筛选，返回文章及其作者信息和统计数据。
+
+    分页有两种模式：
+    - 默认的页码模式，使用 page/limit，并返回总数
+    - 游标模式（use_cursor=true 或传入 cursor），按排序键定位下一页，
+      每页代价与页码无关；仅在 include_total=true 时返回（缓存的）总数
+
+    参数:
+        page (int): 页码，从1开始，默认1（游标模式下忽略）
+        limit (int): 每页数量，默认10，最大100
+        is_visible (Optional[bool]): 是否可见筛选（可选）
+        is_deleted (Optional[bool]): 是否已删除筛选（可选）
+        title (Optional[str]): 标题搜索关键词（可选）
+        column_id (Optional[int]): 专栏ID筛选（可选）
+        start_date (Optional[str]): 开始日期（可选）
+        end_date (Optional[str]): 结束日期（可选）
+        use_cursor (bool): 是否使用游标分页
+        cursor (Optional[str]): 上一页返回的 next_cursor（可选）
+        include_total (bool): 游标模式下是否返回总数
+        db (Session): 数据库会话（依赖注入）
+
+    返回:
+        PostListResponse[PostRead]: 文章列表，每项包含文章、作者信息和统计数据
+    """
+    filters = dict(
+        is_visible=is_visible,
+        is_deleted=is_deleted,
+        is_published=is_published,
+        include_unpublished=include_unpublished,
+        title=title,
+        column_id=column_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    cursor_mode = use_cursor or cursor is not None
+
+    # 构建查询，联表获取文章、用户资料和统计数据
+    statement = _apply_post_filters(
+        select(Post, UserProfile, PostStats)
+        .join(UserProfile, Post.user_id == UserProfile.user_id)
+        .outerjoin(PostStats, Post.id == PostStats.post_id),
+        **filters
+    )
+
+    # 获取总数：页码模式每次统计，游标模式按需统计并缓存
+    if not cursor_mode:
+        total = _count_posts(db, None, **filters)
+    elif include_total:
+        cache_key = tuple(sorted(filters.items()))
+        total = _count_posts(db, cache_key, **filters)
+    else:
+        total = None
+
+    # 根据 order_by 参数决定排序方式，最后以 id 作为唯一的排序兜底
     if order_by == "created_at":
         # 按创建时间倒序排序
-        statement = statement.order_by(Post.created_at.desc())
+        statement = statement.order_by(
+            Post.created_at.desc(),
+            Post.id.desc()
+        )
     else:
         # 默认按更新时间倒序排序，如果更新时间为空则按创建时间倒序排序
         statement = statement.order_by(
             Post.updated_at.desc(),
-            Post.created_at.desc()
+            Post.created_at.desc(),
+            Post.id.desc()
         )
-    statement = statement.offset((page - 1) * limit).limit(limit)
+
+    if cursor_mode:
+        if cursor:
+            statement = _apply_cursor(
+                statement, _decode_cursor(cursor, order_by), order_by
+            )
+        # 多取一条用于判断是否还有下一页
+        statement = statement.limit(limit + 1)
+    else:
+        statement = statement.offset((page - 1) * limit).limit(limit)
 
     # 执行查询
     results = db.exec(statement).all()
 
+    next_cursor = None
+    if cursor_mode:
+        has_more = len(results) > limit
+        results = results[:limit]
+        if has_more:
+            next_cursor = _encode_cursor(results[-1][0], order_by)
+    else:
+        has_more = (page * limit) < total
+
     # 构建响应数据列表
     items = []
     for post, user_profile, post_stats in results:
@@ -170,8 +312,11 @@ def list_posts(
             'view_count': post_stats.view_count if post_stats else 0,
             'like_count': post_stats.like_count if post_stats else 0,
             'share_count': post_stats.share_count if post_stats else 0,
-            'comment_count': post_stats.comment_count if post_stats else 0
+            'comment_count': post_stats.comment_count if post_stats else 0,
+            'unique_visitors': post_stats.unique_visitors if post_stats else 0
         }
+        # 合并写缓冲中尚未落库的计数
+        counter_buffer.apply_pending(post.id, post_dict)
 
         # 校验并转换为响应模型
         post_data = PostRead.model_validate(post_dict)
@@ -188,7 +333,8 @@ def list_posts(
         total=total,
         page=page,
         limit=limit,
-        has_more=(page * limit) < total
+        has_more=has_more,
+        next_cursor=next_cursor
     )
 
 
@@ -203,6 +349,9 @@ def create_post(
     data["user_id"] = current_user.id
     post = Post.model_validate(data)
     db.add(post)
+    db.flush()
+    # 统计行与文章一起创建，后续计数只需 UPDATE
+    db.add(PostStats(post_id=post.id))
     db.commit()
     db.refresh(post)
     return PostRead.model_validate(post)
@@ -250,8 +399,11 @@ def get_popular_posts(
             'view_count': post_stats.view_count if post_stats else 0,
             'like_count': post_stats.like_count if post_stats else 0,
             'share_count': post_stats.share_count if post_stats else 0,
-            'comment_count': post_stats.comment_count if post_stats else 0
+            'comment_count': post_stats.comment_count if post_stats else 0,
+            'unique_visitors': post_stats.unique_visitors if post_stats else 0
         }
+        # 合并写缓冲中尚未落库的计数
+        counter_buffer.apply_pending(post.id, post_dict)
 
         post_data = PostRead.model_validate(post_dict)
         result.append(post_data)
@@ -371,8 +523,11 @@ def get_related_posts(
             'view_count': post_stats.view_count if post_stats else 0,
             'like_count': post_stats.like_count if post_stats else 0,
             'share_count': post_stats.share_count if post_stats else 0,
-            'comment_count': post_stats.comment_count if post_stats else 0
+            'comment_count': post_stats.comment_count if post_stats else 0,
+            'unique_visitors': post_stats.unique_visitors if post_stats else 0
         }
+        # 合并写缓冲中尚未落库的计数
+        counter_buffer.apply_pending(post.id, post_dict)
 
         # 校验并转换为响应模型
         post_data = PostRead.model_validate(post_dict)
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.api.routers.attachments import classify_upload, create_attachment_record
+from app.api.routers.auth import get_current_user
+from app.api.routers.local_music import (
+    ALLOWED_FORMATS,
+    MAX_FILE_SIZE as MAX_MUSIC_SIZE,
+    create_music_record,
+    music_record_committed,
+)
+from app.core.config import settings
+from app.db.session import get_db
+from app.models.uploadSession import (
+    UploadPurpose,
+    UploadSession,
+    UploadSessionCreate,
+    UploadSessionRead,
+    UploadSessionStatus,
+)
+from app.models.user import UserRead
+from app.services.audioMetadata import probe_music_file
+from app.services.blobStore import put_file, unlink_released
+from app.services.resumableUpload import (
+    cleanup_expired_sessions,
+    commit_chunk,
+    create_part_file,
+    file_sha256,
+    new_expiry,
+    part_path,
+    receive_chunk,
+    remove_part_file,
+)
+
+router = APIRouter(prefix="/resumable-uploads", tags=["resumable-uploads"])
+
+# 过期会话的清理间隔（秒），在创建新会话时顺带执行
+CLEANUP_INTERVAL_SECONDS = 600
+_last_cleanup = 0.0
+
+# 完成时允许传给附件记录的字段
+ATTACHMENT_FIELDS = (
+    "title", "description", "tags", "is_public", "is_featured",
+    "related_type", "related_id",
+)
+# 完成时允许传给音乐记录的字段
+MUSIC_FIELDS = (
+    "title", "artist", "album", "genre", "year", "lyrics", "playlist_id",
+)
+
+
+def _to_read(upload: UploadSession) -> UploadSessionRead:
+    return UploadSessionRead(
+        id=upload.id,
+        purpose=upload.purpose,
+        filename=upload.filename,
+        total_size=upload.total_size,
+        received_size=upload.received_size,
+        status=upload.status,
+        result_id=upload.result_id,
+        chunk_size=settings.resumable_chunk_size,
+        expires_at=upload.expires_at,
+    )
+
+
+def _get_upload(db: Session, upload_id: str, current_user: UserRead) -> UploadSession:
+    upload = db.get(UploadSession, upload_id)
+    if (
+        not upload
+        or upload.uploaded_by != current_user.id
+        or upload.expires_at < datetime.utcnow()
+    ):
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return upload
+
+
+def _require_uploading(upload: UploadSession) -> None:
+    if upload.status != UploadSessionStatus.UPLOADING.value:
+        raise HTTPException(status_code=409, detail="上传会话已完成")
+
+
+@router.post("", response_model=UploadSessionRead)
+def initiate_upload(
+    data: UploadSessionCreate,
+    current_user: UserRead = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> UploadSessionRead:
+    """创建断点续传会话"""
+    global _last_cleanup
+    if time.monotonic() - _last_cleanup > CLEANUP_INTERVAL_SECONDS:
+        _last_cleanup = time.monotonic()
+        cleanup_expired_sessions(db)
+
+    file_extension = os.path.splitext(data.filename)[1].lower()
+    if data.purpose == UploadPurpose.MUSIC:
+        if file_extension not in ALLOWED_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的文件格式。支持的格式: {', '.join(ALLOWED_FORMATS)}"
+            )
+        max_size = MAX_MUSIC_SIZE
+        allowed_fields = MUSIC_FIELDS
+    else:
+        max_size = settings.resumable_max_attachment_size
+        allowed_fields = ATTACHMENT_FIELDS
+
+    if data.total_size > max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件大小超过限制。最大允许: {max_size // (1024 * 1024)}MB"
+        )
+
+    form_data = {
+        key: value for key, value in data.form_data.items()
+        if key in allowed_fields
+    }
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        purpose=data.purpose.value,
+        filename=data.filename,
+        content_type=data.content_type,
+        total_size=data.total_size,
+        sha256=data.sha256.lower() if data.sha256 else None,
+        form_data=json.dumps(form_data, ensure_ascii=False),
+        uploaded_by=current_user.id,
+        expires_at=new_expiry(),
+    )
+    create_part_file(upload.id)
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+
+    return _to_read(upload)
+
+
+@router.get("/{upload_id}", response_model=UploadSessionRead)
+def get_upload_status(
+    upload_id: str,
+    current_user: UserRead = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> UploadSessionRead:
+    """查询上传进度，客户端从 received_size 处继续上传"""
+    return _to_read(_get_upload(db, upload_id, current_user))
+
+
+@router.put("/{upload_id}", response_model=UploadSessionRead)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="分块在文件中的起始偏移"),
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256", description="分块的SHA-256"),
+    current_user: UserRead = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> UploadSessionRead:
+    """上传一个分块（请求体为原始二进制数据）
+
+    offset 必须等于当前已接收的字节数，否则返回 409，
+    客户端应查询进度后从 received_size 处继续。
+    """
+    upload = _get_upload(db, upload_id, current_user)
+    _require_uploading(upload)
+    if offset != upload.received_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"偏移不匹配，当前已接收 {upload.received_size} 字节",
+            headers={"Upload-Offset": str(upload.received_size)},
+        )
+
+    chunk_path, written = await receive_chunk(
+        upload, offset, request.stream(), chunk_sha256
+    )
+
+    # 在会话行锁内写入数据文件并推进进度，并发请求中只有一个能成功
+    committed = await asyncio.to_thread(
+        commit_chunk, db, upload_id, offset, chunk_path, written
+    )
+    if not committed:
+        db.refresh(upload)
+        raise HTTPException(
+            status_code=409,
+            detail=f"偏移不匹配，当前已接收 {upload.received_size} 字节",
+            headers={"Upload-Offset": str(upload.received_size)},
+        )
+
+    db.refresh(upload)
+    return _to_read(upload)
+
+
+@router.post("/{upload_id}/complete")
+def complete_upload(
+    upload_id: str,
+    current_user: UserRead = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> dict:
+    """完成上传：校验文件后移动到正式目录，并创建附件或音乐记录"""
+    upload = _get_upload(db, upload_id, current_user)
+    _require_uploading(upload)
+    if upload.received_size != upload.total_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件尚未上传完整，已接收 {upload.received_size}/{upload.total_size} 字节"
+        )
+
+    source_path = part_path(upload.id)
+    sha256 = file_sha256(source_path)
+    if upload.sha256 and sha256 != upload.sha256:
+        raise HTTPException(status_code=400, detail="文件校验和不一致")
+
+    # 把会话标记为已完成，和内容存储引用、记录、result_id 在同一事务中一次提交；
+    # 并发的完成请求会在这里等待行锁，之后因状态已改变而返回 409
+    table = UploadSession.__table__
+    result = db.exec(
+        update(table)
+        .where(
+            table.c.id == upload.id,
+            table.c.status == UploadSessionStatus.UPLOADING.value,
+        )
+        .values(
+            status=UploadSessionStatus.COMPLETED.value,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="上传会话已完成")
+
+    form_data = json.loads(upload.form_data or "{}")
+    file_extension = os.path.splitext(upload.filename)[1].lower()
+    if upload.purpose == UploadPurpose.MUSIC.value:
+        upload_dir = "uploads/music"
+    else:
+        file_category, upload_dir = classify_upload(upload.content_type)
+
+    stored_path = None
+    cover_path = None
+    try:
+        blob = put_file(
+            db, source_path, sha256, upload.total_size,
+            upload_dir, file_extension,
+        )
+        stored_path = blob.file_path
+        if upload.purpose == UploadPurpose.MUSIC.value:
+            metadata, embedded_cover_url = probe_music_file(db, blob.file_path)
+            if embedded_cover_url:
+                cover_path = embedded_cover_url.lstrip('/')
+            record = create_music_record(
+                db,
+                file_url=f"/{blob.file_path}",
+                cover_image_url=embedded_cover_url,
+                metadata=metadata,
+                original_filename=upload.filename,
+                commit=False,
+                **{key: (str(value) if value is not None else None)
+                   for key, value in form_data.items()},
+            )
+            result_id = record["id"]
+        else:
+            attachment = create_attachment_record(
+                db,
+                file_path=blob.file_path,
+                original_name=upload.filename,
+                content_type=upload.content_type,
+                file_category=file_category,
+                file_size=upload.total_size,
+                uploaded_by=current_user.id,
+                blob_sha256=blob.sha256,
+                commit=False,
+                **form_data,
+            )
+            record = attachment.model_dump(mode="json")
+            result_id = attachment.id
+
+        db.exec(
+            update(table)
+            .where(table.c.id == upload.id)
+            .values(result_id=result_id, updated_at=datetime.utcnow())
+        )
+        db.commit()
+    except Exception as e:
+        # 提交前任一步失败：回滚会恢复会话状态，再把数据放回以便重试完成
+        db.rollback()
+        if stored_path and not os.path.exists(source_path):
+            shutil.copyfile(stored_path, source_path)
+        unlink_released(db, [stored_path, cover_path])
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"完成上传失败: {str(e)}")
+
+    if upload.purpose == UploadPurpose.MUSIC.value:
+        music_record_committed(db, record)
+    db.refresh(upload)
+
+    return {"upload": _to_read(upload), "result": record}
+
+
+@router.delete("/{upload_id}")
+def abort_upload(
+    upload_id: str,
+    current_user: UserRead = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> dict:
+    """取消上传并删除已接收的数据"""
+    upload = _get_upload(db, upload_id, current_user)
+    _require_uploading(upload)
+    remove_part_file(upload.id)
+    db.delete(upload)
+    db.commit()
+    return {"message": "上传已取消"}
@@ -1,5 +1,6 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select, func
 
 from app.db.session import get_session
@@ -7,6 +8,7 @@ from app.models.user import User
 from app.models.post import Post
 from app.models.moments import Moments
 from app.models.postStats import PostStats
+from app.services.statsEventLog import daily_series, hourly_series
 
 router = APIRouter()
 
@@ -69,3 +71,68 @@ def get_stats_summary(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取统计数据失败: {str(e)}"
         )
+
+
+def _date_range(days: int, start: Optional[date], end: Optional[date]):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=days - 1)
+    if start > end or (end - start).days >= 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="日期范围无效（最长366天）"
+        )
+    return start, end
+
+
+@router.get("/stats/daily")
+def get_site_daily_stats(
+    *,
+    session: Session = Depends(get_session),
+    days: int = Query(30, ge=1, le=366, description="最近多少天（含今天）"),
+    start: Optional[date] = Query(None, description="开始日期（UTC），指定时忽略 days"),
+    end: Optional[date] = Query(None, description="结束日期（UTC），默认今天"),
+):
+    """全站每天的浏览、点赞、分享、评论数（来自事件汇总，有几分钟延迟）"""
+    start, end = _date_range(days, start, end)
+    return {
+        "start": start,
+        "end": end,
+        "days": daily_series(session, start, end)
+    }
+
+
+@router.get("/stats/posts/{post_id}/daily")
+def get_post_daily_stats(
+    *,
+    session: Session = Depends(get_session),
+    post_id: int,
+    days: int = Query(30, ge=1, le=366, description="最近多少天（含今天）"),
+    start: Optional[date] = Query(None, description="开始日期（UTC），指定时忽略 days"),
+    end: Optional[date] = Query(None, description="结束日期（UTC），默认今天"),
+):
+    """文章每天的浏览、点赞、分享、评论数（来自事件汇总，有几分钟延迟）"""
+    start, end = _date_range(days, start, end)
+    return {
+        "post_id": post_id,
+        "start": start,
+        "end": end,
+        "days": daily_series(session, start, end, post_id=post_id)
+    }
+
+
+@router.get("/stats/posts/{post_id}/hourly")
+def get_post_hourly_stats(
+    *,
+    session: Session = Depends(get_session),
+    post_id: int,
+    hours: int = Query(48, ge=1, le=24 * 14, description="最近多少小时（含当前小时）"),
+):
+    """文章最近每小时的浏览、点赞、分享、评论数（UTC，来自事件汇总）"""
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(hours=hours - 1)
+    return {
+        "post_id": post_id,
+        "start": start,
+        "end": end,
+        "hours": hourly_series(session, post_id, start, end)
+    }
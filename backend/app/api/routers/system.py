@@ -14,6 +14,7 @@ from app.models.system import (
     SystemDefaultCreate,
 )
 from app.models.user import User
+from app.services.settingsCache import settings_cache
 
 router = APIRouter(prefix="/system", tags=["system"])
 
@@ -170,6 +171,7 @@ def create_default(
     db.add(default)
     db.commit()
     db.refresh(default)
+    settings_cache.invalidate()
 
     return SystemDefaultRead.model_validate(default)
 
@@ -196,6 +198,7 @@ def update_default(
     db.add(default)
     db.commit()
     db.refresh(default)
+    settings_cache.invalidate()
 
     return SystemDefaultRead.model_validate(default)
 
@@ -277,6 +280,7 @@ def update_default_by_key(
     db.add(default)
     db.commit()
     db.refresh(default)
+    settings_cache.invalidate()
 
     return SystemDefaultRead.model_validate(default)
 
@@ -297,6 +301,7 @@ def delete_default(
 
     db.delete(default)
     db.commit()
+    settings_cache.invalidate()
 
     return {"message": "参数删除成功"}
 
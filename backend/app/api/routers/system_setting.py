@@ -10,6 +10,7 @@ from app.models.system_setting import (
     SystemSettingUpdate, SystemSettingBatchUpdate, AISettingConfig
 )
 from app.models.user import User
+from app.services.settingsCache import settings_cache
 
 router = APIRouter(tags=["system-setting"])
 
@@ -79,6 +80,7 @@ def update_setting_by_key(
     session.add(setting)
     session.commit()
     session.refresh(setting)
+    settings_cache.invalidate()
 
     return {"message": "设置更新成功", "setting": setting}
 
@@ -112,6 +114,7 @@ def batch_update_settings(
             updated_count += 1
 
     session.commit()
+    settings_cache.invalidate()
     return {"message": f"批量更新成功，共更新 {updated_count} 个设置"}
 
 
@@ -184,6 +187,7 @@ def update_ai_config(
             updated_count += 1
 
     session.commit()
+    settings_cache.invalidate()
     return {"message": f"AI配置更新成功，共更新 {updated_count} 个设置"}
 
 
@@ -258,16 +262,10 @@ async def test_ai_connection(
 
 @router.get("/public/{category}", response_model=List[SystemSettingRead])
 def get_public_settings(
-    category: str,
-    session: Session = Depends(get_session)
+    category: str
 ) -> List[SystemSettingRead]:
     """获取公开设置"""
-    statement = select(SystemSetting).where(
-        SystemSetting.category == category,
-        SystemSetting.is_public == True
-    ).order_by(SystemSetting.sort_order)
-    settings = session.exec(statement).all()
-    return settings
+    return settings_cache.get_settings_by_category(category, public_only=True)
 
 
 @router.delete("/{setting_id}")
@@ -286,4 +284,5 @@ def delete_setting(
 
     session.delete(setting)
     session.commit()
+    settings_cache.invalidate()
     return {"message": "设置删除成功"}
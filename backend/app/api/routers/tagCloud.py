@@ -6,10 +6,12 @@ from app.models.tagCloud import (
     TagCloud, TagCloudCreate, TagCloudUpdate, TagCloudRead,
     TagCloudFetchHistoryRead
 )
+from app.services.settingsCache import settings_cache
 from app.services.tagCloud import TagCloudService
 from app.scheduler.tag_cloud_scheduler import (
     update_schedule_time, get_schedule_time, get_next_run_time,
-    update_schedule_config, get_schedule_config, update_search_keywords
+    update_schedule_config, get_schedule_config, update_search_keywords,
+    get_job_status
 )
 from app.api.routers.auth import get_current_admin
 from app.models.user import User
@@ -306,6 +308,14 @@ async def getScheduleConfig():
     }
 
 
+@router.get("/schedule/status")
+def getScheduleStatus(
+    currentUser: User = Depends(get_current_admin)
+):
+    """获取定时任务运行状态（管理员）"""
+    return get_job_status()
+
+
 @router.put("/schedule/time")
 async def updateScheduleTime(
     time_data: dict,
@@ -471,6 +481,7 @@ async def updateSearchKeywords(
 
         session.commit()
         session.close()
+        settings_cache.invalidate()
         logger.info("系统设置中的搜索关键词和提示词模板已更新")
 
     except Exception as e:
@@ -725,20 +736,18 @@ async def reassignTagColors(
         try:
             tag_service = TagCloudService(session)
 
-            # 获取所有标签
-            statement = select(TagCloud)
-            all_tags = session.exec(statement).all()
-
-            updated_count = 0
-            for tag in all_tags:
-                # 重新分配颜色
-                old_color = tag.color
-                tag.color = tag_service.determine_tag_color(tag.category)
-                session.add(tag)
-                updated_count += 1
-                logger.info(f"标签 '{tag.name}' 颜色从 {old_color} 更新为 {tag.color}")
+            # 获取所有标签，只更新颜色发生变化的标签
+            statement = select(TagCloud.id, TagCloud.category, TagCloud.color)
+            rows = []
+            for tag_id, category, old_color in session.exec(statement):
+                new_color = tag_service.determine_tag_color(category)
+                if new_color != old_color:
+                    rows.append({"id": tag_id, "color": new_color})
 
+            # 一条批量 UPDATE 写回
+            updated_count = tag_service.bulk_update_tags(rows)
             session.commit()
+            logger.info(f"重新分配了 {updated_count} 个标签的颜色")
 
             return {
                 "message": f"成功重新分配了 {updated_count} 个标签的颜色",
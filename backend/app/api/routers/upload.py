@@ -1,13 +1,19 @@
 import os
-import uuid
 from datetime import datetime
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from typing import Optional
+
+from fastapi import (
+    APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+)
 from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
 
 from app.db.session import get_db
 from app.api.routers.auth import get_current_user
 from app.models.user import UserRead, UserProfile
+from app.api.routers.media import serve_image
+from app.services.imageDerivatives import image_derivatives
+from app.services.uploadStorage import save_upload_blob
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
@@ -36,32 +42,23 @@ async def upload_image(
                 detail=f"不支持的文件类型。支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"
             )
 
-        # 检查文件大小
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"文件大小超过限制。最大允许: {MAX_FILE_SIZE // (1024*1024)}MB"
-            )
-
-        # 生成唯一文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"{timestamp}_{unique_id}{file_extension}"
-
-        # 保存文件
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        # 分块保存到内容存储（按内容哈希命名，相同图片只保留一份），
+        # 超过大小限制时立即中止
+        stored = await save_upload_blob(
+            db, file, UPLOAD_DIR, file_extension, MAX_FILE_SIZE
+        )
+        filename = os.path.basename(stored.path)
 
         # 生成访问URL
-        file_url = f"/uploads/images/{filename}"
+        file_url = f"/{stored.path}"
+        db.commit()
+        image_derivatives.pregenerate(stored.path)
 
         return JSONResponse({
             "success": True,
             "url": file_url,
             "filename": filename,
-            "size": len(content)
+            "size": stored.size
         })
 
     except HTTPException:
@@ -73,18 +70,20 @@ async def upload_image(
         )
 
 
-@router.get("/images/{filename}")
-async def get_image(filename: str):
+@router.api_route("/images/{filename}", methods=["GET", "HEAD"])
+async def get_image(
+    filename: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="缩略图宽度"),
+    fmt: Optional[str] = Query(
+        None, pattern="^(webp|jpeg)$", description="缩略图格式"
+    ),
+):
     """
-    获取上传的图片
+    获取上传的图片，指定 w 时返回对应宽度的缩略图
     """
     try:
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="图片不存在")
-
-        from fastapi.responses import FileResponse
-        return FileResponse(file_path)
+        return await serve_image(request, filename, w, fmt)
 
     except HTTPException:
         raise
@@ -113,26 +112,15 @@ async def upload_avatar(
                 detail=f"不支持的文件类型。支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"
             )
 
-        # 检查文件大小
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"文件大小超过限制。最大允许: {MAX_FILE_SIZE // (1024*1024)}MB"
-            )
-
-        # 生成唯一文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"{timestamp}_{unique_id}{file_extension}"
-
-        # 保存文件
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        # 分块保存到内容存储（按内容哈希命名，相同图片只保留一份），
+        # 超过大小限制时立即中止
+        stored = await save_upload_blob(
+            db, file, UPLOAD_DIR, file_extension, MAX_FILE_SIZE
+        )
+        filename = os.path.basename(stored.path)
 
         # 生成访问URL
-        file_url = f"/uploads/images/{filename}"
+        file_url = f"/{stored.path}"
 
         # 更新用户个人信息表中的头像
         user_profile_query = select(UserProfile).where(
@@ -156,13 +144,14 @@ async def upload_avatar(
             db.add(new_profile)
 
         db.commit()
+        image_derivatives.pregenerate(stored.path)
 
         return JSONResponse({
             "success": True,
             "data": {
                 "url": file_url,
                 "filename": filename,
-                "size": len(content)
+                "size": stored.size
             },
             "message": "头像上传成功"
         })
@@ -24,6 +24,18 @@ class Settings:
         jwt_cfg = raw.get("jwt", {})
         admin_cfg = raw.get("admin", {})
         image_cfg = raw.get("image_search", {})
+        stats_cfg = raw.get("post_stats", {})
+        http_cfg = raw.get("http_client", {})
+        tag_cloud_cfg = raw.get("tag_cloud", {})
+        scheduler_cfg = raw.get("scheduler", {})
+        settings_cache_cfg = raw.get("settings_cache", {})
+        sql_stats_cfg = raw.get("sql_stats", {})
+        resumable_cfg = raw.get("resumable_upload", {})
+        derivative_cfg = raw.get("image_derivatives", {})
+        media_cfg = raw.get("media", {})
+        local_music_cfg = raw.get("local_music", {})
+        music_cfg = raw.get("music_provider", {})
+        events_cfg = raw.get("stats_events", {})
 
         self.environment: str = server_cfg.get("environment", "development")
         self.port: int = int(server_cfg.get("port", 8000))
@@ -42,6 +54,8 @@ class Settings:
                 "url",
                 "sqlite:///./dev.db",
             )
+        # 是否把每条SQL语句输出到日志（仅排查问题时开启）
+        self.database_echo: bool = bool(db_cfg.get("echo", False))
 
         self.cors_allow_origins: List[str] = cors_cfg.get(
             "allow_origins", ["*"]
@@ -67,5 +81,175 @@ class Settings:
             "unsplash_access_key", "demo_key"
         )
 
+        # 文章统计计数写缓冲的刷新间隔（秒）
+        self.post_stats_flush_interval: float = float(
+            stats_cfg.get("flush_interval_seconds", 5)
+        )
+        # 点赞去重过滤器和浏览去重窗口
+        self.like_filter_false_positive_rate: float = float(
+            stats_cfg.get("like_filter_false_positive_rate", 0.01)
+        )
+        self.like_filter_max_bytes: int = int(
+            stats_cfg.get("like_filter_max_bytes", 16 * 1024 * 1024)
+        )
+        self.like_filter_sync_interval: float = float(
+            stats_cfg.get("like_filter_sync_interval_seconds", 5)
+        )
+        self.view_dedup_window_minutes: float = float(
+            stats_cfg.get("view_dedup_window_minutes", 30)
+        )
+        self.view_dedup_max_entries: int = int(
+            stats_cfg.get("view_dedup_max_entries", 100000)
+        )
+        # 独立访客草图的写回间隔（秒）
+        self.visitor_sketch_flush_interval: float = float(
+            stats_cfg.get("visitor_sketch_flush_interval_seconds", 10)
+        )
+
+        # 共享 HTTP 客户端连接池
+        self.http_pool_limit: int = int(http_cfg.get("pool_limit", 100))
+        self.http_pool_limit_per_host: int = int(
+            http_cfg.get("pool_limit_per_host", 10)
+        )
+
+        # 标签云多源获取：参与的热门来源、单个来源超时和并发上限
+        self.tag_cloud_trending_sources: List[str] = tag_cloud_cfg.get(
+            "trending_sources", ["github", "stackoverflow", "reddit"]
+        )
+        self.tag_cloud_source_timeout: float = float(
+            tag_cloud_cfg.get("source_timeout_seconds", 15)
+        )
+        self.tag_cloud_max_concurrency: int = int(
+            tag_cloud_cfg.get("max_concurrency", 4)
+        )
+
+        # 定时任务选主租约：租约有效期和续约间隔（秒）
+        self.scheduler_lease_ttl: float = float(
+            scheduler_cfg.get("lease_ttl_seconds", 60)
+        )
+        self.scheduler_heartbeat_interval: float = float(
+            scheduler_cfg.get("heartbeat_interval_seconds", 15)
+        )
+
+        # 系统设置缓存：检查其他进程是否修改过设置的最短间隔（秒）
+        self.settings_cache_check_interval: float = float(
+            settings_cache_cfg.get("version_check_interval_seconds", 5)
+        )
+
+        # SQL查询统计：慢查询阈值（毫秒）和日志采样率
+        self.sql_slow_query_ms: float = float(
+            sql_stats_cfg.get("slow_query_ms", 200)
+        )
+        self.sql_slow_query_sample_rate: float = float(
+            sql_stats_cfg.get("slow_query_sample_rate", 1.0)
+        )
+        # 单个请求查询次数达到该值时记录告警
+        self.sql_request_query_warn: int = int(
+            sql_stats_cfg.get("request_query_warn", 50)
+        )
+        # 每个请求保留的最慢语句条数、进程内汇总的语句种类上限
+        self.sql_stats_request_slowest: int = int(
+            sql_stats_cfg.get("request_slowest", 3)
+        )
+        self.sql_stats_max_statements: int = int(
+            sql_stats_cfg.get("max_statements", 500)
+        )
+        # 是否返回 Server-Timing 响应头，默认仅开发环境开启
+        server_timing = sql_stats_cfg.get("server_timing")
+        self.sql_server_timing: bool = (
+            self.environment == "development"
+            if server_timing is None else bool(server_timing)
+        )
+
+        # 断点续传：单个分块上限、未完成会话的过期时间和附件大小上限
+        self.resumable_chunk_size: int = int(
+            resumable_cfg.get("chunk_size", 8 * 1024 * 1024)
+        )
+        self.resumable_expire_hours: float = float(
+            resumable_cfg.get("expire_hours", 24)
+        )
+        self.resumable_max_attachment_size: int = int(
+            resumable_cfg.get("max_attachment_size", 1024 * 1024 * 1024)
+        )
+
+        # 图片缩略图：可用宽度、格式质量、上传后预生成的格式、
+        # 处理进程数、按需生成的并发上限和磁盘缓存上限
+        self.image_derivative_widths: List[int] = sorted(
+            int(w) for w in derivative_cfg.get("widths", [320, 480, 768, 1200])
+        )
+        self.image_derivative_webp_quality: int = int(
+            derivative_cfg.get("webp_quality", 80)
+        )
+        self.image_derivative_jpeg_quality: int = int(
+            derivative_cfg.get("jpeg_quality", 82)
+        )
+        self.image_derivative_pregenerate: List[str] = list(
+            derivative_cfg.get("pregenerate_formats", ["webp"])
+        )
+        self.image_derivative_workers: int = int(
+            derivative_cfg.get("workers", 2)
+        )
+        self.image_derivative_concurrency: int = int(
+            derivative_cfg.get("max_concurrent", 4)
+        )
+        self.image_derivative_cache_bytes: int = int(
+            derivative_cfg.get("cache_max_bytes", 1024 * 1024 * 1024)
+        )
+
+        # 媒体文件：缓存的非内容寻址文件哈希数量、下载次数写回间隔（秒）
+        self.media_hash_cache_size: int = int(
+            media_cfg.get("hash_cache_size", 4096)
+        )
+        self.media_download_flush_interval: float = float(
+            media_cfg.get("download_flush_interval_seconds", 10)
+        )
+
+        # 本地音乐：公开播放列表清单检查其他进程修改的最短间隔（秒）
+        self.music_manifest_check_interval: float = float(
+            local_music_cfg.get("manifest_check_interval_seconds", 5)
+        )
+        # 本地音乐搜索索引增量同步其他进程修改的最短间隔（秒）
+        self.music_search_sync_interval: float = float(
+            local_music_cfg.get("search_index_sync_interval_seconds", 5)
+        )
+
+        # 在线音乐接口：数据来源（netease 或离线的 stub）、超时、并发上限和缓存
+        self.music_provider: str = music_cfg.get("provider", "netease")
+        self.music_provider_timeout: float = float(
+            music_cfg.get("timeout_seconds", 8)
+        )
+        self.music_provider_max_concurrency: int = int(
+            music_cfg.get("max_concurrency", 8)
+        )
+        self.music_search_cache_ttl: float = float(
+            music_cfg.get("search_cache_ttl_seconds", 600)
+        )
+        self.music_song_url_cache_ttl: float = float(
+            music_cfg.get("song_url_cache_ttl_seconds", 300)
+        )
+        self.music_cache_max_entries: int = int(
+            music_cfg.get("cache_max_entries", 1000)
+        )
+
+        # 统计事件日志：目录、批量写入间隔、分段封存条件、汇总间隔和分段保留天数
+        self.stats_events_directory: str = events_cfg.get(
+            "directory", "logs/stats_events"
+        )
+        self.stats_events_flush_interval: float = float(
+            events_cfg.get("flush_interval_seconds", 2)
+        )
+        self.stats_events_segment_max_bytes: int = int(
+            events_cfg.get("segment_max_bytes", 4 * 1024 * 1024)
+        )
+        self.stats_events_segment_max_age: float = float(
+            events_cfg.get("segment_max_age_seconds", 300)
+        )
+        self.stats_events_rollup_interval: float = float(
+            events_cfg.get("rollup_interval_seconds", 60)
+        )
+        self.stats_events_retain_days: float = float(
+            events_cfg.get("retain_days", 30)
+        )
+
 
 settings = Settings()
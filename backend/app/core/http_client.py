@@ -0,0 +1,77 @@
+"""
+共享的 aiohttp 客户端
+
+应用启动时在主事件循环上创建一个长连接池客户端，关闭时释放，
+各外部接口调用通过 http_session() 复用同一个连接池。
+"""
+import asyncio
+import logging
+import ssl
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    # 与原有外部请求保持一致：不校验证书
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=settings.http_pool_limit,
+        limit_per_host=settings.http_pool_limit_per_host,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def start_http_client() -> None:
+    """在当前事件循环上创建共享客户端（在应用启动时调用）"""
+    global _session, _loop
+    if _session is not None and not _session.closed:
+        return
+    _session = _create_session()
+    _loop = asyncio.get_running_loop()
+    logger.info("Shared HTTP client started")
+
+
+async def close_http_client() -> None:
+    """关闭共享客户端（在应用关闭时调用）"""
+    global _session, _loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _loop = None
+    logger.info("Shared HTTP client closed")
+
+
+@asynccontextmanager
+async def http_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """获取可用的客户端会话
+
+    在应用主事件循环上直接复用共享连接池；在其他事件循环中
+    （例如后台线程里的任务）无法复用，则创建临时会话并在用完后关闭。
+    """
+    if (
+        _session is not None
+        and not _session.closed
+        and _loop is asyncio.get_running_loop()
+    ):
+        yield _session
+        return
+
+    session = _create_session()
+    try:
+        yield session
+    finally:
+        await session.close()
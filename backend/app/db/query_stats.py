@@ -0,0 +1,215 @@
+"""
+SQL 查询统计
+
+基于 SQLAlchemy 引擎事件记录每条语句的耗时：
+- 按请求统计查询次数和数据库总耗时，调试模式下通过 Server-Timing 响应头返回
+- 超过阈值的慢查询按采样率记录日志（带路由）
+- 进程内按语句汇总次数、累计耗时和最大耗时，供管理接口查看
+"""
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 展开的 IN 参数列表折叠为一个占位，避免同一语句因参数个数不同而分散统计
+_IN_LIST_RE = re.compile(
+    r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+MAX_STATEMENT_LENGTH = 1000
+
+
+def normalize_statement(statement: str) -> str:
+    """规范化语句文本作为统计键"""
+    text = _WHITESPACE_RE.sub(" ", statement).strip()
+    text = _IN_LIST_RE.sub("(?, ...)", text)
+    return text[:MAX_STATEMENT_LENGTH]
+
+
+class RequestQueryStats:
+    """单个请求内的查询统计"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest: List[dict] = []
+
+    @property
+    def route(self) -> str:
+        """路由模板（路由匹配后可用），否则为请求路径"""
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or self.scope.get("path", "")
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.slowest.append({"statement": statement, "duration": duration})
+        self.slowest.sort(key=lambda item: item["duration"], reverse=True)
+        del self.slowest[settings.sql_stats_request_slowest:]
+
+
+class StatementStats:
+    """按语句汇总的进程内统计"""
+
+    def __init__(self, max_statements: int):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+        self.dropped = 0
+        # 最近的慢请求（查询过多或数据库耗时过长），附带最慢的几条语句
+        self.slow_requests = deque(maxlen=50)
+
+    def record(self, statement: str, duration: float, route: Optional[str]) -> None:
+        with self._lock:
+            item = self._stats.get(statement)
+            if item is None:
+                if len(self._stats) >= self.max_statements:
+                    self.dropped += 1
+                    return
+                item = self._stats[statement] = {
+                    "statement": statement,
+                    "count": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                    "max_route": None,
+                }
+            item["count"] += 1
+            item["total_time"] += duration
+            if duration >= item["max_time"]:
+                item["max_time"] = duration
+                item["max_route"] = route
+
+    def top(self, limit: int = 20, order_by: str = "total_time") -> List[dict]:
+        """按累计耗时（或次数、最大耗时）取前若干条语句，时间单位为毫秒"""
+        with self._lock:
+            items = [dict(item) for item in self._stats.values()]
+        items.sort(key=lambda item: item[order_by], reverse=True)
+        result = []
+        for item in items[:limit]:
+            result.append({
+                "statement": item["statement"],
+                "count": item["count"],
+                "total_ms": round(item["total_time"] * 1000, 3),
+                "avg_ms": round(item["total_time"] * 1000 / item["count"], 3),
+                "max_ms": round(item["max_time"] * 1000, 3),
+                "max_route": item["max_route"],
+            })
+        return result
+
+    def record_request(self, stats: RequestQueryStats) -> None:
+        self.slow_requests.append({
+            "route": stats.route,
+            "at": datetime.utcnow().isoformat(),
+            "count": stats.count,
+            "total_ms": round(stats.total_time * 1000, 3),
+            "slowest": [
+                {"statement": item["statement"],
+                 "duration_ms": round(item["duration"] * 1000, 3)}
+                for item in stats.slowest
+            ],
+        })
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.dropped = 0
+        self.slow_requests.clear()
+
+
+statement_stats = StatementStats(settings.sql_stats_max_statements)
+
+_current_request: contextvars.ContextVar[Optional[RequestQueryStats]] = (
+    contextvars.ContextVar("sql_request_stats", default=None)
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    normalized = normalize_statement(statement)
+    request_stats = _current_request.get()
+    route = request_stats.route if request_stats is not None else None
+
+    if request_stats is not None:
+        request_stats.record(normalized, duration)
+    statement_stats.record(normalized, duration, route)
+
+    if (
+        duration * 1000 >= settings.sql_slow_query_ms
+        and random.random() < settings.sql_slow_query_sample_rate
+    ):
+        logger.warning(
+            f"Slow query {duration * 1000:.1f}ms [{route or 'background'}]: {normalized}"
+        )
+
+
+def install_query_stats(engine: Engine) -> None:
+    """在引擎上注册查询统计事件"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """为每个 HTTP 请求建立查询统计上下文
+
+    调试模式下在响应头中返回 ``Server-Timing: db;dur=...;desc="N queries"``。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope)
+        token = _current_request.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.sql_server_timing:
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    (
+                        f'db;dur={stats.total_time * 1000:.2f};'
+                        f'desc="{stats.count} queries"'
+                    ).encode("latin-1"),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            if (
+                stats.count >= settings.sql_request_query_warn
+                or stats.total_time * 1000 >= settings.sql_slow_query_ms
+            ):
+                statement_stats.record_request(stats)
+                logger.warning(
+                    f"{stats.route} executed {stats.count} queries "
+                    f"in {stats.total_time * 1000:.1f}ms"
+                )
@@ -4,17 +4,16 @@ from typing import Generator
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.core.config import settings
+from app.db.query_stats import install_query_stats
 
-# 配置SQL日志
 logging.basicConfig(level=logging.INFO)
-sql_logger = logging.getLogger('sqlalchemy.engine')
-sql_logger.setLevel(logging.INFO)
 
 engine = create_engine(
     settings.database_url,
-    echo=True,  # 启用SQL语句日志
+    echo=settings.database_echo,  # 默认关闭逐条SQL日志，改用查询统计
     pool_pre_ping=True
 )
+install_query_stats(engine)
 
 
 def initialize_database() -> None:
@@ -1,8 +1,12 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
+from app.core.http_client import start_http_client, close_http_client
+from app.db.query_stats import QueryStatsMiddleware
 from app.db.session import initialize_database
 from app.api.routers.health import router as health_router
 from app.api.routers.posts import router as posts_router
@@ -21,6 +25,27 @@ from app.api.routers.image_search import router as image_search_router
 from app.api.routers.tagCloud import router as tag_cloud_router
 from app.api.routers.system_setting import router as system_setting_router
 from app.api.routers.local_music import router as local_music_router
+from app.api.routers.media import router as media_router
+from app.api.routers.resumable_upload import router as resumable_upload_router
+from app.services.postStatsCounter import (
+    start_post_stats_flusher,
+    stop_post_stats_flusher
+)
+from app.services.downloadCounter import (
+    start_download_counter_flusher,
+    stop_download_counter_flusher
+)
+from app.services.imageDerivatives import image_derivatives
+from app.services.postDedup import like_filter
+from app.services.musicSearchIndex import music_search_index
+from app.services.visitorSketch import (
+    start_visitor_sketch_flusher,
+    stop_visitor_sketch_flusher
+)
+from app.services.statsEventLog import (
+    start_stats_event_log,
+    stop_stats_event_log
+)
 from app.scheduler.tag_cloud_scheduler import (
     start_tag_cloud_scheduler,
     stop_tag_cloud_scheduler
@@ -29,6 +54,12 @@ from app.scheduler.tag_cloud_scheduler import (
 # 导入模型以确保SQLModel能够识别并创建表
 from app.models.postLikeTracking import PostLikeTracking  # noqa: F401
 from app.models.comment import Comment  # noqa: F401
+from app.models.cacheVersion import CacheVersion  # noqa: F401
+from app.models.schedulerLease import SchedulerLease  # noqa: F401
+from app.models.uploadSession import UploadSession  # noqa: F401
+from app.models.fileBlob import FileBlob  # noqa: F401
+from app.models.postVisitorSketch import PostVisitorSketch  # noqa: F401
+from app.models.postStatsRollup import PostStatsDaily, PostStatsHourly, StatsEventSegment  # noqa: F401
 
 
 def create_app() -> FastAPI:
@@ -41,6 +72,7 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(QueryStatsMiddleware)
 
     initialize_database()
 
@@ -52,6 +84,7 @@ def create_app() -> FastAPI:
     app.include_router(comments_router, prefix="/api")
     app.include_router(system_router, prefix="/api")
     app.include_router(attachments_router, prefix="/api")
+    app.include_router(resumable_upload_router, prefix="/api")
     app.include_router(homepage_router, prefix="/api")
     app.include_router(post_stats_router, prefix="/api")
     app.include_router(stats_router, prefix="/api")
@@ -88,6 +121,9 @@ def create_app() -> FastAPI:
         tags=["local-music"]
     )
 
+    # 上传文件（Range、ETag、缩略图），需在静态文件目录之前注册
+    app.include_router(media_router)
+
     # 静态文件服务
     import os
     uploads_dir = os.path.join(os.getcwd(), "uploads")
@@ -100,11 +136,24 @@ def create_app() -> FastAPI:
     @app.on_event("startup")
     async def startup_event():
         initialize_database()
+        await start_http_client()
         start_tag_cloud_scheduler()
+        start_post_stats_flusher()
+        start_download_counter_flusher()
+        start_visitor_sketch_flusher()
+        start_stats_event_log()
+        await asyncio.to_thread(like_filter.warm)
+        await asyncio.to_thread(music_search_index.warm)
 
     @app.on_event("shutdown")
     async def shutdown_event():
-        stop_tag_cloud_scheduler()
+        await stop_tag_cloud_scheduler()
+        await stop_post_stats_flusher()
+        await stop_download_counter_flusher()
+        await stop_visitor_sketch_flusher()
+        await stop_stats_event_log()
+        await close_http_client()
+        image_derivatives.shutdown()
 
     return app
 
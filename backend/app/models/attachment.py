@@ -42,6 +42,8 @@ class AttachmentBase(SQLModel):
     related_type: Optional[str] = None
     related_id: Optional[int] = None
     status: AttachmentStatus = AttachmentStatus.ACTIVE
+    # 去重存储的文件内容（file_blob.sha256），旧记录为空
+    blob_sha256: Optional[str] = Field(default=None, max_length=64, index=True)
 
 
 class Attachment(AttachmentBase, table=True):
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class CacheVersion(SQLModel, table=True):
+    __tablename__ = "cache_version"
+
+    name: str = Field(primary_key=True, max_length=64, description="缓存名称")
+    version: int = Field(default=0, description="版本号")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
@@ -80,6 +80,15 @@ class ColumnsListResponse(SQLModel):
     has_more: bool
 
 
+class ColumnPostsListResponse(SQLModel):
+    """专栏文章分页响应模型"""
+    items: List[dict]
+    total: int
+    page: int
+    limit: int
+    has_more: bool
+
+
 # 文章专栏关联模型
 class PostColumnsBase(SQLModel):
     """文章专栏关联基础模型"""
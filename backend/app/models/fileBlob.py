@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class FileBlob(SQLModel, table=True):
+    __tablename__ = "file_blob"
+
+    sha256: str = Field(primary_key=True, max_length=64, description="文件内容的SHA-256")
+    file_path: str = Field(max_length=500, index=True, description="文件存储路径")
+    file_size: int = Field(description="文件大小（字节）")
+    ref_count: int = Field(default=0, description="引用计数")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
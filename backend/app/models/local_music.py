@@ -1,6 +1,6 @@
 # backend/app/models/local_music.py
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from sqlmodel import Field, SQLModel
 
@@ -10,7 +10,7 @@ class PlaylistMusic(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     playlist_id: int = Field(foreign_key="music_playlist.id")
     track_id: int = Field(foreign_key="music_track.id")
-    position: int = Field(default=0, description="在播放列表中的位置")
+    position: int = Field(default=0, description="在播放列表中的排名（带间隔，越小越靠前）")
     added_at: datetime = Field(default_factory=datetime.now)
 
 
@@ -23,6 +23,8 @@ class LocalMusic(SQLModel, table=True):
         default=None, max_length=255, description="专辑名称"
     )
     duration: Optional[int] = Field(default=None, description="时长(秒)")
+    bitrate: Optional[int] = Field(default=None, description="码率(kbps)")
+    sample_rate: Optional[int] = Field(default=None, description="采样率(Hz)")
     file_url: Optional[str] = Field(
         default=None, max_length=500, description="文件URL"
     )
@@ -91,6 +93,10 @@ class MusicPlaylist(SQLModel, table=True):
     # )  # 暂时注释掉以避免循环导入
 
 
+class PlaylistOrderUpdate(SQLModel):
+    music_ids: List[int] = Field(description="播放列表中全部音乐ID的新顺序")
+
+
 # 暂时注释掉这些模型以避免SQLAlchemy自动创建表
 # class MusicPlayHistory(SQLModel, table=True):
 #     id: Optional[int] = Field(default=None, primary_key=True)
@@ -57,6 +57,7 @@ class PostRead(PostBase):
     like_count: Optional[int] = 0
     share_count: Optional[int] = 0
     comment_count: Optional[int] = 0
+    unique_visitors: Optional[int] = 0
 
 
 class PostUpdate(SQLModel):
@@ -71,7 +72,10 @@ class PostUpdate(SQLModel):
 
 class PostListResponse(SQLModel, Generic[T]):
     items: List[T]
-    total: int
+    # 游标分页且未请求总数时为 None
+    total: Optional[int] = None
     page: int
     limit: int
     has_more: bool
+    # 游标分页时下一页的游标，没有更多数据时为 None
+    next_cursor: Optional[str] = None
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
 
+from sqlalchemy import UniqueConstraint
 from sqlmodel import Field, SQLModel, Relationship
 
 if TYPE_CHECKING:
@@ -15,6 +16,9 @@ class PostLikeTrackingBase(SQLModel):
 
 class PostLikeTracking(PostLikeTrackingBase, table=True):
     __tablename__ = "post_like_tracking"
+    __table_args__ = (
+        UniqueConstraint("post_id", "user_ip", name="uk_post_user_ip"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True, description="主键ID")
 
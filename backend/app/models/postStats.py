@@ -8,7 +8,7 @@ if TYPE_CHECKING:
 
 
 class PostStatsBase(SQLModel):
-    post_id: int = Field(foreign_key="post.id")
+    post_id: int = Field(foreign_key="post.id", unique=True)
     view_count: int = Field(default=0, description="观看次数")
     like_count: int = Field(default=0, description="点赞次数")
     share_count: int = Field(default=0, description="分享次数")
@@ -19,6 +19,8 @@ class PostStats(PostStatsBase, table=True):
     __tablename__ = "post_stats"
 
     id: Optional[int] = Field(default=None, primary_key=True)
+    # 由访客草图写回，不允许通过接口直接设置
+    unique_visitors: int = Field(default=0, description="独立访客数（估算）")
     created_at: datetime = Field(
         default_factory=datetime.utcnow, nullable=False
     )
@@ -36,6 +38,7 @@ class PostStatsCreate(PostStatsBase):
 
 class PostStatsRead(PostStatsBase):
     id: int
+    unique_visitors: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class PostStatsHourly(SQLModel, table=True):
+    __tablename__ = "post_stats_hourly"
+
+    post_id: int = Field(foreign_key="post.id", primary_key=True, description="文章ID")
+    hour: datetime = Field(primary_key=True, description="小时（UTC，整点）")
+    view_count: int = Field(default=0, description="观看次数")
+    like_count: int = Field(default=0, description="点赞次数（扣除取消点赞）")
+    share_count: int = Field(default=0, description="分享次数")
+    comment_count: int = Field(default=0, description="评论次数")
+
+
+class PostStatsDaily(SQLModel, table=True):
+    __tablename__ = "post_stats_daily"
+
+    post_id: int = Field(foreign_key="post.id", primary_key=True, description="文章ID")
+    day: date = Field(primary_key=True, index=True, description="日期（UTC）")
+    view_count: int = Field(default=0, description="观看次数")
+    like_count: int = Field(default=0, description="点赞次数（扣除取消点赞）")
+    share_count: int = Field(default=0, description="分享次数")
+    comment_count: int = Field(default=0, description="评论次数")
+
+
+class StatsEventSegment(SQLModel, table=True):
+    """已汇总的事件日志分段（汇总的检查点）"""
+    __tablename__ = "stats_event_segment"
+
+    name: str = Field(primary_key=True, max_length=255, description="分段文件名")
+    event_count: int = Field(default=0, description="事件数")
+    processed_at: datetime = Field(default_factory=datetime.utcnow, description="汇总时间")
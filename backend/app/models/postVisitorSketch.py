@@ -0,0 +1,15 @@
+from datetime import date, datetime
+
+from sqlmodel import Field, SQLModel
+
+# day 取这个值的行是文章全部时间的汇总
+ALL_TIME_DAY = date(1970, 1, 1)
+
+
+class PostVisitorSketch(SQLModel, table=True):
+    __tablename__ = "post_visitor_sketch"
+
+    post_id: int = Field(foreign_key="post.id", primary_key=True, description="文章ID")
+    day: date = Field(primary_key=True, description="日期（UTC），1970-01-01 表示全部时间")
+    registers: bytes = Field(description="HyperLogLog 寄存器")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
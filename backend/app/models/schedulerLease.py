@@ -0,0 +1,12 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class SchedulerLease(SQLModel, table=True):
+    __tablename__ = "scheduler_lease"
+
+    name: str = Field(primary_key=True, max_length=64, description="租约名称")
+    owner: str = Field(max_length=128, description="持有者标识")
+    expires_at: datetime = Field(description="租约过期时间")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="最近续约时间")
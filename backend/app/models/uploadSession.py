@@ -0,0 +1,56 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class UploadPurpose(str, Enum):
+    MUSIC = "music"
+    ATTACHMENT = "attachment"
+
+
+class UploadSessionStatus(str, Enum):
+    UPLOADING = "uploading"
+    COMPLETED = "completed"
+
+
+class UploadSession(SQLModel, table=True):
+    __tablename__ = "upload_session"
+
+    id: str = Field(primary_key=True, max_length=32, description="上传会话ID")
+    purpose: str = Field(max_length=20, description="用途：music / attachment")
+    filename: str = Field(max_length=255, description="原始文件名")
+    content_type: Optional[str] = Field(default=None, max_length=100, description="MIME类型")
+    total_size: int = Field(description="文件总大小（字节）")
+    received_size: int = Field(default=0, description="已接收的连续字节数")
+    sha256: Optional[str] = Field(default=None, max_length=64, description="整个文件的SHA-256")
+    form_data: Optional[str] = Field(default=None, description="完成时创建记录使用的表单数据（JSON）")
+    status: str = Field(default=UploadSessionStatus.UPLOADING.value, max_length=20, description="状态：uploading / completed")
+    result_id: Optional[int] = Field(default=None, description="完成后创建的附件或音乐ID")
+    uploaded_by: int = Field(description="上传者ID")
+    expires_at: datetime = Field(description="过期时间")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
+
+
+class UploadSessionCreate(SQLModel):
+    """创建断点续传会话"""
+    purpose: UploadPurpose
+    filename: str = Field(max_length=255)
+    content_type: Optional[str] = Field(default=None, max_length=100)
+    total_size: int = Field(gt=0, description="文件总大小（字节）")
+    sha256: Optional[str] = Field(default=None, min_length=64, max_length=64, description="整个文件的SHA-256（可选）")
+    form_data: Dict[str, Any] = Field(default_factory=dict, description="完成时创建附件或音乐记录使用的字段")
+
+
+class UploadSessionRead(SQLModel):
+    id: str
+    purpose: UploadPurpose
+    filename: str
+    total_size: int
+    received_size: int
+    status: UploadSessionStatus
+    result_id: Optional[int] = None
+    chunk_size: int
+    expires_at: datetime
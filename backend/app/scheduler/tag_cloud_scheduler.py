@@ -1,16 +1,27 @@
 import asyncio
-import schedule
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlmodel import Session
+from app.core.config import settings
+from app.db.session import engine
+from app.services.leaderLease import LeaderLease
 from app.services.tagCloud import TagCloudService
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 单次休眠的最长时间（秒），定期醒来重新核对墙上时钟，避免系统时间调整后错过运行点
+MAX_SLEEP_SECONDS = 3600
+
+DAY_MAP = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6
+}
+
 
 class TagCloudScheduler:
     def __init__(self):
-        self.tag_service = None  # 延迟初始化
         self.is_running = False
         self.scheduled_time = "02:00"  # 默认时间
         self.schedule_frequency = "daily"  # 默认频度：daily, weekly, hourly
@@ -18,93 +29,184 @@ class TagCloudScheduler:
         self.search_keywords = []  # 自定义搜索关键词
         self.prompt_template = None  # 提示词模板
 
-    def _get_tag_service(self):
-        """获取TagCloudService实例"""
-        if self.tag_service is None:
-            from app.db.session import get_session
-            session = next(get_session())
-            self.tag_service = TagCloudService(session)
-        return self.tag_service
+        # 运行在应用事件循环上的调度任务
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_run: Optional[datetime] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+        # 多 worker 部署时只有持有租约的进程执行定时任务，其余进程只计算运行时间
+        self.lease = LeaderLease("tag_cloud_scheduler", settings.scheduler_lease_ttl)
+
+        # 任务执行情况
+        self.job_running = False
+        self.run_count = 0
+        self.overrun_count = 0
+        self.last_run_started_at: Optional[datetime] = None
+        self.last_run_finished_at: Optional[datetime] = None
+        self.last_run_duration: Optional[float] = None
+        self.last_run_status: Optional[str] = None
+        self.last_run_error: Optional[str] = None
+        self.last_run_overrun = False
 
     async def daily_fetch_task(self):
-        """每日标签获取任务"""
+        """每日标签获取任务，返回获取结果"""
         logger.info("Starting daily tag cloud fetch task...")
 
-        try:
+        # 每次运行使用独立的数据库会话，避免长期持有同一连接
+        with Session(engine) as session:
+            tag_service = TagCloudService(session)
             # 如果有自定义搜索关键词，使用自定义搜索
             if self.search_keywords:
                 logger.info(f"Using custom search keywords: {self.search_keywords}")
-                result = await self._get_tag_service().fetch_tags_by_keywords(self.search_keywords)
+                result = await tag_service.fetch_tags_by_keywords(self.search_keywords)
             else:
                 # 使用默认的多源获取
-                result = await self._get_tag_service().fetch_and_update_tags()
+                result = await tag_service.fetch_and_update_tags()
+
+        logger.info(f"Daily fetch completed: {result}")
+        return result
 
-            logger.info(f"Daily fetch completed: {result}")
+    async def _run_job(self, scheduled_for: datetime):
+        """执行一次定时任务并记录耗时、状态和是否超时"""
+        self.job_running = True
+        self.last_run_started_at = datetime.now()
+        started = time.monotonic()
+        status = "success"
+        error = None
+
+        try:
+            result = await self.daily_fetch_task()
+            if isinstance(result, dict) and result.get("status"):
+                status = str(getattr(result["status"], "value", result["status"]))
+                error = result.get("error_message")
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
         except Exception as e:
+            status = "failed"
+            error = str(e)
             logger.error(f"Daily fetch failed: {e}")
-
-    def run_daily_fetch(self):
-        """运行每日获取任务（同步包装器）"""
-        asyncio.run(self.daily_fetch_task())
+        finally:
+            self.job_running = False
+            self.last_run_finished_at = datetime.now()
+            self.last_run_duration = round(time.monotonic() - started, 3)
+            self.last_run_status = status
+            self.last_run_error = error
+            self.run_count += 1
+
+            # 任务结束时已越过下一个运行点，视为超时（错过的运行点不补跑）
+            following = self._calculate_next_run_time(scheduled_for)
+            self.last_run_overrun = bool(
+                following and self.last_run_finished_at >= following
+            )
+            if self.last_run_overrun:
+                self.overrun_count += 1
+                logger.warning(
+                    f"Tag cloud fetch overran its schedule: started {scheduled_for}, "
+                    f"took {self.last_run_duration}s, next slot was {following}"
+                )
+
+    async def _wait_until(self, run_at: datetime) -> bool:
+        """休眠到指定时间；调度配置变更时提前唤醒并返回 False"""
+        while True:
+            delay = (run_at - datetime.now()).total_seconds()
+            if delay <= 0:
+                return True
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=min(delay, MAX_SLEEP_SECONDS)
+                )
+                return False
+            except asyncio.TimeoutError:
+                continue
+
+    async def _scheduler_loop(self):
+        """调度主循环：计算下次运行时间，精确休眠后执行任务"""
+        while self.is_running:
+            self._wakeup.clear()
+            next_run = self._calculate_next_run_time()
+            if next_run is None:
+                logger.error("无法计算下次运行时间，等待调度配置更新")
+                self._next_run = None
+                await self._wakeup.wait()
+                continue
+
+            if next_run != self._next_run:
+                self._next_run = next_run
+                if self.lease.is_leader:
+                    await asyncio.to_thread(self._save_next_run_time, next_run)
+                logger.info(f"Tag cloud fetch scheduled at {next_run}")
+
+            if await self._wait_until(next_run):
+                # 运行前再确认一次租约，非 leader 跳过本次运行
+                if await asyncio.to_thread(self.lease.try_acquire):
+                    await self._run_job(next_run)
+                else:
+                    logger.info("Not the scheduler leader, skipping tag cloud fetch")
+
+    async def _heartbeat_loop(self):
+        """定期续约或尝试接管租约，并同步其他进程修改的调度配置"""
+        while self.is_running:
+            was_leader = self.lease.is_leader
+            is_leader = await asyncio.to_thread(self.lease.try_acquire)
+            if is_leader and not was_leader and self._next_run:
+                await asyncio.to_thread(self._save_next_run_time, self._next_run)
+            await asyncio.to_thread(self._load_schedule_config_from_db)
+            await asyncio.sleep(settings.scheduler_heartbeat_interval)
 
     def start_scheduler(self):
-        """启动定时任务调度器"""
+        """在当前事件循环上启动定时任务调度器（需在事件循环中调用）"""
         if self.is_running:
             logger.warning("Scheduler is already running")
             return
 
+        # 启动时恢复持久化的调度配置
+        self._load_schedule_config_from_db()
+
         self.is_running = True
-        logger.info("Starting tag cloud scheduler...")
-
-        # 根据频度设置调度
-        if self.schedule_frequency == "hourly":
-            schedule.every().hour.at(f":{self.scheduled_time.split(':')[1]}").do(self.run_daily_fetch)
-            logger.info(f"Tag cloud scheduler started. Next run: every hour at minute {self.scheduled_time.split(':')[1]}")
-        elif self.schedule_frequency == "weekly":
-            # 将星期几转换为数字
-            day_map = {
-                "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-                "friday": 4, "saturday": 5, "sunday": 6
-            }
-            day_num = day_map.get(self.schedule_day.lower(), 0)
-            schedule.every().week.at(self.scheduled_time).do(self.run_daily_fetch)
-            logger.info(f"Tag cloud scheduler started. Next run: weekly on {self.schedule_day} at {self.scheduled_time}")
-        else:  # daily
-            schedule.every().day.at(self.scheduled_time).do(self.run_daily_fetch)
-            logger.info(f"Tag cloud scheduler started. Next run: daily at {self.scheduled_time}")
-
-        # 运行调度器
-        while self.is_running:
-            schedule.run_pending()
-            time.sleep(60)  # 每分钟检查一次
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._scheduler_loop())
+        self._heartbeat_task = self._loop.create_task(self._heartbeat_loop())
+        logger.info(
+            "Tag cloud scheduler started: "
+            f"frequency={self.schedule_frequency}, time={self.scheduled_time}, day={self.schedule_day}"
+        )
 
-    def stop_scheduler(self):
-        """停止定时任务调度器"""
+    async def stop_scheduler(self):
+        """停止定时任务调度器，取消休眠或正在执行的任务"""
         self.is_running = False
-        schedule.clear()
+        tasks = [task for task in (self._task, self._heartbeat_task) if task is not None]
+        self._task = self._heartbeat_task = None
+        for task in tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._next_run = None
+        await asyncio.to_thread(self.lease.release)
         logger.info("Tag cloud scheduler stopped")
 
+    def _reschedule(self):
+        """唤醒调度循环，按新配置重新计算下次运行时间"""
+        if self.is_running and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
     def update_schedule_time(self, new_time):
         """更新调度时间"""
-        if self.is_running:
-            # 如果调度器正在运行，需要重启
-            self.stop_scheduler()
-            self.scheduled_time = new_time
-            self.start_scheduler()
-        else:
-            self.scheduled_time = new_time
+        self.scheduled_time = new_time
 
         # 持久化调度配置到数据库
         self._save_schedule_config_to_db()
+        self._reschedule()
 
         logger.info(f"Schedule time updated to: {new_time}")
 
     def update_schedule_config(self, frequency=None, time=None, day=None):
         """更新调度配置并持久化到数据库"""
-        if self.is_running:
-            # 如果调度器正在运行，需要重启
-            self.stop_scheduler()
-
         if frequency is not None:
             self.schedule_frequency = frequency
         if time is not None:
@@ -114,9 +216,7 @@ class TagCloudScheduler:
 
         # 持久化调度配置到数据库
         self._save_schedule_config_to_db()
-
-        if self.is_running:
-            self.start_scheduler()
+        self._reschedule()
 
         logger.info(f"Schedule config updated: frequency={self.schedule_frequency}, time={self.scheduled_time}, day={self.schedule_day}")
 
@@ -174,38 +274,38 @@ class TagCloudScheduler:
             )
         session.add(setting)
 
-    def _calculate_next_run_time(self):
-        """计算下次运行时间"""
+    def _save_next_run_time(self, next_run_time):
+        """保存下次运行时间到数据库"""
         try:
-            from datetime import datetime, timedelta
-            import schedule
+            with Session(engine) as session:
+                self._save_setting(session, "next_run_time", next_run_time.isoformat())
+                session.commit()
+        except Exception as e:
+            logger.error(f"保存下次运行时间失败: {e}")
 
-            now = datetime.now()
+    def _calculate_next_run_time(self, after=None):
+        """计算 after（默认当前时间）之后的下次运行时间"""
+        try:
+            now = after or datetime.now()
+            hour, minute = map(int, self.scheduled_time.split(':'))
 
             if self.schedule_frequency == "hourly":
-                # 每小时运行
-                next_run = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+                # 每小时在指定分钟运行
+                next_run = now.replace(minute=minute, second=0, microsecond=0)
+                if next_run <= now:
+                    next_run += timedelta(hours=1)
             elif self.schedule_frequency == "daily":
                 # 每天在指定时间运行
-                hour, minute = map(int, self.scheduled_time.split(':'))
                 next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
                 if next_run <= now:
                     next_run += timedelta(days=1)
             elif self.schedule_frequency == "weekly":
                 # 每周在指定日期和时间运行
-                day_map = {
-                    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-                    "friday": 4, "saturday": 5, "sunday": 6
-                }
-                target_day = day_map.get(self.schedule_day.lower(), 0)
-                hour, minute = map(int, self.scheduled_time.split(':'))
-
-                # 计算下一个目标日期
-                days_ahead = target_day - now.weekday()
-                if days_ahead <= 0:  # 如果今天已经过了目标日期
-                    days_ahead += 7
-
+                target_day = DAY_MAP.get(self.schedule_day.lower(), 0)
+                days_ahead = (target_day - now.weekday()) % 7
                 next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(days=days_ahead)
+                if next_run <= now:  # 今天的运行时间已过
+                    next_run += timedelta(days=7)
             else:
                 return None
 
@@ -246,6 +346,8 @@ class TagCloudScheduler:
 
             session = next(get_session())
             try:
+                previous = (self.schedule_frequency, self.scheduled_time, self.schedule_day)
+
                 # 加载调度频率
                 frequency_setting = session.exec(
                     select(SystemSetting).where(
@@ -276,7 +378,11 @@ class TagCloudScheduler:
                 if day_setting and day_setting.key_value:
                     self.schedule_day = day_setting.key_value
 
-                logger.info(f"从数据库加载调度配置: frequency={self.schedule_frequency}, time={self.scheduled_time}, day={self.schedule_day}")
+                # 其他进程修改了调度配置时，按新配置重新调度
+                if previous != (self.schedule_frequency, self.scheduled_time, self.schedule_day):
+                    self._reschedule()
+
+                logger.debug(f"从数据库加载调度配置: frequency={self.schedule_frequency}, time={self.scheduled_time}, day={self.schedule_day}")
             finally:
                 session.close()
         except Exception as e:
@@ -284,12 +390,15 @@ class TagCloudScheduler:
 
     def get_next_run_time(self):
         """获取下次运行时间"""
-        # 首先尝试从数据库获取
+        # 调度器在本进程运行时直接使用内存中的运行时间
+        if self.is_running and self._next_run and self._next_run > datetime.now():
+            return self._next_run
+
+        # 否则尝试从数据库获取
         try:
             from app.db.session import get_session
             from app.models.system_setting import SystemSetting
             from sqlmodel import select
-            from datetime import datetime
 
             session = next(get_session())
             try:
@@ -320,35 +429,46 @@ class TagCloudScheduler:
         except Exception as e:
             logger.error(f"从数据库获取下次运行时间失败: {e}")
 
-        # 如果数据库中没有或获取失败，则从schedule库获取
-        jobs = schedule.get_jobs()
-        if jobs:
-            return jobs[0].next_run
-
-        # 如果schedule库中也没有，则计算下次运行时间
+        # 如果数据库中没有或获取失败，则计算下次运行时间
         return self._calculate_next_run_time()
 
+    def get_job_status(self):
+        """获取定时任务的运行状态"""
+        def iso(value):
+            return value.isoformat() if value else None
+
+        return {
+            "is_running": self.is_running,
+            "is_leader": self.lease.is_leader,
+            "owner": self.lease.owner,
+            "leader": self.lease.get_holder(),
+            "job_running": self.job_running,
+            "next_run": iso(self.get_next_run_time()),
+            "run_count": self.run_count,
+            "overrun_count": self.overrun_count,
+            "last_run": {
+                "started_at": iso(self.last_run_started_at),
+                "finished_at": iso(self.last_run_finished_at),
+                "duration": self.last_run_duration,
+                "status": self.last_run_status,
+                "error": self.last_run_error,
+                "overrun": self.last_run_overrun,
+            },
+        }
+
 
 # 全局调度器实例
 scheduler = TagCloudScheduler()
 
 
 def start_tag_cloud_scheduler():
-    """启动标签云调度器（在应用启动时调用）"""
-    import threading
-
-    def run_scheduler():
-        scheduler.start_scheduler()
-
-    # 在单独线程中运行调度器
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    logger.info("Tag cloud scheduler thread started")
+    """启动标签云调度器（在应用启动时于事件循环中调用）"""
+    scheduler.start_scheduler()
 
 
-def stop_tag_cloud_scheduler():
+async def stop_tag_cloud_scheduler():
     """停止标签云调度器（在应用关闭时调用）"""
-    scheduler.stop_scheduler()
+    await scheduler.stop_scheduler()
 
 
 def update_schedule_time(new_time):
@@ -386,3 +506,8 @@ async def trigger_manual_fetch():
     """手动触发标签获取"""
     logger.info("Manual tag fetch triggered")
     await scheduler.daily_fetch_task()
+
+
+def get_job_status():
+    """获取定时任务的运行状态"""
+    return scheduler.get_job_status()
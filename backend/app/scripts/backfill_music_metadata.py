@@ -0,0 +1,129 @@
+"""
+为已上传的音乐补全元数据
+
+从音频文件头读取时长、码率、采样率，补全为空的专辑、流派、年份、
+艺术家（"未知艺术家"）和封面。默认只处理缺少码率的曲目
+（包括以前上传时被写成默认 180 秒的记录）。
+
+用法（在 backend 目录下执行）：
+    python -m app.scripts.backfill_music_metadata
+    python -m app.scripts.backfill_music_metadata --all --dry-run
+"""
+import argparse
+import logging
+import os
+
+from sqlmodel import Session, select
+
+from app.db.session import engine
+from app.models.local_music import LocalMusic
+from app.services.audioMetadata import probe_music_file
+from app.services.playlistManifest import playlist_manifest
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_ARTIST = "未知艺术家"
+
+
+def _apply(music: LocalMusic, metadata, cover_image_url) -> list:
+    """把解析结果写入记录：技术参数直接覆盖，标签只补全空字段；返回变更的字段"""
+    changes = {
+        "duration": metadata.duration_seconds,
+        "bitrate": metadata.bitrate,
+        "sample_rate": metadata.sample_rate,
+    }
+    if not music.album:
+        changes["album"] = metadata.album
+    if not music.genre:
+        changes["genre"] = metadata.genre
+    if not music.year:
+        changes["year"] = metadata.year
+    if music.artist in (None, "", UNKNOWN_ARTIST):
+        changes["artist"] = metadata.artist
+    if not music.cover_image_url:
+        changes["cover_image_url"] = cover_image_url
+
+    changed = []
+    for field, value in changes.items():
+        if value is not None and getattr(music, field) != value:
+            setattr(music, field, value)
+            changed.append(field)
+    return changed
+
+
+def backfill(process_all: bool, dry_run: bool, batch_size: int) -> dict:
+    summary = {"scanned": 0, "updated": 0, "missing": 0, "failed": 0}
+    last_id = 0
+    with Session(engine) as session:
+        while True:
+            query = (
+                select(LocalMusic)
+                .where(
+                    LocalMusic.id > last_id,
+                    LocalMusic.file_url.is_not(None),
+                )
+                .order_by(LocalMusic.id)
+                .limit(batch_size)
+            )
+            if not process_all:
+                query = query.where(LocalMusic.bitrate.is_(None))
+            musics = session.exec(query).all()
+            if not musics:
+                break
+            last_id = musics[-1].id
+
+            for music in musics:
+                summary["scanned"] += 1
+                path = music.file_url.lstrip("/")
+                if not os.path.isfile(path):
+                    summary["missing"] += 1
+                    logger.warning(f"#{music.id} 文件不存在: {path}")
+                    continue
+                metadata, cover_image_url = probe_music_file(
+                    session, path,
+                    save_cover=not dry_run and not music.cover_image_url,
+                )
+                if metadata is None or metadata.duration is None:
+                    summary["failed"] += 1
+                    logger.warning(f"#{music.id} 无法解析: {path}")
+                    continue
+                changed = _apply(music, metadata, cover_image_url)
+                if changed:
+                    summary["updated"] += 1
+                    logger.info(
+                        f"#{music.id} {music.title}: "
+                        + ", ".join(f"{f}={getattr(music, f)}" for f in changed)
+                    )
+                    session.add(music)
+
+            if dry_run:
+                session.rollback()
+            else:
+                session.commit()
+
+    if summary["updated"] and not dry_run:
+        # 时长和封面会出现在播放器清单中
+        playlist_manifest.invalidate()
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="补全已上传音乐的时长、码率和标签")
+    parser.add_argument(
+        "--all", action="store_true", help="重新解析所有曲目（默认只处理缺少码率的）"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="只输出变更，不写入数据库")
+    parser.add_argument("--batch-size", type=int, default=100, help="每批处理的曲目数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    summary = backfill(args.all, args.dry_run, args.batch_size)
+    logger.info(
+        f"扫描 {summary['scanned']} 首，更新 {summary['updated']} 首，"
+        f"文件缺失 {summary['missing']} 首，解析失败 {summary['failed']} 首"
+        + ("（试运行，未写入）" if args.dry_run else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+立即汇总统计事件日志
+
+应用运行时会定时汇总，这个脚本用于手动补跑，或在汇总表损坏时
+清空汇总表并从保留的归档分段重建（早于 retain_days 的事件已被清理，无法重建）。
+
+用法（在 backend 目录下执行）：
+    python -m app.scripts.rollup_stats_events
+    python -m app.scripts.rollup_stats_events --rebuild
+"""
+import argparse
+import logging
+
+from app.services.statsEventLog import rebuild_rollups, run_rollup
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把统计事件日志汇总到按小时、按天的统计表")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="清空汇总表，从归档的分段重新汇总"
+    )
+    parser.add_argument("--directory", help="事件日志目录（默认使用配置）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    summary = (rebuild_rollups if args.rebuild else run_rollup)(args.directory)
+    logger.info(
+        f"汇总 {summary['segments']} 个分段，{summary['events']} 个事件，"
+        f"跳过已汇总的 {summary['skipped']} 个分段"
+    )
+
+
+if __name__ == "__main__":
+    main()
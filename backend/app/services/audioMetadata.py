@@ -0,0 +1,726 @@
+"""
+音频元数据解析
+
+只读取文件头和必要的元数据块（不解码音频），获取时长、码率、采样率、
+标签（标题、艺术家、专辑、年份、流派）和内嵌封面。支持：
+- MP3：ID3v2/ID3v1 标签，Xing/Info、VBRI 帧或 CBR 估算时长
+- FLAC：STREAMINFO、VORBIS_COMMENT、PICTURE
+- Ogg Vorbis / Opus：标识头、注释头和最后一页的 granule position
+- WAV：fmt/data/LIST INFO 块
+- M4A：mvhd/mp4a 和 ilst 标签
+"""
+import base64
+import io
+import logging
+import os
+import re
+import struct
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from PIL import Image
+from sqlmodel import Session
+
+from app.services.blobStore import put_bytes
+
+logger = logging.getLogger(__name__)
+
+# 内嵌封面缩略图的最大边长和保存目录
+COVER_MAX_SIZE = 600
+COVER_DIR = "uploads/images"
+
+# 标签和封面块的大小上限，避免异常文件导致读取过多数据
+MAX_TAG_BYTES = 16 * 1024 * 1024
+
+# ID3v1 标准流派（0-79）
+ID3_GENRES = [
+    "Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge",
+    "Hip-Hop", "Jazz", "Metal", "New Age", "Oldies", "Other", "Pop", "R&B",
+    "Rap", "Reggae", "Rock", "Techno", "Industrial", "Alternative", "Ska",
+    "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient",
+    "Trip-Hop", "Vocal", "Jazz+Funk", "Fusion", "Trance", "Classical",
+    "Instrumental", "Acid", "House", "Game", "Sound Clip", "Gospel", "Noise",
+    "AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative",
+    "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic", "Darkwave",
+    "Techno-Industrial", "Electronic", "Pop-Folk", "Eurodance", "Dream",
+    "Southern Rock", "Comedy", "Cult", "Gangsta", "Top 40", "Christian Rap",
+    "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave",
+    "Psychadelic", "Rave", "Showtunes", "Trailer", "Lo-Fi", "Tribal",
+    "Acid Punk", "Acid Jazz", "Polka", "Retro", "Musical", "Rock & Roll",
+    "Hard Rock",
+]
+
+# 标签字段映射：ID3v2.3/2.4、ID3v2.2、Vorbis 注释、M4A ilst
+ID3_FRAMES = {
+    "TIT2": "title", "TPE1": "artist", "TALB": "album", "TCON": "genre",
+    "TDRC": "year", "TYER": "year",
+    "TT2": "title", "TP1": "artist", "TAL": "album", "TCO": "genre",
+    "TYE": "year",
+}
+VORBIS_FIELDS = {
+    "TITLE": "title", "ARTIST": "artist", "ALBUM": "album",
+    "GENRE": "genre", "DATE": "year", "YEAR": "year",
+}
+MP4_FIELDS = {
+    b"\xa9nam": "title", b"\xa9ART": "artist", b"\xa9alb": "album",
+    b"\xa9gen": "genre", b"\xa9day": "year",
+}
+
+# MPEG 音频帧头：码率表（kbps）、采样率表
+_MPEG_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MPEG_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+# 查找第一个音频帧时最多扫描的字节数
+MP3_SYNC_SCAN_BYTES = 256 * 1024
+
+
+class AudioMetadata:
+    """音频文件的元数据"""
+
+    def __init__(self):
+        self.format: Optional[str] = None
+        self.duration: Optional[float] = None
+        self.bitrate: Optional[int] = None
+        self.sample_rate: Optional[int] = None
+        self.channels: Optional[int] = None
+        self.title: Optional[str] = None
+        self.artist: Optional[str] = None
+        self.album: Optional[str] = None
+        self.year: Optional[int] = None
+        self.genre: Optional[str] = None
+        self.picture: Optional[bytes] = None
+        self._front_cover = False
+
+    def set_tag(self, field: str, value: Optional[str]) -> None:
+        """设置标签字段，已有值时不覆盖（先解析到的标签优先）"""
+        if value is None:
+            return
+        value = value.strip().strip("\x00").strip()
+        if not value or getattr(self, field) is not None:
+            return
+        if field == "year":
+            match = re.search(r"\d{4}", value)
+            if match:
+                self.year = int(match.group(0))
+        elif field == "genre":
+            self.genre = _normalize_genre(value)
+        else:
+            setattr(self, field, value)
+
+    def set_picture(self, data: Optional[bytes], front_cover: bool = True) -> None:
+        """设置封面，优先使用封面类型（front cover）的图片"""
+        if not data:
+            return
+        if self.picture is None or (front_cover and not self._front_cover):
+            self.picture = data
+            self._front_cover = front_cover
+
+    @property
+    def duration_seconds(self) -> Optional[int]:
+        return int(round(self.duration)) if self.duration else None
+
+
+def _normalize_genre(value: str) -> str:
+    """把 ID3 的数字流派（如 "(13)"、"13"）转换为名称"""
+    match = re.fullmatch(r"\(?(\d{1,3})\)?(.*)", value)
+    if match:
+        index = int(match.group(1))
+        if match.group(2).strip():
+            return match.group(2).strip()
+        if index < len(ID3_GENRES):
+            return ID3_GENRES[index]
+    return value
+
+
+def _decode_legacy(data: bytes) -> str:
+    """解码未声明编码的文本：许多中文音乐文件把 GBK 当作 Latin-1 写入"""
+    for encoding in ("utf-8", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1")
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    if size < 0 or size > MAX_TAG_BYTES:
+        raise ValueError(f"元数据块过大: {size}")
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("文件已截断")
+    return data
+
+
+# ---------------------------------------------------------------------------
+# MP3
+# ---------------------------------------------------------------------------
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_text(encoding: int, data: bytes) -> str:
+    if encoding == 0:
+        return _decode_legacy(data.split(b"\x00", 1)[0])
+    if encoding == 1:
+        return data.decode("utf-16", errors="replace").split("\x00", 1)[0]
+    if encoding == 2:
+        return data.decode("utf-16-be", errors="replace").split("\x00", 1)[0]
+    return data.decode("utf-8", errors="replace").split("\x00", 1)[0]
+
+
+def _split_terminated(encoding: int, data: bytes) -> Tuple[bytes, bytes]:
+    """按编码对应的结束符切分出一个字符串，返回 (字符串, 剩余数据)"""
+    if encoding in (1, 2):
+        index = 0
+        while True:
+            index = data.find(b"\x00\x00", index)
+            if index < 0:
+                return data, b""
+            if index % 2 == 0:
+                return data[:index], data[index + 2:]
+            index += 1
+    index = data.find(b"\x00")
+    if index < 0:
+        return data, b""
+    return data[:index], data[index + 1:]
+
+
+def _parse_apic(frame_id: str, data: bytes) -> Tuple[Optional[bytes], bool]:
+    """解析 APIC/PIC 帧，返回 (图片数据, 是否为封面)"""
+    encoding = data[0]
+    if frame_id == "PIC":
+        rest = data[4:]
+    else:
+        _, rest = _split_terminated(0, data[1:])
+    if not rest:
+        return None, False
+    picture_type = rest[0]
+    _, image = _split_terminated(encoding, rest[1:])
+    return image or None, picture_type == 3
+
+
+def _parse_id3v2(f: BinaryIO, meta: AudioMetadata) -> int:
+    """解析文件开头的 ID3v2 标签，返回音频数据的起始位置"""
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    version = header[3]
+    flags = header[5]
+    size = _syncsafe(header[6:10])
+    audio_start = 10 + size + (10 if flags & 0x10 else 0)
+    tag = _read_exact(f, size)
+
+    if flags & 0x80 and version < 4:
+        # 整个标签做了反同步处理
+        tag = tag.replace(b"\xff\x00", b"\xff")
+    position = 0
+    if flags & 0x40 and version >= 3:
+        # 跳过扩展头
+        ext_size = struct.unpack(">I", tag[:4])[0]
+        position = _syncsafe(tag[:4]) if version == 4 else ext_size + 4
+
+    header_size = 6 if version == 2 else 10
+    while position + header_size <= len(tag):
+        if version == 2:
+            frame_id = tag[position:position + 3]
+            frame_size = int.from_bytes(tag[position + 3:position + 6], "big")
+            frame_flags = 0
+        else:
+            frame_id = tag[position:position + 4]
+            raw_size = tag[position + 4:position + 8]
+            frame_size = (
+                _syncsafe(raw_size) if version == 4
+                else struct.unpack(">I", raw_size)[0]
+            )
+            frame_flags = struct.unpack(">H", tag[position + 8:position + 10])[0]
+        if not frame_id.strip(b"\x00") or frame_size <= 0:
+            break
+        body = tag[position + header_size:position + header_size + frame_size]
+        position += header_size + frame_size
+
+        frame_id = frame_id.decode("latin-1")
+        if version == 4 and frame_flags & 0x0002:
+            body = body.replace(b"\xff\x00", b"\xff")
+        if version == 4 and frame_flags & 0x0001:
+            # 带数据长度指示的帧
+            body = body[4:]
+        if not body or (frame_flags & 0x000C if version == 4 else frame_flags & 0x00C0):
+            # 压缩或加密的帧不解析
+            continue
+
+        if frame_id in ID3_FRAMES:
+            meta.set_tag(ID3_FRAMES[frame_id], _id3_text(body[0], body[1:]))
+        elif frame_id in ("APIC", "PIC"):
+            picture, front_cover = _parse_apic(frame_id, body)
+            meta.set_picture(picture, front_cover)
+
+    return audio_start
+
+
+def _parse_id3v1(f: BinaryIO, file_size: int, meta: AudioMetadata) -> int:
+    """解析文件末尾的 ID3v1 标签（仅补充缺失字段），返回标签长度"""
+    if file_size < 128:
+        return 0
+    f.seek(file_size - 128)
+    tag = f.read(128)
+    if tag[:3] != b"TAG":
+        return 0
+    meta.set_tag("title", _decode_legacy(tag[3:33].split(b"\x00", 1)[0]))
+    meta.set_tag("artist", _decode_legacy(tag[33:63].split(b"\x00", 1)[0]))
+    meta.set_tag("album", _decode_legacy(tag[63:93].split(b"\x00", 1)[0]))
+    meta.set_tag("year", tag[93:97].decode("latin-1", errors="ignore"))
+    if tag[127] < len(ID3_GENRES):
+        meta.set_tag("genre", ID3_GENRES[tag[127]])
+    return 128
+
+
+def _parse_mpeg_header(data: bytes, offset: int) -> Optional[dict]:
+    """解析 offset 处的 MPEG 音频帧头，无效时返回 None"""
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}.get((b1 >> 3) & 0x03)
+    layer = {1: 3, 2: 2, 3: 1}.get((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    mono = (b3 >> 6) == 3
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or version == 1) else 576
+        length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    if layer == 3:
+        side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    else:
+        side_info = 0
+    return {
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": 1 if mono else 2,
+        "samples": samples,
+        "length": length,
+        "side_info": side_info,
+    }
+
+
+def _probe_mp3(f: BinaryIO, file_size: int, meta: AudioMetadata) -> None:
+    meta.format = "mp3"
+    audio_start = _parse_id3v2(f, meta)
+    tail = _parse_id3v1(f, file_size, meta)
+
+    f.seek(audio_start)
+    data = f.read(MP3_SYNC_SCAN_BYTES)
+    offset = data.find(b"\xff")
+    frame = None
+    while 0 <= offset < len(data) - 4:
+        frame = _parse_mpeg_header(data, offset)
+        # 要求紧随的下一帧也有效，避免把标签中的 0xFF 误判为帧头
+        if frame and (
+            offset + frame["length"] + 4 > len(data)
+            or _parse_mpeg_header(data, offset + frame["length"])
+        ):
+            break
+        frame = None
+        offset = data.find(b"\xff", offset + 1)
+    if frame is None:
+        return
+
+    meta.sample_rate = frame["sample_rate"]
+    meta.channels = frame["channels"]
+    audio_bytes = file_size - audio_start - offset - tail
+
+    frame_count = None
+    xing = offset + 4 + frame["side_info"]
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        position = xing + 8
+        if flags & 0x01:
+            frame_count = struct.unpack(">I", data[position:position + 4])[0]
+            position += 4
+        if flags & 0x02:
+            audio_bytes = struct.unpack(">I", data[position:position + 4])[0]
+    elif data[offset + 36:offset + 40] == b"VBRI":
+        vbri = offset + 36
+        audio_bytes = struct.unpack(">I", data[vbri + 10:vbri + 14])[0]
+        frame_count = struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+
+    if frame_count:
+        meta.duration = frame_count * frame["samples"] / frame["sample_rate"]
+        meta.bitrate = int(round(audio_bytes * 8 / meta.duration / 1000))
+    else:
+        # 没有 VBR 头时按首帧码率（CBR）估算
+        meta.bitrate = frame["bitrate"]
+        meta.duration = audio_bytes * 8 / (frame["bitrate"] * 1000)
+
+
+# ---------------------------------------------------------------------------
+# Vorbis 注释与 FLAC PICTURE（FLAC、Ogg 共用）
+# ---------------------------------------------------------------------------
+
+def _parse_flac_picture(data: bytes) -> Tuple[Optional[bytes], bool]:
+    picture_type, mime_length = struct.unpack(">II", data[:8])
+    position = 8 + mime_length
+    desc_length = struct.unpack(">I", data[position:position + 4])[0]
+    position += 4 + desc_length + 16
+    data_length = struct.unpack(">I", data[position:position + 4])[0]
+    position += 4
+    return data[position:position + data_length] or None, picture_type == 3
+
+
+def _parse_vorbis_comment(data: bytes, meta: AudioMetadata) -> None:
+    vendor_length = struct.unpack("<I", data[:4])[0]
+    position = 4 + vendor_length
+    count = struct.unpack("<I", data[position:position + 4])[0]
+    position += 4
+    for _ in range(count):
+        if position + 4 > len(data):
+            break
+        length = struct.unpack("<I", data[position:position + 4])[0]
+        comment = data[position + 4:position + 4 + length]
+        position += 4 + length
+        key, sep, value = comment.partition(b"=")
+        if not sep:
+            continue
+        key = key.decode("ascii", errors="ignore").upper()
+        if key in VORBIS_FIELDS:
+            meta.set_tag(VORBIS_FIELDS[key], value.decode("utf-8", errors="replace"))
+        elif key == "METADATA_BLOCK_PICTURE":
+            try:
+                picture, front_cover = _parse_flac_picture(base64.b64decode(value))
+                meta.set_picture(picture, front_cover)
+            except (ValueError, struct.error):
+                pass
+
+
+# ---------------------------------------------------------------------------
+# FLAC
+# ---------------------------------------------------------------------------
+
+def _probe_flac(f: BinaryIO, file_size: int, meta: AudioMetadata) -> None:
+    meta.format = "flac"
+    f.seek(4)
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        last = header[0] & 0x80
+        block_type = header[0] & 0x7F
+        length = int.from_bytes(header[1:4], "big")
+        if block_type in (0, 4, 6):
+            block = _read_exact(f, length)
+            if block_type == 0:
+                info = int.from_bytes(block[10:18], "big")
+                meta.sample_rate = info >> 44
+                meta.channels = ((info >> 41) & 0x07) + 1
+                total_samples = info & 0xFFFFFFFFF
+                if meta.sample_rate and total_samples:
+                    meta.duration = total_samples / meta.sample_rate
+            elif block_type == 4:
+                _parse_vorbis_comment(block, meta)
+            else:
+                picture, front_cover = _parse_flac_picture(block)
+                meta.set_picture(picture, front_cover)
+        else:
+            f.seek(length, os.SEEK_CUR)
+        if last:
+            break
+
+    if meta.duration:
+        audio_bytes = file_size - f.tell()
+        meta.bitrate = int(round(audio_bytes * 8 / meta.duration / 1000))
+
+
+# ---------------------------------------------------------------------------
+# Ogg Vorbis / Opus
+# ---------------------------------------------------------------------------
+
+def _ogg_packets(f: BinaryIO, count: int):
+    """从文件开头按页读取前 count 个逻辑包"""
+    packets = []
+    current = b""
+    while len(packets) < count:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b"OggS":
+            break
+        segments = f.read(header[26])
+        body = _read_exact(f, sum(segments))
+        position = 0
+        for lacing in segments:
+            current += body[position:position + lacing]
+            position += lacing
+            if len(current) > MAX_TAG_BYTES:
+                raise ValueError("Ogg 注释包过大")
+            if lacing < 255:
+                packets.append(current)
+                current = b""
+                if len(packets) >= count:
+                    break
+    return packets
+
+
+def _ogg_last_granule(f: BinaryIO, file_size: int) -> Optional[int]:
+    """读取最后一页的 granule position（即总采样数）"""
+    chunk = 64 * 1024
+    end = file_size
+    while end > 0:
+        start = max(0, end - chunk)
+        f.seek(start)
+        data = f.read(end - start + 27)
+        index = data.rfind(b"OggS")
+        while index >= 0:
+            if index + 14 <= len(data):
+                granule = struct.unpack("<q", data[index + 6:index + 14])[0]
+                if granule >= 0:
+                    return granule
+            index = data.rfind(b"OggS", 0, index)
+        end = start
+        if file_size - end > 1024 * 1024:
+            break
+    return None
+
+
+def _probe_ogg(f: BinaryIO, file_size: int, meta: AudioMetadata) -> None:
+    f.seek(0)
+    packets = _ogg_packets(f, 2)
+    if not packets:
+        return
+    head = packets[0]
+    if head.startswith(b"\x01vorbis"):
+        meta.format = "vorbis"
+        meta.channels = head[11]
+        meta.sample_rate = struct.unpack("<I", head[12:16])[0]
+        nominal = struct.unpack("<i", head[20:24])[0]
+        if nominal > 0:
+            meta.bitrate = nominal // 1000
+        if len(packets) > 1 and packets[1].startswith(b"\x03vorbis"):
+            _parse_vorbis_comment(packets[1][7:], meta)
+        granule = _ogg_last_granule(f, file_size)
+        if granule and meta.sample_rate:
+            meta.duration = granule / meta.sample_rate
+    elif head.startswith(b"OpusHead"):
+        meta.format = "opus"
+        meta.channels = head[9]
+        pre_skip = struct.unpack("<H", head[10:12])[0]
+        meta.sample_rate = struct.unpack("<I", head[12:16])[0] or 48000
+        if len(packets) > 1 and packets[1].startswith(b"OpusTags"):
+            _parse_vorbis_comment(packets[1][8:], meta)
+        granule = _ogg_last_granule(f, file_size)
+        if granule:
+            # Opus 的 granule 固定按 48kHz 计
+            meta.duration = max(0, granule - pre_skip) / 48000
+    if meta.duration and not meta.bitrate:
+        meta.bitrate = int(round(file_size * 8 / meta.duration / 1000))
+
+
+# ---------------------------------------------------------------------------
+# WAV
+# ---------------------------------------------------------------------------
+
+WAV_INFO_FIELDS = {
+    b"INAM": "title", b"IART": "artist", b"IPRD": "album",
+    b"ICRD": "year", b"IGNR": "genre",
+}
+
+
+def _probe_wav(f: BinaryIO, file_size: int, meta: AudioMetadata) -> None:
+    meta.format = "wav"
+    f.seek(12)
+    byte_rate = None
+    data_size = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = _read_exact(f, size)
+            meta.channels, meta.sample_rate, byte_rate = struct.unpack(
+                "<HII", fmt[2:12]
+            )
+        elif chunk_id == b"LIST":
+            body = _read_exact(f, size)
+            if body[:4] == b"INFO":
+                position = 4
+                while position + 8 <= len(body):
+                    sub_id = body[position:position + 4]
+                    sub_size = struct.unpack("<I", body[position + 4:position + 8])[0]
+                    value = body[position + 8:position + 8 + sub_size]
+                    position += 8 + sub_size + (sub_size & 1)
+                    if sub_id in WAV_INFO_FIELDS:
+                        meta.set_tag(
+                            WAV_INFO_FIELDS[sub_id],
+                            _decode_legacy(value.split(b"\x00", 1)[0]),
+                        )
+        else:
+            if chunk_id == b"data":
+                # 流式写入的文件 data 块大小可能为 0 或超出文件
+                data_size = min(size, file_size - f.tell()) or file_size - f.tell()
+            f.seek(size, os.SEEK_CUR)
+        if size & 1:
+            f.seek(1, os.SEEK_CUR)
+
+    if byte_rate and data_size:
+        meta.duration = data_size / byte_rate
+        meta.bitrate = byte_rate * 8 // 1000
+
+
+# ---------------------------------------------------------------------------
+# M4A / MP4
+# ---------------------------------------------------------------------------
+
+# 需要进入的容器 box
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"udta", b"ilst"}
+
+
+def _mp4_boxes(f: BinaryIO, end: int):
+    """遍历 [当前位置, end) 内的 box，产出 (类型, 内容起点, 内容终点)"""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield box_type, start + header, min(start + size, end)
+        f.seek(start + size)
+
+
+def _mp4_walk(f: BinaryIO, end: int, meta: AudioMetadata, state: Dict) -> None:
+    for box_type, body_start, body_end in _mp4_boxes(f, end):
+        if box_type in MP4_CONTAINERS:
+            _mp4_walk(f, body_end, meta, state)
+        elif box_type == b"meta":
+            # meta 是带版本号的容器
+            f.seek(body_start + 4)
+            _mp4_walk(f, body_end, meta, state)
+        elif box_type == b"mvhd":
+            body = _read_exact(f, min(body_end - body_start, 32))
+            if body[0] == 1:
+                timescale, duration = struct.unpack(">IQ", body[20:32])
+            else:
+                timescale, duration = struct.unpack(">II", body[12:20])
+            if timescale:
+                state["duration"] = duration / timescale
+        elif box_type == b"stsd":
+            body = _read_exact(f, min(body_end - body_start, 64))
+            if body[12:16] in (b"mp4a", b"alac") and meta.sample_rate is None:
+                meta.channels = struct.unpack(">H", body[32:34])[0]
+                meta.sample_rate = struct.unpack(">I", body[40:44])[0] >> 16
+        elif box_type in MP4_FIELDS or box_type in (b"gnre", b"covr"):
+            _mp4_item(f, box_type, body_end, meta)
+
+
+def _mp4_item(f: BinaryIO, item_type: bytes, end: int, meta: AudioMetadata) -> None:
+    """解析 ilst 中的一个标签项（其中的 data box）"""
+    for box_type, body_start, body_end in _mp4_boxes(f, end):
+        if box_type != b"data":
+            continue
+        body = _read_exact(f, body_end - body_start)
+        value = body[8:]
+        if item_type == b"covr":
+            meta.set_picture(value)
+        elif item_type == b"gnre":
+            if len(value) >= 2:
+                index = struct.unpack(">H", value[:2])[0] - 1
+                if 0 <= index < len(ID3_GENRES):
+                    meta.set_tag("genre", ID3_GENRES[index])
+        else:
+            meta.set_tag(MP4_FIELDS[item_type], value.decode("utf-8", errors="replace"))
+        return
+
+
+def _probe_mp4(f: BinaryIO, file_size: int, meta: AudioMetadata) -> None:
+    meta.format = "m4a"
+    state: Dict = {}
+    f.seek(0)
+    _mp4_walk(f, file_size, meta, state)
+    meta.duration = state.get("duration")
+    if meta.duration:
+        meta.bitrate = int(round(file_size * 8 / meta.duration / 1000))
+
+
+# ---------------------------------------------------------------------------
+
+def probe_audio(path: str) -> AudioMetadata:
+    """解析音频文件元数据，格式无法识别或文件损坏时返回已解析到的部分"""
+    meta = AudioMetadata()
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(12)
+        f.seek(0)
+        try:
+            if head[:4] == b"fLaC":
+                _probe_flac(f, file_size, meta)
+            elif head[:4] == b"OggS":
+                _probe_ogg(f, file_size, meta)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+                _probe_wav(f, file_size, meta)
+            elif head[4:8] == b"ftyp":
+                _probe_mp4(f, file_size, meta)
+            elif (
+                head[:3] == b"ID3" or head[:1] == b"\xff"
+                or os.path.splitext(path)[1].lower() == ".mp3"
+            ):
+                _probe_mp3(f, file_size, meta)
+        except (ValueError, struct.error, IndexError) as e:
+            logger.warning(f"解析音频元数据失败 {path}: {e}")
+    return meta
+
+
+def save_cover_thumbnail(session: Session, picture: bytes) -> Optional[str]:
+    """把内嵌封面缩小后保存到内容存储，返回访问URL（引用随 session 提交）"""
+    try:
+        with Image.open(io.BytesIO(picture)) as img:
+            img.thumbnail((COVER_MAX_SIZE, COVER_MAX_SIZE))
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=85)
+    except Exception as e:
+        logger.warning(f"处理内嵌封面失败: {e}")
+        return None
+    blob = put_bytes(session, out.getvalue(), COVER_DIR, ".jpg")
+    return f"/{blob.file_path}"
+
+
+def probe_music_file(
+    session: Session,
+    path: str,
+    save_cover: bool = True,
+) -> Tuple[Optional[AudioMetadata], Optional[str]]:
+    """解析音乐文件元数据，并按需把内嵌封面保存为缩略图
+
+    元数据只是补充信息，解析失败时返回 (None, None)，不影响上传。
+    """
+    try:
+        meta = probe_audio(path)
+    except Exception as e:
+        logger.warning(f"解析音频元数据失败 {path}: {e}")
+        return None, None
+    cover_image_url = None
+    if save_cover and meta.picture:
+        cover_image_url = save_cover_thumbnail(session, meta.picture)
+    return meta, cover_image_url
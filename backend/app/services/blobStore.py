@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.models.fileBlob import FileBlob
+
+logger = logging.getLogger(__name__)
+
+
+def put_file(
+    session: Session,
+    src_path: str,
+    sha256: str,
+    size: int,
+    dest_dir: str,
+    extension: str,
+) -> FileBlob:
+    """把已写好的文件放入内容存储，并增加一次引用
+
+    相同内容已存在时直接删除 src_path 复用已有文件；否则以
+    ``<dest_dir>/<sha256><extension>`` 原子改名保存。先登记（或锁住）记录
+    再放置文件，与 unlink_released 的行锁配合，文件不会被并发删除。
+    引用计数的变更随调用方的事务一起提交，事务回滚只会留下可被下次上传复用的文件。
+    """
+    table = FileBlob.__table__
+    now = datetime.utcnow()
+
+    result = session.exec(
+        update(table)
+        .where(table.c.sha256 == sha256)
+        .values(ref_count=table.c.ref_count + 1, updated_at=now)
+    )
+    if result.rowcount == 1:
+        return _reuse_blob(session, src_path, sha256)
+
+    file_path = os.path.join(dest_dir, f"{sha256}{extension}")
+    blob = FileBlob(
+        sha256=sha256,
+        file_path=file_path,
+        file_size=size,
+        ref_count=1,
+        created_at=now,
+        updated_at=now,
+    )
+    try:
+        with session.begin_nested():
+            session.add(blob)
+    except IntegrityError:
+        # 并发上传了相同内容：对方已建好记录，改为增加引用
+        session.exec(
+            update(table)
+            .where(table.c.sha256 == sha256)
+            .values(ref_count=table.c.ref_count + 1, updated_at=now)
+        )
+        return _reuse_blob(session, src_path, sha256)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    os.replace(src_path, file_path)
+    return blob
+
+
+def _reuse_blob(session: Session, src_path: str, sha256: str) -> FileBlob:
+    """复用已有记录的文件；记录存在但文件丢失时用本次上传的内容补回"""
+    blob = session.get(FileBlob, sha256)
+    if os.path.exists(blob.file_path):
+        os.remove(src_path)
+        return blob
+    os.makedirs(os.path.dirname(blob.file_path) or ".", exist_ok=True)
+    os.replace(src_path, blob.file_path)
+    return blob
+
+
+def put_bytes(
+    session: Session,
+    data: bytes,
+    dest_dir: str,
+    extension: str,
+) -> FileBlob:
+    """把内存中的数据放入内容存储，并增加一次引用"""
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=dest_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        return put_file(
+            session, tmp_path, hashlib.sha256(data).hexdigest(), len(data),
+            dest_dir, extension,
+        )
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def release_blob(session: Session, sha256: str) -> Optional[str]:
+    """释放一次引用；引用归零时删除记录并返回待删除的文件路径
+
+    文件需在事务提交后通过 unlink_released 删除，避免回滚后文件已丢失。
+    """
+    table = FileBlob.__table__
+    session.exec(
+        update(table)
+        .where(table.c.sha256 == sha256, table.c.ref_count > 0)
+        .values(ref_count=table.c.ref_count - 1, updated_at=datetime.utcnow())
+    )
+    blob = session.get(FileBlob, sha256, populate_existing=True)
+    if blob is None or blob.ref_count > 0:
+        return None
+    file_path = blob.file_path
+    session.delete(blob)
+    return file_path
+
+
+def release_path(session: Session, file_path: str) -> Optional[str]:
+    """按文件路径释放引用；不在内容存储中的旧文件直接返回其路径"""
+    sha256 = session.exec(
+        select(FileBlob.sha256).where(FileBlob.file_path == file_path)
+    ).first()
+    if sha256 is None:
+        return file_path
+    return release_blob(session, sha256)
+
+
+def unlink_released(session: Session, file_paths: Iterable[Optional[str]]) -> List[str]:
+    """事务提交后删除引用归零的文件，返回实际删除的路径
+
+    每个路径在单独的事务中先以 SELECT ... FOR UPDATE 锁住该路径的记录（或索引间隙），
+    确认没有被重新登记后再删除文件：并发的 put_file 登记同一内容时
+    会等待这把锁，之后才放置文件，不会在检查和删除之间被删掉。
+    """
+    removed = []
+    for file_path in file_paths:
+        if not file_path:
+            continue
+        try:
+            still_used = session.exec(
+                select(FileBlob.sha256)
+                .where(FileBlob.file_path == file_path)
+                .with_for_update()
+            ).first()
+            if not still_used and os.path.exists(file_path):
+                os.remove(file_path)
+                removed.append(file_path)
+        except Exception as e:
+            logger.error(f"删除文件失败: {e}")
+        finally:
+            session.rollback()
+    return removed
@@ -0,0 +1,80 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.attachment import Attachment
+from app.services.periodicTask import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadCounterBuffer:
+    """附件下载次数的写缓冲
+
+    文件请求只在内存中按访问地址累加次数，由后台任务定期以一条批量语句
+    ``SET download_count = download_count + :n`` 写回，避免每次下载都提交事务。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    def add(self, file_url: str) -> None:
+        with self._lock:
+            self._counts[file_url] += 1
+
+    def flush(self) -> int:
+        """把缓冲的次数写回数据库，返回涉及的地址数"""
+        with self._lock:
+            counts = self._counts
+            self._counts = defaultdict(int)
+        if not counts:
+            return 0
+
+        table = Attachment.__table__
+        try:
+            with Session(engine) as session:
+                session.exec(
+                    update(table)
+                    .where(table.c.file_url == bindparam("b_file_url"))
+                    .values(download_count=table.c.download_count + bindparam("b_count")),
+                    params=[
+                        {"b_file_url": file_url, "b_count": count}
+                        for file_url, count in counts.items()
+                    ],
+                )
+                session.commit()
+        except Exception as e:
+            logger.error(f"写回附件下载次数失败: {e}")
+            with self._lock:
+                for file_url, count in counts.items():
+                    self._counts[file_url] += count
+            return 0
+        return len(counts)
+
+
+# 全局下载计数缓冲实例
+download_counter = DownloadCounterBuffer()
+
+_flusher = PeriodicTask(
+    "Download counter flusher",
+    download_counter.flush,
+    settings.media_download_flush_interval,
+    on_stop=download_counter.flush,
+)
+
+
+def start_download_counter_flusher() -> None:
+    """启动下载次数的定时写回任务（在应用启动时调用）"""
+    _flusher.start()
+
+
+async def stop_download_counter_flusher() -> None:
+    """停止定时写回并写回剩余次数（在应用关闭时调用）"""
+    await _flusher.stop()
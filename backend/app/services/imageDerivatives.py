@@ -0,0 +1,298 @@
+"""
+图片缩略图服务
+
+按配置的宽度把上传的图片缩放为 WebP/JPEG 缩略图，缓存在磁盘上：
+- 上传时只读取文件头获取尺寸，并把预生成任务提交到进程池
+- 请求 ``/uploads/images/{name}?w=480`` 时返回缓存的缩略图，缺失时按需生成，
+  同一缩略图的并发请求共用一次生成，按需生成的数量受并发上限约束
+- 缓存总大小超过上限时按最近最少访问淘汰
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 缩略图缓存目录，按宽度分子目录
+DERIVATIVE_DIR = "uploads/.derivatives"
+
+# 可以缩放的图片格式（SVG 为矢量图，GIF 缩放会丢失动画，均直接返回原图）
+RESIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+# 输出格式：Pillow 格式名、文件扩展名、MIME 类型
+FORMATS = {
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+}
+
+# EXIF 中表示图片需要旋转 90/270 度的方向值
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def probe_dimensions(path: str) -> Optional[Tuple[int, int]]:
+    """读取图片的显示尺寸（宽, 高）
+
+    Image.open 只解析文件头，不解码像素；带 EXIF 旋转信息的照片返回旋转后的尺寸。
+    """
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if img.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def is_resizable(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in RESIZABLE_EXTENSIONS
+
+
+def snap_width(width: int) -> int:
+    """把请求的宽度向上取到最近的一档配置宽度，超过最大档时取最大档"""
+    for candidate in settings.image_derivative_widths:
+        if candidate >= width:
+            return candidate
+    return settings.image_derivative_widths[-1]
+
+
+def choose_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """确定输出格式：优先使用显式指定的格式，否则浏览器支持 WebP 时用 WebP"""
+    if requested in FORMATS:
+        return requested
+    if accept and "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][2]
+
+
+def derivative_path(source_path: str, width: int, fmt: str) -> str:
+    """缩略图的缓存路径"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(DERIVATIVE_DIR, str(width), f"{stem}{FORMATS[fmt][1]}")
+
+
+def render_derivative(
+    source_path: str,
+    dest_path: str,
+    width: int,
+    fmt: str,
+    quality: int,
+) -> int:
+    """生成一张缩略图并返回文件大小（在进程池中执行）
+
+    不会放大图片；先写临时文件再原子改名，读到的缓存总是完整的。
+    """
+    pil_format = FORMATS[fmt][0]
+    with Image.open(source_path) as img:
+        # JPEG 可在解码时直接按 1/2、1/4、1/8 缩小，显著减少解码开销
+        img.draft("RGB", (width, width))
+        img = ImageOps.exif_transpose(img)
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+
+        has_alpha = img.mode in ("RGBA", "LA") or (
+            img.mode == "P" and "transparency" in img.info
+        )
+        if pil_format == "JPEG" and has_alpha:
+            # JPEG 不支持透明通道，铺白底
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif has_alpha:
+            img = img.convert("RGBA")
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".derivative-", dir=dest_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, format=pil_format, quality=quality)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return os.path.getsize(dest_path)
+
+
+class ImageDerivativeService:
+    """缩略图生成与磁盘缓存管理"""
+
+    def __init__(self, max_bytes: int, workers: int, max_concurrent: int):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # 缓存文件路径 -> 大小，按最近访问排序（最旧的在前）
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+        # 正在生成的缩略图，同一路径的请求共用一个 Future
+        self._inflight: Dict[str, Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn 启动的子进程不继承父进程的线程和数据库连接
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _load_index(self) -> None:
+        """首次使用时扫描缓存目录，按修改时间建立访问顺序（需持有锁）"""
+        if self._index is not None:
+            return
+        entries = []
+        for root, _, files in os.walk(DERIVATIVE_DIR):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((path, size) for _, path, size in entries)
+        self._total_bytes = sum(self._index.values())
+
+    def _touch(self, path: str) -> None:
+        with self._lock:
+            self._load_index()
+            if path in self._index:
+                self._index.move_to_end(path)
+            else:
+                # 其他进程生成的缩略图
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    return
+                self._index[path] = size
+                self._total_bytes += size
+                self._evict()
+
+    def _evict(self) -> None:
+        """缓存超过上限时删除最近最少访问的缩略图（需持有锁）"""
+        while self._total_bytes > self.max_bytes and self._index:
+            path, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除缩略图缓存失败 {path}: {e}")
+
+    def _finished(self, dest_path: str, future: Future) -> None:
+        with self._lock:
+            self._inflight.pop(dest_path, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                logger.warning(f"生成缩略图失败 {dest_path}: {error}")
+                return
+            self._load_index()
+            self._total_bytes -= self._index.pop(dest_path, 0)
+            self._index[dest_path] = future.result()
+            self._total_bytes += self._index[dest_path]
+            self._evict()
+
+    def submit(self, source_path: str, width: int, fmt: str) -> Future:
+        """提交生成任务；同一缩略图正在生成时返回已有的任务"""
+        dest_path = derivative_path(source_path, width, fmt)
+        with self._lock:
+            future = self._inflight.get(dest_path)
+            if future is not None:
+                return future
+        quality = (
+            settings.image_derivative_webp_quality if fmt == "webp"
+            else settings.image_derivative_jpeg_quality
+        )
+        executor = self._get_executor()
+        with self._lock:
+            future = self._inflight.get(dest_path)
+            if future is None:
+                future = executor.submit(
+                    render_derivative, source_path, dest_path, width, fmt, quality
+                )
+                self._inflight[dest_path] = future
+                future.add_done_callback(
+                    lambda f: self._finished(dest_path, f)
+                )
+        return future
+
+    def pregenerate(
+        self,
+        source_path: str,
+        dimensions: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """上传后在后台生成比原图小的各档缩略图（不等待结果）"""
+        if not settings.image_derivative_pregenerate or not is_resizable(source_path):
+            return
+        if dimensions is None:
+            dimensions = probe_dimensions(source_path)
+        if dimensions is None:
+            return
+        try:
+            for width in settings.image_derivative_widths:
+                if width >= dimensions[0]:
+                    break
+                for fmt in settings.image_derivative_pregenerate:
+                    if fmt in FORMATS:
+                        self.submit(source_path, width, fmt)
+        except Exception as e:
+            logger.warning(f"提交缩略图预生成任务失败: {e}")
+
+    def _cached(self, source_path: str, dest_path: str) -> bool:
+        """缓存存在且不早于原图"""
+        try:
+            return os.stat(dest_path).st_mtime >= os.stat(source_path).st_mtime
+        except OSError:
+            return False
+
+    async def get(self, source_path: str, width: int, fmt: str) -> str:
+        """返回缩略图路径，缓存缺失时按需生成"""
+        dest_path = derivative_path(source_path, width, fmt)
+        if not await asyncio.to_thread(self._cached, source_path, dest_path):
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            async with self._semaphore:
+                await asyncio.wrap_future(self.submit(source_path, width, fmt))
+        # 首次访问会扫描缓存目录，淘汰时会删除文件，都放到线程中执行
+        await asyncio.to_thread(self._touch, dest_path)
+        return dest_path
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_derivatives = ImageDerivativeService(
+    max_bytes=settings.image_derivative_cache_bytes,
+    workers=settings.image_derivative_workers,
+    max_concurrent=settings.image_derivative_concurrency,
+)
@@ -4,16 +4,16 @@
 """
 import os
 import random
-import uuid
 import urllib.request
 import urllib.parse
-from datetime import datetime
 from typing import List, Optional, Dict, Any
 
 from app.core.config import settings
 from app.db.session import get_session
 from app.models.attachment import Attachment, AttachmentCreate
 from app.models.system import SystemDefault
+from app.services.blobStore import put_bytes
+from app.services.imageDerivatives import image_derivatives, probe_dimensions
 
 
 class ImageSearchService:
@@ -290,46 +290,46 @@ class ImageSearchService:
             if not image_data:
                 return None
 
-            # 生成文件名
             file_extension = self._get_file_extension(
                 image_info["download_url"]
             )
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            random_id = str(uuid.uuid4())[:8]
-            filename = f"{timestamp}_{random_id}{file_extension}"
-
-            # 保存到本地
-            upload_dir = "uploads/images"
-            os.makedirs(upload_dir, exist_ok=True)
-            file_path = os.path.join(upload_dir, filename)
-
-            with open(file_path, 'wb') as f:
-                f.write(image_data)
-            # 计算文件大小
-            file_size = len(image_data)
-
-            # 创建附件记录
             desc = image_info.get('description', 'random_image')
-            attachment_data = AttachmentCreate(
-                filename=filename,
-                original_name=f"{desc}{file_extension}",
-                file_path=file_path,
-                file_url=f"/{file_path}",
-                file_size=file_size,
-                file_type=f"image/{file_extension[1:]}",
-                file_extension=file_extension,
-                uploaded_by=user_id,
-                description=f"自动生成 - {desc}",
-                tags=f"source:{image_info['source']},"
-                     f"author:{image_info['author']}"
-            )
 
-            # 保存到数据库
             with next(get_session()) as session:
+                # 保存到内容存储（相同图片只保留一份）
+                blob = put_bytes(
+                    session, image_data, "uploads/images", file_extension
+                )
+
+                dimensions = probe_dimensions(blob.file_path)
+                width, height = dimensions or (None, None)
+
+                # 创建附件记录
+                attachment_data = AttachmentCreate(
+                    filename=os.path.basename(blob.file_path),
+                    original_name=f"{desc}{file_extension}",
+                    file_path=blob.file_path,
+                    file_url=f"/{blob.file_path}",
+                    file_size=len(image_data),
+                    file_type=f"image/{file_extension[1:]}",
+                    file_extension=file_extension,
+                    width=width,
+                    height=height,
+                    uploaded_by=user_id,
+                    description=f"自动生成 - {desc}",
+                    tags=f"source:{image_info['source']},"
+                         f"author:{image_info['author']}",
+                    blob_sha256=blob.sha256,
+                )
+
+                # 保存到数据库
                 attachment = Attachment.model_validate(attachment_data)
                 session.add(attachment)
                 session.commit()
                 session.refresh(attachment)
+
+                if dimensions is not None:
+                    image_derivatives.pregenerate(blob.file_path, dimensions)
                 return attachment
 
         except Exception as e:
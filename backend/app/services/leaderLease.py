@@ -0,0 +1,118 @@
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.db.session import engine
+from app.models.schedulerLease import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+def _default_owner() -> str:
+    """生成当前进程的持有者标识"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """基于数据库行的选主租约
+
+    多个 worker（甚至多台主机）共享同一个数据库时，只有成功把租约行
+    写成自己名下、且租约未过期的进程是 leader。leader 定期续约（心跳），
+    进程崩溃后租约过期，其他进程在下一次心跳时接管。
+
+    租约时间使用各进程的本地 UTC 时间，有效期应远大于主机间的时钟偏差。
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, owner: Optional[str] = None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = owner or _default_owner()
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """获取或续约租约，返回当前进程是否为 leader"""
+        table = SchedulerLease.__table__
+        now = datetime.utcnow()
+        values = {
+            "owner": self.owner,
+            "expires_at": now + self.ttl,
+            "updated_at": now,
+        }
+
+        try:
+            with Session(engine) as session:
+                # 自己持有或已过期的租约：一条条件更新完成续约/接管
+                result = session.exec(
+                    update(table)
+                    .where(
+                        table.c.name == self.name,
+                        or_(
+                            table.c.owner == self.owner,
+                            table.c.expires_at < now,
+                        ),
+                    )
+                    .values(**values)
+                )
+                acquired = result.rowcount == 1
+
+                if not acquired and session.get(SchedulerLease, self.name) is None:
+                    # 租约行不存在：插入，主键冲突说明被其他进程抢先
+                    try:
+                        session.exec(insert(table).values(name=self.name, **values))
+                        acquired = True
+                    except IntegrityError:
+                        session.rollback()
+                        acquired = False
+
+                session.commit()
+        except Exception as e:
+            logger.error(f"获取租约 {self.name} 失败: {e}")
+            acquired = False
+
+        if acquired != self.is_leader:
+            logger.info(
+                f"Lease {self.name} {'acquired' if acquired else 'lost'} by {self.owner}"
+            )
+        self.is_leader = acquired
+        return acquired
+
+    def release(self) -> None:
+        """主动释放租约，让其他进程无需等待过期即可接管"""
+        if not self.is_leader:
+            return
+
+        table = SchedulerLease.__table__
+        try:
+            with Session(engine) as session:
+                session.exec(
+                    update(table)
+                    .where(
+                        table.c.name == self.name,
+                        table.c.owner == self.owner,
+                    )
+                    .values(expires_at=datetime.utcnow())
+                )
+                session.commit()
+            logger.info(f"Lease {self.name} released by {self.owner}")
+        except Exception as e:
+            logger.error(f"释放租约 {self.name} 失败: {e}")
+        finally:
+            self.is_leader = False
+
+    def get_holder(self) -> Optional[str]:
+        """获取当前有效租约的持有者"""
+        try:
+            with Session(engine) as session:
+                lease = session.get(SchedulerLease, self.name)
+                if lease and lease.expires_at > datetime.utcnow():
+                    return lease.owner
+        except Exception as e:
+            logger.error(f"查询租约 {self.name} 失败: {e}")
+        return None
@@ -0,0 +1,239 @@
+"""
+媒体文件响应
+
+为上传的音乐、图片和附件提供支持缓存与断点续播的文件响应：
+- 强 ETag 取自内容的 SHA-256：内容寻址的文件直接使用文件名，其余文件计算一次后缓存
+- 支持 If-None-Match / If-Modified-Since 返回 304
+- 支持单段 Range 请求返回 206（含 If-Range），播放器拖动进度时无需从头下载
+- 内容寻址的文件名随内容变化，返回 immutable 的长期缓存头
+"""
+import hashlib
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from starlette.responses import FileResponse, Response
+
+from app.core.config import settings
+
+# 内容寻址的文件名：<sha256><扩展名>
+_CONTENT_ADDRESSED_RE = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# 流式发送文件时每次读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+
+def is_content_addressed(path: str) -> bool:
+    return bool(_CONTENT_ADDRESSED_RE.match(os.path.basename(path)))
+
+
+class _HashCache:
+    """非内容寻址文件的 SHA-256 缓存，按 (路径, 大小, 修改时间) 失效"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[int, float, str]]" = OrderedDict()
+
+    def get(self, path: str, stat_result: os.stat_result) -> str:
+        with self._lock:
+            item = self._items.get(path)
+            if item and item[:2] == (stat_result.st_size, stat_result.st_mtime):
+                self._items.move_to_end(path)
+                return item[2]
+
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+
+        with self._lock:
+            self._items[path] = (stat_result.st_size, stat_result.st_mtime, digest)
+            self._items.move_to_end(path)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return digest
+
+
+_hash_cache = _HashCache(settings.media_hash_cache_size)
+
+
+def _content_hash(path: str, stat_result: os.stat_result) -> str:
+    if is_content_addressed(path):
+        return os.path.splitext(os.path.basename(path))[0]
+    return _hash_cache.get(path, stat_result)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较"""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == etag
+        for tag in candidates
+    )
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since is not None and int(mtime) <= since.timestamp()
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range，返回闭区间 (start, end)
+
+    格式不支持（如多段）时返回 None 按整个文件处理；范围无法满足时返回 416。
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.group(1), match.group(2)
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # bytes=-N 表示最后 N 个字节
+        start = max(0, size - int(last))
+        end = size - 1
+    if start >= size or size == 0 or (not first and int(last) == 0):
+        raise HTTPException(
+            status_code=416,
+            detail="请求的范围无效",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """发送文件中的一段（206 Partial Content）"""
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        size: int,
+        headers: Dict[str, str],
+        media_type: Optional[str],
+    ):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = 206
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({
+            **headers,
+            "content-range": f"bytes {start}-{end}/{size}",
+            "content-length": str(end - start + 1),
+        })
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+        if remaining > 0:
+            # 文件在发送过程中被截断
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def media_response(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """返回文件，处理条件请求和 Range 请求
+
+    cache_control 为空时，内容寻址的文件使用长期缓存，其余文件每次重新验证。
+    """
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    digest = await anyio.to_thread.run_sync(_content_hash, path, stat_result)
+    etag = f'"{digest}"'
+    if cache_control is None:
+        cache_control = (
+            IMMUTABLE_CACHE_CONTROL if is_content_addressed(path)
+            else REVALIDATE_CACHE_CONTROL
+        )
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    common_headers = {
+        **(headers or {}),
+        "etag": etag,
+        "last-modified": last_modified,
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (
+        (if_none_match is not None and etag_matches(if_none_match, etag))
+        or (if_none_match is None and if_modified_since
+            and _not_modified_since(if_modified_since, stat_result.st_mtime))
+    ):
+        return Response(status_code=304, headers=common_headers)
+
+    media_type = media_type or guess_type(path)[0] or "application/octet-stream"
+    range_header = request.headers.get("range")
+    if range_header:
+        # If-Range 与当前版本不一致时忽略 Range，返回完整的新文件
+        if_range = request.headers.get("if-range")
+        if if_range and if_range != etag and if_range != last_modified:
+            range_header = None
+    if range_header:
+        byte_range = _parse_range(range_header, stat_result.st_size)
+        if byte_range is not None:
+            return FileRangeResponse(
+                path, byte_range[0], byte_range[1], stat_result.st_size,
+                common_headers, media_type,
+            )
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers=common_headers,
+        stat_result=stat_result,
+    )
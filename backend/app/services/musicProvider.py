@@ -0,0 +1,293 @@
+"""
+在线音乐接口客户端
+
+通过共享的 aiohttp 连接池异步请求音乐平台接口：
+- 每次请求有超时，同时进行的上游请求数受并发上限约束
+- 搜索结果和歌曲播放地址按 TTL 缓存在进程内
+- 相同的查询正在进行时，后来的请求等待同一个结果，不重复请求上游
+- 配置 provider: stub 时使用本地数据，便于离线开发和测试
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import aiohttp
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.http_client import http_session
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """带过期时间和容量上限的进程内缓存（超出容量时淘汰最久未使用的项）"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+class MusicProvider(ABC):
+    """音乐平台接口"""
+
+    @abstractmethod
+    async def search(self, keywords: str, limit: int) -> dict:
+        """搜索歌曲"""
+
+    @abstractmethod
+    async def get_song_url(self, song_id: str) -> dict:
+        """获取歌曲播放地址"""
+
+
+def default_song_url(song_id: str, message: str) -> dict:
+    """接口不可用时使用的外链播放地址"""
+    return {
+        'url': f'https://music.163.com/song/media/outer/url?id={song_id}',
+        'code': 200,
+        'message': message
+    }
+
+
+class NeteaseProvider(MusicProvider):
+    """网易云音乐接口"""
+
+    def __init__(self, timeout: float, max_concurrency: int):
+        self.base_url = "https://music.163.com/api"
+        self.headers = {
+            'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                           'AppleWebKit/537.36')
+        }
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _get_json(self, path: str, params: dict) -> dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            async with http_session() as session:
+                async with session.get(
+                    f"{self.base_url}{path}",
+                    params=params,
+                    headers=self.headers,
+                    timeout=self.timeout,
+                ) as response:
+                    # 网易云接口的 Content-Type 不一定是 application/json
+                    return await response.json(content_type=None)
+
+    async def search(self, keywords: str, limit: int) -> dict:
+        params = {
+            's': keywords,
+            'type': 1,  # 1: 单曲
+            'limit': limit,
+            'offset': 0
+        }
+        try:
+            data = await self._get_json("/search/get", params)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="搜索失败: 上游接口超时")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
+        return self._format_search_results(data)
+
+    async def get_song_url(self, song_id: str) -> dict:
+        try:
+            data = await self._get_json("/song/url", {'id': song_id})
+        except asyncio.TimeoutError:
+            return default_song_url(song_id, "API调用超时，使用默认URL")
+        except Exception as e:
+            return default_song_url(song_id, f"API调用失败，使用默认URL: {str(e)}")
+
+        # 如果API返回错误，返回默认URL
+        if data.get('code') != 200:
+            return default_song_url(song_id, "使用默认播放URL")
+        return data
+
+    def _format_search_results(self, data: dict) -> dict:
+        """格式化搜索结果"""
+        songs = []
+        if 'result' in data and 'songs' in data['result']:
+            for song in data['result']['songs']:
+                songs.append({
+                    'id': song['id'],
+                    'title': song['name'],
+                    'artist': ', '.join([artist['name'] for artist in song['artists']]),
+                    'album': song['album']['name'],
+                    'duration': song['duration'] // 1000,  # 转换为秒
+                    'platform': 'netease'
+                })
+        return {'songs': songs}
+
+
+# 本地数据（离线开发、测试以及 /hot 接口使用）
+STUB_SONGS = [
+    {
+        "id": 1,
+        "title": "風の住む街",
+        "artist": "磯村由纪子",
+        "album": "風の住む街",
+        "duration": 285,
+        "platform": "netease",
+        "url": "https://music.163.com/song/media/outer/url?id=123456"
+    },
+    {
+        "id": 2,
+        "title": "ヨスガノソラメインテーマ",
+        "artist": "記",
+        "album": "ヨスガノソラ",
+        "duration": 180,
+        "platform": "netease",
+        "url": "https://music.163.com/song/media/outer/url?id=123457"
+    },
+    {
+        "id": 3,
+        "title": "蝶恋",
+        "artist": "仙剑奇侠传",
+        "album": "仙剑奇侠传原声带",
+        "duration": 240,
+        "platform": "netease",
+        "url": "https://music.163.com/song/media/outer/url?id=123458"
+    },
+    {
+        "id": 4,
+        "title": "月光の雲海",
+        "artist": "久石让",
+        "album": "天空之城",
+        "duration": 200,
+        "platform": "netease",
+        "url": "https://music.163.com/song/media/outer/url?id=123459"
+    }
+]
+
+
+class StubProvider(MusicProvider):
+    """本地数据，不访问网络"""
+
+    def __init__(self):
+        # 调用次数，测试中用来确认缓存和请求合并是否生效
+        self.calls = 0
+
+    async def search(self, keywords: str, limit: int) -> dict:
+        self.calls += 1
+        await asyncio.sleep(0)
+        keyword = keywords.lower()
+        songs = [
+            {key: value for key, value in song.items() if key != "url"}
+            for song in STUB_SONGS
+            if keyword in song["title"].lower()
+            or keyword in song["artist"].lower()
+            or keyword in song["album"].lower()
+        ]
+        return {'songs': songs[:limit]}
+
+    async def get_song_url(self, song_id: str) -> dict:
+        self.calls += 1
+        await asyncio.sleep(0)
+        for song in STUB_SONGS:
+            if str(song["id"]) == str(song_id):
+                return {'code': 200, 'data': [{'id': song["id"], 'url': song["url"]}]}
+        return default_song_url(song_id, "使用默认播放URL")
+
+
+class MusicClient:
+    """带缓存和请求合并的音乐接口客户端"""
+
+    def __init__(
+        self,
+        provider: MusicProvider,
+        search_ttl: float,
+        song_url_ttl: float,
+        max_entries: int,
+    ):
+        self.provider = provider
+        self.search_ttl = search_ttl
+        self.song_url_ttl = song_url_ttl
+        self._cache = TTLCache(max_entries)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def _cached(
+        self,
+        key: Hashable,
+        ttl: float,
+        fetch: Callable[[], Awaitable[dict]],
+        cacheable: Callable[[dict], bool] = lambda result: True,
+    ) -> dict:
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+
+            def _done(done: asyncio.Future) -> None:
+                self._inflight.pop(key, None)
+                if not done.cancelled() and done.exception() is None:
+                    if cacheable(done.result()):
+                        self._cache.set(key, done.result(), ttl)
+
+            future.add_done_callback(_done)
+        # shield：某个等待者断开时不取消其他请求共用的上游调用
+        return await asyncio.shield(future)
+
+    async def search(self, keywords: str, limit: int = 30) -> dict:
+        """搜索歌曲"""
+        keywords = keywords.strip()
+        return await self._cached(
+            ("search", keywords.lower(), limit),
+            self.search_ttl,
+            lambda: self.provider.search(keywords, limit),
+        )
+
+    async def get_song_url(self, song_id: str) -> dict:
+        """获取歌曲播放URL（上游失败时的默认地址不缓存）"""
+        return await self._cached(
+            ("song_url", str(song_id)),
+            self.song_url_ttl,
+            lambda: self.provider.get_song_url(song_id),
+            cacheable=lambda result: 'message' not in result,
+        )
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+
+def _create_provider() -> MusicProvider:
+    if settings.music_provider == "stub":
+        return StubProvider()
+    return NeteaseProvider(
+        timeout=settings.music_provider_timeout,
+        max_concurrency=settings.music_provider_max_concurrency,
+    )
+
+
+music_client = MusicClient(
+    _create_provider(),
+    search_ttl=settings.music_search_cache_ttl,
+    song_url_ttl=settings.music_song_url_cache_ttl,
+    max_entries=settings.music_cache_max_entries,
+)
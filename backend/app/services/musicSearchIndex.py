@@ -0,0 +1,271 @@
+"""
+本地音乐库的搜索索引
+
+曲目的标题、艺术家、专辑和流派在进程内建立倒排索引：
+- 文本先做 NFKC 规范化并转小写（全角字母数字、大小写不敏感）
+- 以单字和相邻两字作为索引项，中文和英文都按子串匹配，结果再逐条核对
+- 含中文的字段额外索引全拼和首字母（需要 pypinyin），"zhoujielun"、"zjl" 都能搜到"周杰伦"
+- 标题、艺术家、专辑的开头和各单词开头另建有序表，用于前缀补全
+
+本进程的上传、删除会立即更新索引；其他进程（以及命令行脚本）的修改
+按 updated_at 每隔 check_interval 秒增量同步一次。
+应用启动时在线程中预先全量加载，避免第一次搜索时在请求中建立索引。
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.local_music import LocalMusic
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # pragma: no cover - 未安装时只是不支持拼音搜索
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+# 增量同步时回看的时间，覆盖提交晚于 updated_at 的事务
+RESCAN_WINDOW = timedelta(seconds=60)
+
+SEARCH_FIELDS = ("title", "artist", "album", "genre")
+SUGGEST_FIELDS = ("title", "artist", "album")
+# 排序权重：标题 > 艺术家 > 专辑 > 流派 > 拼音
+FIELD_WEIGHTS = {"title": 8, "artist": 4, "album": 2, "genre": 1}
+PINYIN_WEIGHT = 1
+
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+_SPACE_RE = re.compile(r"\s+")
+_WORD_START_RE = re.compile(r"(?<=[\s\-_/(（\[【·&,，])(?=\S)")
+
+
+def normalize(text: Optional[str]) -> str:
+    """NFKC 规范化、转小写并合并空白"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def pinyin_forms(text: str) -> Tuple[str, ...]:
+    """含中文时返回 (全拼, 首字母)，否则返回空元组"""
+    if lazy_pinyin is None or not _CJK_RE.search(text):
+        return ()
+    full = "".join(lazy_pinyin(text, style=Style.NORMAL)).replace(" ", "")
+    initials = "".join(lazy_pinyin(text, style=Style.FIRST_LETTER)).replace(" ", "")
+    return tuple(normalize(value) for value in (full, initials) if value)
+
+
+def _grams(text: str) -> Set[str]:
+    """单字和相邻两字"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.discard(" ")
+    return grams
+
+
+class _Document:
+    __slots__ = ("music_id", "genre", "fields", "pinyin", "grams")
+
+    def __init__(self, music: LocalMusic):
+        self.music_id = music.id
+        self.genre = music.genre
+        self.fields: Dict[str, str] = {
+            field: normalize(getattr(music, field)) for field in SEARCH_FIELDS
+        }
+        self.pinyin: Dict[str, Tuple[str, ...]] = {
+            field: pinyin_forms(value) for field, value in self.fields.items()
+        }
+        self.grams: Set[str] = set()
+        for field, value in self.fields.items():
+            self.grams |= _grams(value)
+            for form in self.pinyin[field]:
+                self.grams |= _grams(form)
+
+    def score(self, query: str, compact: str) -> int:
+        """匹配得分，0 表示不匹配；字段开头匹配的得分翻倍"""
+        score = 0
+        for field, value in self.fields.items():
+            position = value.find(query)
+            if position >= 0:
+                score += FIELD_WEIGHTS[field] * (2 if position == 0 else 1)
+            elif compact and any(compact in form for form in self.pinyin[field]):
+                score += PINYIN_WEIGHT
+        return score
+
+    def prefix_keys(self) -> Iterable[str]:
+        for field in SUGGEST_FIELDS:
+            value = self.fields[field]
+            if not value:
+                continue
+            yield value
+            for match in _WORD_START_RE.finditer(value):
+                yield value[match.start():]
+            yield from self.pinyin[field]
+
+
+class MusicSearchIndex:
+    """本地音乐库的进程内搜索索引"""
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._docs: Dict[int, _Document] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._prefixes: List[Tuple[str, int]] = []
+        self._prefixes_dirty = False
+        self._loaded = False
+        self._watermark: Optional[datetime] = None
+        self._checked_at = 0.0
+
+    # ---------- 维护 ----------
+
+    def _add(self, music: LocalMusic) -> None:
+        self._discard(music.id)
+        if not music.is_active:
+            return
+        doc = _Document(music)
+        self._docs[music.id] = doc
+        for gram in doc.grams:
+            self._postings.setdefault(gram, set()).add(music.id)
+        self._prefixes_dirty = True
+
+    def _discard(self, music_id: int) -> None:
+        doc = self._docs.pop(music_id, None)
+        if doc is None:
+            return
+        for gram in doc.grams:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(music_id)
+                if not ids:
+                    del self._postings[gram]
+        self._prefixes_dirty = True
+
+    def _advance(self, musics: Iterable[LocalMusic]) -> None:
+        for music in musics:
+            self._add(music)
+            if music.updated_at and (
+                self._watermark is None or music.updated_at > self._watermark
+            ):
+                self._watermark = music.updated_at
+
+    def _sync(self) -> None:
+        """首次使用时全量加载，之后按 updated_at 增量同步其他进程的修改"""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._loaded and now - self._checked_at < self.check_interval:
+                return
+            with Session(engine) as session:
+                if not self._loaded:
+                    musics = session.exec(select(LocalMusic)).all()
+                else:
+                    since = (
+                        self._watermark - RESCAN_WINDOW
+                        if self._watermark else datetime.min
+                    )
+                    musics = session.exec(
+                        select(LocalMusic).where(LocalMusic.updated_at >= since)
+                    ).all()
+                self._advance(musics)
+            if not self._loaded:
+                logger.debug(f"Music search index loaded: {len(self._docs)} tracks")
+            self._loaded = True
+            self._checked_at = now
+
+    def warm(self) -> int:
+        """全量加载索引（在应用启动时调用），返回索引的曲目数"""
+        self._sync()
+        with self._lock:
+            count = len(self._docs)
+        logger.info(f"Music search index warmed: {count} tracks")
+        return count
+
+    def upsert(self, music: LocalMusic) -> None:
+        """曲目创建或修改后调用（已删除的曲目会从索引移除）"""
+        with self._lock:
+            if self._loaded:
+                self._advance([music])
+
+    def remove(self, music_id: int) -> None:
+        with self._lock:
+            self._discard(music_id)
+
+    # ---------- 查询 ----------
+
+    def search(self, query: str, genre: Optional[str] = None) -> List[int]:
+        """返回匹配的曲目 ID，按得分从高到低、ID 从小到大排序"""
+        self._sync()
+        query = normalize(query)
+        compact = query.replace(" ", "")
+        if not query:
+            return []
+        with self._lock:
+            candidates = self._candidates(query)
+            if compact != query:
+                candidates |= self._candidates(compact)
+            scored = []
+            for music_id in candidates:
+                doc = self._docs[music_id]
+                if genre and doc.genre != genre:
+                    continue
+                score = doc.score(query, compact)
+                if score:
+                    scored.append((-score, music_id))
+        scored.sort()
+        return [music_id for _, music_id in scored]
+
+    def _candidates(self, text: str) -> Set[int]:
+        grams = {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+        result: Optional[Set[int]] = None
+        for gram in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+            ids = self._postings.get(gram)
+            if not ids:
+                return set()
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[int]:
+        """标题、艺术家、专辑（或其拼音）以 prefix 开头的曲目 ID"""
+        self._sync()
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            if self._prefixes_dirty:
+                self._prefixes = sorted(
+                    (key, music_id)
+                    for music_id, doc in self._docs.items()
+                    for key in doc.prefix_keys()
+                )
+                self._prefixes_dirty = False
+            prefixes = self._prefixes
+
+        result: List[int] = []
+        seen: Set[int] = set()
+        index = bisect.bisect_left(prefixes, (prefix, -1))
+        while index < len(prefixes) and len(result) < limit:
+            key, music_id = prefixes[index]
+            if not key.startswith(prefix):
+                break
+            if music_id not in seen:
+                seen.add(music_id)
+                result.append(music_id)
+            index += 1
+        return result
+
+
+# 全局音乐搜索索引实例
+music_search_index = MusicSearchIndex(settings.music_search_sync_interval)
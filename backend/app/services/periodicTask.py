@@ -0,0 +1,56 @@
+"""
+应用事件循环上的后台定时任务
+
+写缓冲一类的服务需要定期执行一个同步函数（放到线程中，不阻塞事件循环），
+并在应用关闭时取消任务、最后执行一次收尾（例如写回剩余数据）。
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """按固定间隔在线程中执行同步函数"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        interval: float,
+        on_stop: Optional[Callable[[], Any]] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.on_stop = on_stop
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.func)
+            except Exception as e:
+                logger.error(f"定时任务 {self.name} 执行失败: {e}")
+
+    def start(self) -> None:
+        """在当前事件循环上启动（已在运行时不重复启动）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"{self.name} started, interval={self.interval}s")
+
+    async def stop(self) -> Any:
+        """取消任务，再在线程中执行一次 on_stop 并返回其结果"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.on_stop is None:
+            return None
+        return await asyncio.to_thread(self.on_stop)
@@ -0,0 +1,171 @@
+"""
+博客播放器的播放列表清单
+
+公开播放列表（曲目、顺序、时长、封面）和自动播放开关合并为一份 JSON，
+构建后连同 ETag 缓存在进程内，播放器启动时一次请求即可拿到全部数据，
+未变化时返回 304。
+
+播放列表或曲目被修改后调用 invalidate() 递增 cache_version 表中的版本号；
+各进程最多每 check_interval 秒读取一次版本号，发现变化后重新构建。
+自动播放开关来自设置缓存，随设置缓存的更新生效，不需要重新构建清单。
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.local_music import LocalMusic, MusicPlaylist, PlaylistMusic
+from app.services.settingsCache import (
+    bump_cache_version,
+    read_cache_version,
+    settings_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = "music_manifest"
+
+NO_PUBLIC_PLAYLIST_MESSAGE = "没有公开的播放列表"
+
+
+def _track(music: LocalMusic) -> dict:
+    return {
+        "id": music.id,
+        "title": music.title,
+        "artist": music.artist,
+        "album": music.album,
+        "duration": music.duration,
+        "file_url": music.file_url,
+        "cover_image_url": music.cover_image_url,
+        "genre": music.genre,
+        "year": music.year,
+    }
+
+
+def build_public_playlist(session: Session) -> Optional[dict]:
+    """查询公开的播放列表及其中的曲目（按位置排序），没有时返回 None"""
+    public_playlist = session.exec(
+        select(MusicPlaylist)
+        .where(
+            MusicPlaylist.is_public.is_(True),
+            MusicPlaylist.is_active.is_(True),
+        )
+        .order_by(MusicPlaylist.id)
+    ).first()
+    if not public_playlist:
+        return None
+
+    musics = session.exec(
+        select(LocalMusic)
+        .join(PlaylistMusic, PlaylistMusic.track_id == LocalMusic.id)
+        .where(
+            PlaylistMusic.playlist_id == public_playlist.id,
+            LocalMusic.is_active.is_(True),
+        )
+        .order_by(PlaylistMusic.position, PlaylistMusic.id)
+    ).all()
+    tracks = [_track(music) for music in musics]
+
+    return {
+        "id": public_playlist.id,
+        "name": public_playlist.name,
+        "description": public_playlist.description,
+        "cover_image_url": public_playlist.cover_image_url,
+        "music_count": len(tracks),
+        "total_duration": sum(track["duration"] or 0 for track in tracks),
+        "musics": tracks,
+    }
+
+
+class _Manifest:
+    """某一版本的公开播放列表，以及按自动播放开关序列化好的响应体"""
+
+    def __init__(self, version: int, playlist: Optional[dict]):
+        self.version = version
+        self.playlist = playlist
+        self._bodies: Dict[bool, Tuple[bytes, str]] = {}
+
+    def body(self, auto_play: bool) -> Tuple[bytes, str]:
+        cached = self._bodies.get(auto_play)
+        if cached is None:
+            manifest: Dict[str, Any] = {
+                "auto_play": auto_play,
+                "playlist": self.playlist,
+            }
+            if self.playlist is None:
+                manifest["message"] = NO_PUBLIC_PLAYLIST_MESSAGE
+            body = json.dumps(
+                manifest, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            cached = self._bodies[auto_play] = (body, etag)
+        return cached
+
+
+class PlaylistManifestCache:
+    """公开播放列表清单的进程内缓存"""
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._manifest: Optional[_Manifest] = None
+        self._checked_at = 0.0
+
+    def _load(self) -> _Manifest:
+        with Session(engine) as session:
+            version = read_cache_version(session, CACHE_NAME)
+            playlist = build_public_playlist(session)
+        logger.debug(
+            f"Playlist manifest built: version={version}, "
+            f"tracks={playlist['music_count'] if playlist else 0}"
+        )
+        return _Manifest(version, playlist)
+
+    def _current(self) -> _Manifest:
+        """获取当前清单，必要时检查版本并重新构建"""
+        manifest = self._manifest
+        now = time.monotonic()
+        if manifest is not None and now - self._checked_at < self.check_interval:
+            return manifest
+
+        with self._lock:
+            if self._manifest is not None and now - self._checked_at < self.check_interval:
+                return self._manifest
+
+            if self._manifest is not None:
+                with Session(engine) as session:
+                    version = read_cache_version(session, CACHE_NAME)
+                if version == self._manifest.version:
+                    self._checked_at = now
+                    return self._manifest
+
+            self._manifest = self._load()
+            self._checked_at = now
+            return self._manifest
+
+    def invalidate(self) -> None:
+        """播放列表或曲目被修改后调用：递增全局版本号，并让本进程下次请求时重新构建"""
+        bump_cache_version(CACHE_NAME)
+        with self._lock:
+            self._manifest = None
+
+    def auto_play(self) -> bool:
+        return bool(settings_cache.get_setting_value("music", "auto_play", False))
+
+    def public_playlist(self) -> Optional[dict]:
+        """公开的播放列表（只读，调用方不要修改）"""
+        return self._current().playlist
+
+    def body(self) -> Tuple[bytes, str]:
+        """序列化好的完整清单和对应的 ETag"""
+        return self._current().body(self.auto_play())
+
+
+# 全局播放列表清单实例
+playlist_manifest = PlaylistManifestCache(settings.music_manifest_check_interval)
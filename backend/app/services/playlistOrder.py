@@ -0,0 +1,157 @@
+"""
+播放列表曲目排序
+
+playlist_track.position 使用带间隔的排名（默认间隔 RANK_GAP）：
+- 追加到末尾：取当前最大排名加一个间隔
+- 插入或移动到两首曲目之间：取两者排名的中点，只修改一行
+- 移除：直接删除该行，其余曲目的排名不变
+相邻排名之间没有空位时，先把整个列表按当前顺序重排为等间隔，再计算中点。
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, func, select
+
+from app.models.local_music import PlaylistMusic
+
+RANK_GAP = 1024
+
+
+def ordered_entries(session: Session, playlist_id: int) -> List[PlaylistMusic]:
+    """按播放顺序返回播放列表中的全部关联记录"""
+    return session.exec(
+        select(PlaylistMusic)
+        .where(PlaylistMusic.playlist_id == playlist_id)
+        .order_by(PlaylistMusic.position, PlaylistMusic.id)
+    ).all()
+
+
+def append_rank(session: Session, playlist_id: int) -> int:
+    """追加到末尾时使用的排名"""
+    last = session.exec(
+        select(func.max(PlaylistMusic.position)).where(
+            PlaylistMusic.playlist_id == playlist_id
+        )
+    ).first()
+    return (last or 0) + RANK_GAP
+
+
+def rebalance(session: Session, playlist_id: int) -> None:
+    """按当前顺序把排名重写为等间隔（不提交）"""
+    _write_ranks(session, [entry.id for entry in ordered_entries(session, playlist_id)])
+
+
+def _write_ranks(session: Session, entry_ids: List[int]) -> None:
+    if not entry_ids:
+        return
+    table = PlaylistMusic.__table__
+    session.exec(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(position=bindparam("b_position")),
+        params=[
+            {"b_id": entry_id, "b_position": (index + 1) * RANK_GAP}
+            for index, entry_id in enumerate(entry_ids)
+        ],
+    )
+    session.expire_all()
+
+
+def _rank_after(
+    session: Session,
+    playlist_id: int,
+    after_track_id: Optional[int],
+    exclude_track_id: Optional[int] = None,
+) -> Optional[int]:
+    """放在 after_track_id 之后（None 表示最前面）的排名；没有空位时返回 None"""
+    query = select(PlaylistMusic.position, PlaylistMusic.id).where(
+        PlaylistMusic.playlist_id == playlist_id
+    )
+    if exclude_track_id is not None:
+        query = query.where(PlaylistMusic.track_id != exclude_track_id)
+
+    if after_track_id is None:
+        lower = 0
+        upper_row = session.exec(
+            query.order_by(PlaylistMusic.position, PlaylistMusic.id).limit(1)
+        ).first()
+    else:
+        anchor = session.exec(
+            select(PlaylistMusic).where(
+                PlaylistMusic.playlist_id == playlist_id,
+                PlaylistMusic.track_id == after_track_id,
+            )
+        ).first()
+        if not anchor or after_track_id == exclude_track_id:
+            raise HTTPException(status_code=400, detail="参照的音乐不在播放列表中")
+        lower = anchor.position
+        upper_row = session.exec(
+            query.where(
+                (PlaylistMusic.position > anchor.position)
+                | (
+                    (PlaylistMusic.position == anchor.position)
+                    & (PlaylistMusic.id > anchor.id)
+                )
+            )
+            .order_by(PlaylistMusic.position, PlaylistMusic.id)
+            .limit(1)
+        ).first()
+
+    if upper_row is None:
+        return lower + RANK_GAP
+    upper = upper_row[0]
+    if upper - lower < 2:
+        return None
+    return lower + (upper - lower) // 2
+
+
+def rank_after(
+    session: Session,
+    playlist_id: int,
+    after_track_id: Optional[int],
+    exclude_track_id: Optional[int] = None,
+) -> int:
+    """计算放在 after_track_id 之后的排名，必要时先重排整个列表（不提交）"""
+    rank = _rank_after(session, playlist_id, after_track_id, exclude_track_id)
+    if rank is None:
+        rebalance(session, playlist_id)
+        rank = _rank_after(session, playlist_id, after_track_id, exclude_track_id)
+    return rank
+
+
+def move_track(
+    session: Session,
+    playlist_id: int,
+    track_id: int,
+    after_track_id: Optional[int],
+) -> PlaylistMusic:
+    """把曲目移动到 after_track_id 之后（None 表示最前面），不提交"""
+    entry = session.exec(
+        select(PlaylistMusic).where(
+            PlaylistMusic.playlist_id == playlist_id,
+            PlaylistMusic.track_id == track_id,
+        )
+    ).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="音乐不在播放列表中")
+
+    entry.position = rank_after(
+        session, playlist_id, after_track_id, exclude_track_id=track_id
+    )
+    session.add(entry)
+    return entry
+
+
+def reorder(session: Session, playlist_id: int, track_ids: List[int]) -> None:
+    """按给定的曲目顺序重写整个播放列表的排名（不提交）
+
+    track_ids 必须恰好包含播放列表中的全部曲目，各出现一次。
+    """
+    entries = ordered_entries(session, playlist_id)
+    entry_ids = {entry.track_id: entry.id for entry in entries}
+    if len(track_ids) != len(set(track_ids)) or set(track_ids) != set(entry_ids):
+        raise HTTPException(
+            status_code=400, detail="排序必须包含播放列表中的全部音乐且不能重复"
+        )
+    _write_ranks(session, [entry_ids[track_id] for track_id in track_ids])
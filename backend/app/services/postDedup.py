@@ -0,0 +1,325 @@
+"""
+文章点赞和浏览的去重
+
+点赞：每篇文章在内存中维护一个布隆过滤器，记录点赞过的 IP。
+- 过滤器判定"没有点赞"一定准确，此时不查询 post_like_tracking
+- 判定"可能点赞过"时再以数据表为准（取消点赞只删除数据表中的记录，
+  过滤器中的残留只会多一次查询；残留过多时丢弃该过滤器重新加载）
+- 启动时从数据表整体加载，之后按自增 id 增量同步其他进程新增的记录
+- 所有过滤器的总大小受 like_filter_max_bytes 约束，超出时淘汰最久未使用的文章，
+  下次访问时再从数据表加载
+- 查询数据表时不持有锁，只在放入结果时加锁，其他请求不必等待数据库往返
+
+浏览：同一 IP 在窗口期内重复浏览同一篇文章只计一次，
+记录数超过上限时淘汰最早的记录。
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.postLikeTracking import PostLikeTracking
+
+logger = logging.getLogger(__name__)
+
+# 每个过滤器至少容纳的点赞数；装满后按两倍容量重新加载
+MIN_CAPACITY = 64
+# 增量同步时回看的 id 数，覆盖 id 较小但提交较晚的记录
+RESCAN_IDS = 100
+# 每个过滤器除位数组外的估算开销（字节）
+FILTER_OVERHEAD = 128
+
+
+class BloomFilter:
+    """定长布隆过滤器（双重哈希）"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = max(8, bits + (-bits % 8))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class _PostFilter:
+    __slots__ = ("bloom", "capacity", "count", "removed")
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.capacity = capacity
+        self.count = 0
+        self.removed = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.bloom.nbytes + FILTER_OVERHEAD
+
+
+class LikeFilter:
+    """按文章划分的点赞 IP 布隆过滤器"""
+
+    def __init__(self, error_rate: float, max_bytes: int, sync_interval: float):
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._filters: "OrderedDict[int, _PostFilter]" = OrderedDict()
+        self._bytes = 0
+        self._last_id: Optional[int] = None
+        self._synced_at = 0.0
+        # 正在从数据表加载的文章 -> 各加载过程期间新增的点赞 IP
+        self._loading: Dict[int, List[List[str]]] = {}
+
+    def _build(self, user_ips: List[str]) -> _PostFilter:
+        post_filter = _PostFilter(
+            max(MIN_CAPACITY, 2 * len(user_ips)), self.error_rate
+        )
+        for user_ip in user_ips:
+            post_filter.bloom.add(user_ip)
+        post_filter.count = len(user_ips)
+        return post_filter
+
+    def _store(self, post_id: int, post_filter: _PostFilter) -> None:
+        self._drop(post_id)
+        self._filters[post_id] = post_filter
+        self._bytes += post_filter.nbytes
+        while self._bytes > self.max_bytes and len(self._filters) > 1:
+            _, evicted = self._filters.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _drop(self, post_id: int) -> None:
+        post_filter = self._filters.pop(post_id, None)
+        if post_filter is not None:
+            self._bytes -= post_filter.nbytes
+
+    def warm(self) -> int:
+        """从数据表加载所有文章的过滤器（在应用启动时调用），返回加载的文章数"""
+        with Session(engine) as session:
+            last_id = session.exec(select(func.max(PostLikeTracking.id))).first()
+            rows = session.exec(
+                select(PostLikeTracking.post_id, PostLikeTracking.user_ip)
+                .order_by(PostLikeTracking.post_id)
+            ).all()
+
+        grouped: "OrderedDict[int, List[str]]" = OrderedDict()
+        for post_id, user_ip in rows:
+            grouped.setdefault(post_id, []).append(user_ip)
+
+        with self._lock:
+            self._filters.clear()
+            self._bytes = 0
+            for post_id, user_ips in grouped.items():
+                post_filter = self._build(user_ips)
+                if self._bytes + post_filter.nbytes > self.max_bytes:
+                    break
+                self._store(post_id, post_filter)
+            self._last_id = last_id or 0
+            self._synced_at = time.monotonic()
+            loaded = len(self._filters)
+        logger.info(
+            f"Like filter warmed: {loaded}/{len(grouped)} posts, {self._bytes} bytes"
+        )
+        return loaded
+
+    def _sync(self, session: Session) -> None:
+        """把其他进程新增的点赞记录加入已加载的过滤器（查询时不持有锁）"""
+        with self._lock:
+            now = time.monotonic()
+            if self._last_id is not None and now - self._synced_at < self.sync_interval:
+                return
+            # 认领本次同步，其他线程在间隔内不再重复查询
+            self._synced_at = now
+            last_id = self._last_id
+
+        if last_id is None:
+            # 未预热：之后按需加载的过滤器已包含此前的全部记录
+            max_id = session.exec(select(func.max(PostLikeTracking.id))).first()
+            with self._lock:
+                if self._last_id is None:
+                    self._last_id = max_id or 0
+            return
+
+        rows = session.exec(
+            select(
+                PostLikeTracking.id,
+                PostLikeTracking.post_id,
+                PostLikeTracking.user_ip,
+            ).where(PostLikeTracking.id > last_id - RESCAN_IDS)
+        ).all()
+        with self._lock:
+            for row_id, post_id, user_ip in rows:
+                self._add_locked(post_id, user_ip)
+                self._last_id = max(self._last_id, row_id)
+
+    def _fresh(self, post_id: int) -> Optional[_PostFilter]:
+        """已加载且未装满的过滤器（需持有锁）"""
+        post_filter = self._filters.get(post_id)
+        if post_filter is None or post_filter.count > post_filter.capacity:
+            return None
+        self._filters.move_to_end(post_id)
+        return post_filter
+
+    def _load(self, session: Session, post_ids: List[int]) -> Dict[int, _PostFilter]:
+        """从数据表加载这些文章的过滤器（查询时不持有锁）
+
+        查询期间本进程新增或同步到的点赞先记在 pending 中，放入过滤器前补上。
+        """
+        pending = {post_id: [] for post_id in post_ids}
+        with self._lock:
+            for post_id, late in pending.items():
+                self._loading.setdefault(post_id, []).append(late)
+        try:
+            grouped = {post_id: [] for post_id in post_ids}
+            for post_id, user_ip in session.exec(
+                select(PostLikeTracking.post_id, PostLikeTracking.user_ip)
+                .where(PostLikeTracking.post_id.in_(post_ids))
+            ).all():
+                grouped[post_id].append(user_ip)
+            filters = {
+                post_id: self._build(user_ips) for post_id, user_ips in grouped.items()
+            }
+        finally:
+            with self._lock:
+                for post_id, late in pending.items():
+                    # 按对象身份移除：并发加载的列表内容可能相等
+                    loading = [l for l in self._loading[post_id] if l is not late]
+                    if loading:
+                        self._loading[post_id] = loading
+                    else:
+                        del self._loading[post_id]
+
+        with self._lock:
+            for post_id, post_filter in filters.items():
+                for user_ip in pending[post_id]:
+                    if user_ip not in post_filter.bloom:
+                        post_filter.bloom.add(user_ip)
+                        post_filter.count += 1
+                self._store(post_id, post_filter)
+        return filters
+
+    def might_contain(self, session: Session, post_id: int, user_ip: str) -> bool:
+        """返回 False 时该 IP 一定没有点赞过；True 时需以数据表为准"""
+        self._sync(session)
+        with self._lock:
+            post_filter = self._fresh(post_id)
+            if post_filter is not None:
+                return user_ip in post_filter.bloom
+        return user_ip in self._load(session, [post_id])[post_id].bloom
+
+    def candidates(
+        self, session: Session, post_ids: Iterable[int], user_ip: str
+    ) -> List[int]:
+        """筛选出该 IP 可能点赞过的文章（未加载的过滤器用一次查询加载）"""
+        post_ids = list(post_ids)
+        self._sync(session)
+        filters: Dict[int, _PostFilter] = {}
+        with self._lock:
+            for post_id in post_ids:
+                post_filter = self._fresh(post_id)
+                if post_filter is not None:
+                    filters[post_id] = post_filter
+        missing = [post_id for post_id in dict.fromkeys(post_ids) if post_id not in filters]
+        if missing:
+            filters.update(self._load(session, missing))
+        with self._lock:
+            return [
+                post_id for post_id in post_ids
+                if user_ip in filters[post_id].bloom
+            ]
+
+    def _add_locked(self, post_id: int, user_ip: str) -> None:
+        """把点赞 IP 加入已加载的过滤器和正在进行的加载（需持有锁）"""
+        post_filter = self._filters.get(post_id)
+        if post_filter is not None and user_ip not in post_filter.bloom:
+            post_filter.bloom.add(user_ip)
+            post_filter.count += 1
+        for late in self._loading.get(post_id, ()):
+            late.append(user_ip)
+
+    def add(self, post_id: int, user_ip: str) -> None:
+        """点赞记录写入数据表后调用（过滤器未加载时不处理）"""
+        with self._lock:
+            self._add_locked(post_id, user_ip)
+
+    def mark_removed(self, post_id: int) -> None:
+        """取消点赞后调用：残留过多时丢弃过滤器，下次访问时重新加载"""
+        with self._lock:
+            post_filter = self._filters.get(post_id)
+            if post_filter is None:
+                return
+            post_filter.removed += 1
+            if post_filter.removed > max(MIN_CAPACITY // 4, post_filter.count // 4):
+                self._drop(post_id)
+
+    def stats(self) -> Tuple[int, int]:
+        """(已加载的文章数, 占用字节数)"""
+        with self._lock:
+            return len(self._filters), self._bytes
+
+
+class ViewDedupWindow:
+    """同一 IP 在窗口期内重复浏览同一篇文章只计一次"""
+
+    def __init__(self, window_seconds: float, max_entries: int):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 按最后计数时间排序：最早的在前
+        self._seen: "OrderedDict[Tuple[int, str], float]" = OrderedDict()
+
+    def allow(self, post_id: int, user_ip: str) -> bool:
+        """本次浏览是否计数"""
+        now = time.monotonic()
+        key = (post_id, user_ip)
+        with self._lock:
+            while self._seen:
+                oldest_key, seen_at = next(iter(self._seen.items()))
+                if now - seen_at < self.window_seconds:
+                    break
+                del self._seen[oldest_key]
+
+            if key in self._seen:
+                return False
+            self._seen[key] = now
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+            return True
+
+
+# 全局去重实例
+like_filter = LikeFilter(
+    settings.like_filter_false_positive_rate,
+    settings.like_filter_max_bytes,
+    settings.like_filter_sync_interval,
+)
+view_dedup = ViewDedupWindow(
+    settings.view_dedup_window_minutes * 60,
+    settings.view_dedup_max_entries,
+)
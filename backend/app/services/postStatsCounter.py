@@ -0,0 +1,224 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import bindparam, case, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.post import Post
+from app.models.postStats import PostStats
+from app.services.periodicTask import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# 允许写缓冲的计数字段
+COUNTER_FIELDS = ("view_count", "like_count", "share_count", "comment_count")
+
+
+class PostStatsCounterBuffer:
+    """文章统计计数的写缓冲（write-behind）
+
+    请求只在内存中按 (post_id, field) 累加增量，由后台任务定期把所有增量
+    以一条批量的原子语句 ``SET view_count = view_count + :n`` 写回数据库，
+    避免热点行上的读-改-写竞争和每次请求的提交开销。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas: Dict[Tuple[int, str], int] = defaultdict(int)
+
+    def add(self, post_id: int, field: str, amount: int = 1) -> None:
+        """记录一次计数增量（amount 可以为负数）"""
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"不支持的统计字段: {field}")
+        if not amount:
+            return
+        with self._lock:
+            self._deltas[(post_id, field)] += amount
+
+    def pending(self, post_id: int) -> Dict[str, int]:
+        """获取某篇文章尚未写回数据库的增量"""
+        with self._lock:
+            return {
+                field: self._deltas.get((post_id, field), 0)
+                for field in COUNTER_FIELDS
+            }
+
+    def apply_pending(self, post_id: int, data: Dict) -> Dict:
+        """把尚未写回的增量合并到统计数据字典中（原地修改并返回）"""
+        for field, delta in self.pending(post_id).items():
+            if delta:
+                data[field] = max(0, (data.get(field) or 0) + delta)
+        return data
+
+    def discard(self, post_id: int, fields=COUNTER_FIELDS) -> None:
+        """丢弃某篇文章指定字段的增量（统计被直接覆盖或删除时调用）"""
+        with self._lock:
+            for field in fields:
+                self._deltas.pop((post_id, field), None)
+
+    def _drain(self) -> Dict[int, Dict[str, int]]:
+        """取出并清空当前所有增量，按文章分组"""
+        with self._lock:
+            deltas = self._deltas
+            self._deltas = defaultdict(int)
+
+        grouped: Dict[int, Dict[str, int]] = {}
+        for (post_id, field), amount in deltas.items():
+            if amount:
+                grouped.setdefault(
+                    post_id, dict.fromkeys(COUNTER_FIELDS, 0)
+                )[field] = amount
+        return grouped
+
+    def _restore(self, grouped: Dict[int, Dict[str, int]]) -> None:
+        """写回失败时把增量放回缓冲，留待下次刷新"""
+        with self._lock:
+            for post_id, fields in grouped.items():
+                for field, amount in fields.items():
+                    if amount:
+                        self._deltas[(post_id, field)] += amount
+
+    def flush(self) -> int:
+        """把缓冲的增量批量写回数据库，返回写入的文章数"""
+        grouped = self._drain()
+        if not grouped:
+            return 0
+
+        table = PostStats.__table__
+        now = datetime.utcnow()
+
+        try:
+            with Session(engine) as session:
+                post_ids = list(grouped.keys())
+                existing_ids = set(session.exec(
+                    select(PostStats.post_id).where(
+                        PostStats.post_id.in_(post_ids)
+                    )
+                ).all())
+
+                # 已有统计行：一条带参数的批量原子自增语句，结果不小于0
+                update_rows = [
+                    {"b_post_id": post_id, "b_updated_at": now,
+                     **{f"b_{field}": fields[field]
+                        for field in COUNTER_FIELDS}}
+                    for post_id, fields in grouped.items()
+                    if post_id in existing_ids
+                ]
+                if update_rows:
+                    values = {"updated_at": bindparam("b_updated_at")}
+                    for field in COUNTER_FIELDS:
+                        column = table.c[field]
+                        new_value = column + bindparam(f"b_{field}")
+                        values[field] = case(
+                            (new_value < 0, 0), else_=new_value
+                        )
+                    session.exec(
+                        update(table)
+                        .where(table.c.post_id == bindparam("b_post_id"))
+                        .values(**values),
+                        params=update_rows,
+                    )
+
+                # 没有统计行的文章：批量插入（忽略已不存在的文章）
+                missing_ids = [
+                    post_id for post_id in post_ids
+                    if post_id not in existing_ids
+                ]
+                if missing_ids:
+                    valid_ids = set(session.exec(
+                        select(Post.id).where(Post.id.in_(missing_ids))
+                    ).all())
+                    insert_rows = [
+                        {"post_id": post_id, "created_at": now,
+                         "updated_at": now,
+                         **{field: max(0, grouped[post_id][field])
+                            for field in COUNTER_FIELDS}}
+                        for post_id in missing_ids
+                        if post_id in valid_ids
+                    ]
+                    if insert_rows:
+                        session.exec(insert(table), params=insert_rows)
+                    dropped = len(missing_ids) - len(insert_rows)
+                    if dropped:
+                        logger.warning(
+                            f"丢弃 {dropped} 篇不存在文章的统计增量"
+                        )
+
+                session.commit()
+        except Exception as e:
+            logger.error(f"写回文章统计增量失败: {e}")
+            self._restore(grouped)
+            return 0
+
+        return len(grouped)
+
+
+def _clamped_increments(table, deltas: Dict[str, int]) -> Dict:
+    """生成 ``SET field = field + n`` 的赋值（结果不小于0）"""
+    values = {}
+    for field, amount in deltas.items():
+        column = table.c[field]
+        new_value = column + amount
+        values[field] = case((new_value < 0, 0), else_=new_value)
+    return values
+
+
+def apply_stats_delta(session: Session, post_id: int, **deltas: int) -> None:
+    """在调用方的事务中直接修改某篇文章的统计计数（不经过写缓冲，不提交）
+
+    用一条原子的 UPDATE 完成；统计行不存在时（早于统计表创建的文章）
+    插入一行，并发插入冲突时回退为 UPDATE。
+    """
+    for field in deltas:
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"不支持的统计字段: {field}")
+    table = PostStats.__table__
+    now = datetime.utcnow()
+    statement = (
+        update(table)
+        .where(table.c.post_id == post_id)
+        .values(updated_at=now, **_clamped_increments(table, deltas))
+    )
+    if session.exec(statement).rowcount:
+        return
+    try:
+        with session.begin_nested():
+            session.exec(
+                insert(table).values(
+                    post_id=post_id,
+                    created_at=now,
+                    updated_at=now,
+                    **{field: max(0, deltas.get(field, 0))
+                       for field in COUNTER_FIELDS},
+                )
+            )
+    except IntegrityError:
+        session.exec(statement)
+
+
+# 全局计数缓冲实例
+counter_buffer = PostStatsCounterBuffer()
+
+_flusher = PeriodicTask(
+    "Post stats flusher",
+    counter_buffer.flush,
+    settings.post_stats_flush_interval,
+    on_stop=counter_buffer.flush,
+)
+
+
+def start_post_stats_flusher() -> None:
+    """启动计数缓冲的定时刷新任务（在应用启动时调用）"""
+    _flusher.start()
+
+
+async def stop_post_stats_flusher() -> None:
+    """停止定时刷新并写回剩余增量（在应用关闭时调用）"""
+    flushed = await _flusher.stop()
+    logger.info(f"Post stats flusher stopped, flushed {flushed} posts")
@@ -0,0 +1,165 @@
+import asyncio
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.uploadSession import UploadSession, UploadSessionStatus
+
+logger = logging.getLogger(__name__)
+
+# 未完成上传的数据文件目录
+PART_DIR = "uploads/.resumable"
+
+
+def part_path(upload_id: str) -> str:
+    """上传会话对应的数据文件路径"""
+    return os.path.join(PART_DIR, f"{upload_id}.part")
+
+
+def new_expiry() -> datetime:
+    """从当前时间起算的会话过期时间"""
+    return datetime.utcnow() + timedelta(hours=settings.resumable_expire_hours)
+
+
+def create_part_file(upload_id: str) -> None:
+    os.makedirs(PART_DIR, exist_ok=True)
+    open(part_path(upload_id), "wb").close()
+
+
+def remove_part_file(upload_id: str) -> None:
+    """删除数据文件和进程异常退出时遗留的分块临时文件"""
+    for path in [part_path(upload_id)] + glob.glob(
+        os.path.join(PART_DIR, f"{upload_id}.*.chunk")
+    ):
+        _remove(path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def receive_chunk(
+    upload: UploadSession,
+    offset: int,
+    body: AsyncIterator[bytes],
+    expected_sha256: str,
+) -> Tuple[str, int]:
+    """把请求体接收到本次请求独立的临时文件，返回 (临时文件路径, 字节数)
+
+    边接收边写盘并计算 SHA-256；分块超过上限、超出文件总大小或校验和
+    不一致时删除临时文件并返回 400，客户端可从原偏移重传。
+    数据文件本身只在 commit_chunk 持有会话行锁时写入，
+    同一上传的并发或重试请求不会互相覆盖、截断。
+    """
+    chunk_path = os.path.join(PART_DIR, f"{upload.id}.{uuid.uuid4().hex}.chunk")
+    limit = min(settings.resumable_chunk_size, upload.total_size - offset)
+    hasher = hashlib.sha256()
+    written = 0
+
+    out = await asyncio.to_thread(open, chunk_path, "wb")
+    try:
+        async for data in body:
+            if not data:
+                continue
+            written += len(data)
+            if written > limit:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"分块过大，本次最多允许 {limit} 字节"
+                )
+            hasher.update(data)
+            await asyncio.to_thread(out.write, data)
+        await asyncio.to_thread(out.close)
+
+        if written == 0:
+            raise HTTPException(status_code=400, detail="分块内容为空")
+        if hasher.hexdigest() != expected_sha256.lower():
+            raise HTTPException(status_code=400, detail="分块校验和不一致")
+    except BaseException:
+        await asyncio.to_thread(out.close)
+        await asyncio.to_thread(_remove, chunk_path)
+        raise
+
+    return chunk_path, written
+
+
+def _append_at(path: str, chunk_path: str, offset: int, size: int) -> None:
+    """把分块写到数据文件的 offset 处，并截掉之后的残留数据"""
+    with open(path, "r+b") as out, open(chunk_path, "rb") as chunk:
+        out.seek(offset)
+        shutil.copyfileobj(chunk, out, 1024 * 1024)
+        out.truncate(offset + size)
+
+
+def commit_chunk(
+    session: Session, upload_id: str, offset: int, chunk_path: str, size: int
+) -> bool:
+    """在会话行锁内把分块写入数据文件并推进进度；偏移已变化时返回 False
+
+    先执行带 received_size == offset 条件的 UPDATE：同一会话的其他请求会等待这行的锁，
+    拿到锁后因偏移已变化而失败。写盘失败时回滚，进度不变。
+    """
+    table = UploadSession.__table__
+    try:
+        result = session.exec(
+            update(table)
+            .where(
+                table.c.id == upload_id,
+                table.c.status == UploadSessionStatus.UPLOADING.value,
+                table.c.received_size == offset,
+            )
+            .values(
+                received_size=offset + size,
+                expires_at=new_expiry(),
+                updated_at=datetime.utcnow(),
+            )
+        )
+        if result.rowcount != 1:
+            session.rollback()
+            return False
+        _append_at(part_path(upload_id), chunk_path, offset, size)
+        session.commit()
+        return True
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        _remove(chunk_path)
+
+
+def file_sha256(path: str) -> str:
+    """分块计算文件的 SHA-256"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def cleanup_expired_sessions(session: Session) -> int:
+    """删除已过期的上传会话（含已完成的）及其数据文件，返回清理的会话数"""
+    expired = session.exec(
+        select(UploadSession).where(
+            UploadSession.expires_at < datetime.utcnow()
+        )
+    ).all()
+    for upload in expired:
+        remove_part_file(upload.id)
+        session.delete(upload)
+    if expired:
+        session.commit()
+        logger.info(f"清理了 {len(expired)} 个过期的上传会话")
+    return len(expired)
@@ -0,0 +1,205 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.cacheVersion import CacheVersion
+from app.models.system import SystemDefault, SystemDefaultRead
+from app.models.system_setting import SystemSetting, SystemSettingRead
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = "system_settings"
+
+
+def convert_value(value: Optional[str], value_type: Any) -> Any:
+    """按 data_type / key_type 把字符串值转换为对应的 Python 类型"""
+    value_type = getattr(value_type, "value", value_type)
+    if value is None:
+        return None
+    try:
+        if value_type == "number":
+            return float(value) if "." in value else int(value)
+        if value_type == "boolean":
+            return value.lower() in ("true", "1", "yes")
+        if value_type == "json":
+            return json.loads(value)
+    except (ValueError, TypeError):
+        logger.warning(f"设置值类型转换失败: {value!r} ({value_type})")
+    return value
+
+
+def read_cache_version(session: Session, name: str) -> int:
+    """读取某个缓存在 cache_version 表中的版本号（没有记录时为 0）"""
+    record = session.get(CacheVersion, name)
+    return record.version if record else 0
+
+
+def bump_cache_version(name: str) -> bool:
+    """递增某个缓存的全局版本号，通知所有进程重新加载；失败时返回 False"""
+    table = CacheVersion.__table__
+    now = datetime.utcnow()
+    try:
+        with Session(engine) as session:
+            result = session.exec(
+                update(table)
+                .where(table.c.name == name)
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            if result.rowcount == 0:
+                try:
+                    session.exec(
+                        insert(table).values(name=name, version=1, updated_at=now)
+                    )
+                except IntegrityError:
+                    session.rollback()
+                    session.exec(
+                        update(table)
+                        .where(table.c.name == name)
+                        .values(version=table.c.version + 1, updated_at=now)
+                    )
+            session.commit()
+    except Exception as e:
+        logger.error(f"递增缓存版本失败 {name}: {e}")
+        return False
+    return True
+
+
+class _Snapshot:
+    """某一版本的两张配置表的只读快照"""
+
+    def __init__(self, version: int, defaults: List[SystemDefaultRead],
+                 system_settings: List[SystemSettingRead]):
+        self.version = version
+        self.defaults: Dict[Tuple[str, str], SystemDefaultRead] = {
+            (item.category, item.key_name): item for item in defaults
+        }
+        self.settings: Dict[Tuple[str, str], SystemSettingRead] = {
+            (item.category, item.key_name): item for item in system_settings
+        }
+
+
+class SettingsCache:
+    """system_defaults 和 system_setting 的进程内缓存
+
+    两张表整体加载到内存，按 (category, key_name) 查询不访问数据库。
+    修改设置后调用 invalidate() 递增 cache_version 表中的版本号；
+    各进程最多每 check_interval 秒读取一次版本号，发现变化后重新加载。
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+
+    def _read_version(self, session: Session) -> int:
+        return read_cache_version(session, CACHE_NAME)
+
+    def _load(self) -> _Snapshot:
+        with Session(engine) as session:
+            version = self._read_version(session)
+            defaults = session.exec(
+                select(SystemDefault).order_by(
+                    SystemDefault.category,
+                    SystemDefault.sort_order,
+                    SystemDefault.key_name,
+                )
+            ).all()
+            system_settings = session.exec(
+                select(SystemSetting).order_by(
+                    SystemSetting.category,
+                    SystemSetting.sort_order,
+                    SystemSetting.key_name,
+                )
+            ).all()
+            snapshot = _Snapshot(
+                version,
+                [SystemDefaultRead.model_validate(item) for item in defaults],
+                [SystemSettingRead.model_validate(item) for item in system_settings],
+            )
+        logger.debug(
+            f"Settings cache loaded: version={version}, "
+            f"defaults={len(snapshot.defaults)}, settings={len(snapshot.settings)}"
+        )
+        return snapshot
+
+    def _current(self) -> _Snapshot:
+        """获取当前快照，必要时检查版本并重新加载"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+
+            if self._snapshot is not None:
+                with Session(engine) as session:
+                    version = self._read_version(session)
+                if version == self._snapshot.version:
+                    self._checked_at = now
+                    return self._snapshot
+
+            self._snapshot = self._load()
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """设置被修改后调用：递增全局版本号，并让本进程下次查询时重新加载"""
+        bump_cache_version(CACHE_NAME)
+        with self._lock:
+            self._snapshot = None
+
+    # ---------- system_defaults ----------
+
+    def get_default(self, category: str, key_name: str) -> Optional[SystemDefaultRead]:
+        """获取单个系统默认参数"""
+        return self._current().defaults.get((category, key_name))
+
+    def get_default_value(self, category: str, key_name: str, default: Any = None) -> Any:
+        """获取按 data_type 转换后的系统默认参数值"""
+        item = self.get_default(category, key_name)
+        if item is None or item.key_value is None:
+            return default
+        return convert_value(item.key_value, item.data_type)
+
+    def get_defaults_by_category(self, category: str, public_only: bool = False) -> List[SystemDefaultRead]:
+        """获取某个分类下的系统默认参数（按 sort_order 排序）"""
+        return [
+            item for (item_category, _), item in self._current().defaults.items()
+            if item_category == category and (not public_only or item.is_public)
+        ]
+
+    # ---------- system_setting ----------
+
+    def get_setting(self, category: str, key_name: str) -> Optional[SystemSettingRead]:
+        """获取单个系统设置"""
+        return self._current().settings.get((category, key_name))
+
+    def get_setting_value(self, category: str, key_name: str, default: Any = None) -> Any:
+        """获取按 key_type 转换后的系统设置值"""
+        item = self.get_setting(category, key_name)
+        if item is None or item.key_value is None:
+            return default
+        return convert_value(item.key_value, item.key_type)
+
+    def get_settings_by_category(self, category: str, public_only: bool = False) -> List[SystemSettingRead]:
+        """获取某个分类下的系统设置（按 sort_order 排序）"""
+        return [
+            item for (item_category, _), item in self._current().settings.items()
+            if item_category == category and (not public_only or item.is_public)
+        ]
+
+
+# 全局设置缓存实例
+settings_cache = SettingsCache(settings.settings_cache_check_interval)
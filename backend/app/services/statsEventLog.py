@@ -0,0 +1,408 @@
+"""
+文章统计事件日志和按小时、按天的汇总
+
+事件日志：
+- 浏览、点赞（取消点赞记为 -1）、分享、评论事件先缓冲在内存中，定期批量追加到本地分段文件，
+  每行一个事件：``时间戳\\t文章ID\\t字段\\t数量``
+- 每个进程写自己的分段（文件名含主机名和进程号），写入中的分段以 .open 结尾，
+  达到大小或时长上限后改名为 .log 封存，封存后的分段不再修改
+
+汇总：
+- 汇总任务把封存的分段聚合到 post_stats_hourly、post_stats_daily，并在同一事务中
+  把分段名写入 stats_event_segment；已记录的分段不会重复计入，任务中断后重跑是幂等的
+- 汇总后的分段移到 processed/ 目录保留 retain_days 天，可用于重建汇总表
+- 同一目录下的多个进程通过文件锁保证同一时间只有一个进程在汇总
+- 进程异常退出留下的 .open 分段在超过两倍时长上限后按封存处理
+"""
+import fcntl
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import bindparam, delete, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, func, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.post import Post
+from app.models.postStatsRollup import PostStatsDaily, PostStatsHourly, StatsEventSegment
+from app.services.periodicTask import PeriodicTask
+from app.services.postStatsCounter import COUNTER_FIELDS
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".log"
+ARCHIVE_DIR = "processed"
+LOCK_FILE = ".rollup.lock"
+
+Buckets = Dict[Tuple[int, object], Dict[str, int]]
+
+
+class StatsEventLog:
+    """本进程的统计事件写入器"""
+
+    def __init__(self, directory: str, segment_max_bytes: int, segment_max_age: float):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: List[str] = []
+        self._file = None
+        self._path: Optional[str] = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._sequence = 0
+        self._tag = f"{socket.gethostname()}-{os.getpid()}"
+
+    def append(self, post_id: int, field: str, count: int = 1) -> None:
+        """记录一个事件（只写入内存缓冲）"""
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"不支持的统计字段: {field}")
+        if not count:
+            return
+        line = f"{int(time.time())}\t{post_id}\t{field}\t{count}\n"
+        with self._lock:
+            self._pending.append(line)
+
+    def flush(self) -> int:
+        """把缓冲的事件追加到当前分段，必要时封存分段；返回写入的事件数"""
+        with self._lock:
+            lines = self._pending
+            self._pending = []
+
+        with self._write_lock:
+            if lines:
+                try:
+                    if self._file is None:
+                        self._open_segment()
+                    data = "".join(lines)
+                    self._file.write(data)
+                    self._file.flush()
+                    self._size += len(data.encode("utf-8"))
+                except OSError as e:
+                    logger.error(f"写入统计事件日志失败: {e}")
+                    with self._lock:
+                        self._pending[:0] = lines
+                    return 0
+
+            if self._file is not None and (
+                self._size >= self.segment_max_bytes
+                or time.monotonic() - self._opened_at >= self.segment_max_age
+            ):
+                self._seal()
+        return len(lines)
+
+    def close(self) -> None:
+        """写入剩余事件并封存当前分段（在应用关闭时调用）"""
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._seal()
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        name = (
+            f"events-{datetime.utcnow():%Y%m%d%H%M%S}-{self._tag}"
+            f"-{self._sequence:04d}{OPEN_SUFFIX}"
+        )
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, "a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self._size = 0
+
+    def _seal(self) -> None:
+        try:
+            self._file.close()
+            os.replace(self._path, self._path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        except OSError as e:
+            logger.error(f"封存统计事件日志分段失败 {self._path}: {e}")
+        self._file = None
+        self._path = None
+
+
+# ---------- 汇总 ----------
+
+def parse_segment(path: str) -> Tuple[Buckets, Buckets, int]:
+    """读取分段，返回 (按小时汇总, 按天汇总, 事件数)；格式错误的行跳过"""
+    hourly: Buckets = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    daily: Buckets = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    events = 0
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                timestamp, post_id, field, count = line.rstrip("\n").split("\t")
+                moment = datetime.utcfromtimestamp(int(timestamp))
+                post_id, count = int(post_id), int(count)
+                if field not in COUNTER_FIELDS:
+                    raise ValueError(field)
+            except ValueError:
+                skipped += 1
+                continue
+            hourly[(post_id, moment.replace(minute=0, second=0, microsecond=0))][field] += count
+            daily[(post_id, moment.date())][field] += count
+            events += 1
+    if skipped:
+        logger.warning(f"统计事件日志 {os.path.basename(path)} 跳过 {skipped} 行格式错误的记录")
+    return hourly, daily, events
+
+
+def _apply_buckets(
+    session: Session, model: Type[SQLModel], key_field: str, buckets: Buckets
+) -> None:
+    """把增量累加到汇总表：已有的行用一条批量 UPDATE，没有的行批量插入"""
+    if not buckets:
+        return
+    table = model.__table__
+    key_column = table.c[key_field]
+    existing = set(session.exec(
+        select(table.c.post_id, key_column).where(
+            tuple_(table.c.post_id, key_column).in_(list(buckets))
+        )
+    ).all())
+
+    update_rows = []
+    insert_rows = []
+    for (post_id, key), counts in buckets.items():
+        if (post_id, key) in existing:
+            update_rows.append({
+                "b_post_id": post_id,
+                "b_key": key,
+                **{f"b_{field}": counts[field] for field in COUNTER_FIELDS},
+            })
+        else:
+            insert_rows.append({"post_id": post_id, key_field: key, **counts})
+
+    if update_rows:
+        session.exec(
+            update(table)
+            .where(
+                table.c.post_id == bindparam("b_post_id"),
+                key_column == bindparam("b_key"),
+            )
+            .values(**{
+                field: table.c[field] + bindparam(f"b_{field}")
+                for field in COUNTER_FIELDS
+            }),
+            params=update_rows,
+        )
+    if insert_rows:
+        session.exec(insert(table), params=insert_rows)
+
+
+def rollup_segment(path: str) -> Optional[int]:
+    """汇总一个封存的分段，返回计入的事件数；该分段已汇总过时返回 None"""
+    name = os.path.basename(path)
+    with Session(engine) as session:
+        if session.get(StatsEventSegment, name) is not None:
+            return None
+
+        hourly, daily, events = parse_segment(path)
+        # 忽略已删除文章的事件
+        post_ids = {post_id for post_id, _ in daily}
+        valid_ids = set(session.exec(
+            select(Post.id).where(Post.id.in_(list(post_ids)))
+        ).all()) if post_ids else set()
+        hourly = {key: value for key, value in hourly.items() if key[0] in valid_ids}
+        daily = {key: value for key, value in daily.items() if key[0] in valid_ids}
+
+        _apply_buckets(session, PostStatsHourly, "hour", hourly)
+        _apply_buckets(session, PostStatsDaily, "day", daily)
+        session.add(StatsEventSegment(name=name, event_count=events))
+        try:
+            session.commit()
+        except IntegrityError:
+            # 另一个进程同时汇总了同一分段
+            session.rollback()
+            return None
+    return events
+
+
+def _archive(directory: str, path: str) -> None:
+    archive_dir = os.path.join(directory, ARCHIVE_DIR)
+    os.makedirs(archive_dir, exist_ok=True)
+    os.replace(path, os.path.join(archive_dir, os.path.basename(path)))
+
+
+def _seal_abandoned(directory: str, max_age: float) -> None:
+    """封存异常退出的进程留下的 .open 分段"""
+    now = time.time()
+    for name in os.listdir(directory):
+        if not name.endswith(OPEN_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > 2 * max_age:
+                os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+                logger.warning(f"封存遗留的统计事件日志分段: {name}")
+        except OSError:
+            continue
+
+
+def _prune_archive(directory: str, retain_days: float) -> None:
+    archive_dir = os.path.join(directory, ARCHIVE_DIR)
+    if not os.path.isdir(archive_dir):
+        return
+    cutoff = time.time() - retain_days * 86400
+    for name in os.listdir(archive_dir):
+        path = os.path.join(archive_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+class _DirectoryLock:
+    """同一目录下只允许一个进程汇总（非阻塞的文件锁）"""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self._file = None
+
+    def __enter__(self) -> bool:
+        self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def __exit__(self, *exc) -> None:
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def run_rollup(directory: Optional[str] = None) -> Dict[str, int]:
+    """汇总目录中所有封存的分段并清理过期的归档"""
+    directory = directory or settings.stats_events_directory
+    summary = {"segments": 0, "events": 0, "skipped": 0}
+    os.makedirs(directory, exist_ok=True)
+    with _DirectoryLock(directory) as locked:
+        if not locked:
+            return summary
+        _seal_abandoned(directory, settings.stats_events_segment_max_age)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(SEALED_SUFFIX):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                events = rollup_segment(path)
+            except Exception as e:
+                logger.error(f"汇总统计事件日志分段失败 {name}: {e}")
+                break
+            if events is None:
+                summary["skipped"] += 1
+            else:
+                summary["segments"] += 1
+                summary["events"] += events
+            _archive(directory, path)
+        _prune_archive(directory, settings.stats_events_retain_days)
+    return summary
+
+
+def rebuild_rollups(directory: Optional[str] = None) -> Dict[str, int]:
+    """清空汇总表和检查点，从保留的归档分段重新汇总（早于保留期的数据会丢失）"""
+    directory = directory or settings.stats_events_directory
+    archive_dir = os.path.join(directory, ARCHIVE_DIR)
+    with Session(engine) as session:
+        for model in (PostStatsHourly, PostStatsDaily, StatsEventSegment):
+            session.exec(delete(model.__table__))
+        session.commit()
+    if os.path.isdir(archive_dir):
+        for name in os.listdir(archive_dir):
+            os.replace(os.path.join(archive_dir, name), os.path.join(directory, name))
+    return run_rollup(directory)
+
+
+# 全局事件日志实例
+event_log = StatsEventLog(
+    settings.stats_events_directory,
+    settings.stats_events_segment_max_bytes,
+    settings.stats_events_segment_max_age,
+)
+
+
+def _rollup_and_log() -> None:
+    summary = run_rollup()
+    if summary["segments"]:
+        logger.info(f"Stats rollup: {summary}")
+
+
+_flusher = PeriodicTask(
+    "Stats event log flusher",
+    event_log.flush,
+    settings.stats_events_flush_interval,
+    on_stop=event_log.close,
+)
+_roller = PeriodicTask(
+    "Stats rollup",
+    _rollup_and_log,
+    settings.stats_events_rollup_interval,
+)
+
+
+def start_stats_event_log() -> None:
+    """启动事件日志的定时写入和汇总任务（在应用启动时调用）"""
+    _flusher.start()
+    _roller.start()
+
+
+async def stop_stats_event_log() -> None:
+    """停止定时任务，写入剩余事件并封存当前分段（在应用关闭时调用）"""
+    await _roller.stop()
+    await _flusher.stop()
+
+
+def daily_series(
+    session: Session, start: date, end: date, post_id: Optional[int] = None
+) -> List[dict]:
+    """[start, end] 内每天的统计（没有数据的日期补 0）；不指定文章时为全站合计"""
+    table = PostStatsDaily
+    query = select(
+        table.day, *[func.sum(getattr(table, field)) for field in COUNTER_FIELDS]
+    ).where(table.day >= start, table.day <= end)
+    if post_id is not None:
+        query = query.where(table.post_id == post_id)
+    rows = {
+        row[0]: dict(zip(COUNTER_FIELDS, (int(value or 0) for value in row[1:])))
+        for row in session.exec(query.group_by(table.day)).all()
+    }
+    return [
+        {"day": day, **rows.get(day, dict.fromkeys(COUNTER_FIELDS, 0))}
+        for day in (
+            date.fromordinal(ordinal)
+            for ordinal in range(start.toordinal(), end.toordinal() + 1)
+        )
+    ]
+
+
+def hourly_series(
+    session: Session, post_id: int, start: datetime, end: datetime
+) -> List[dict]:
+    """某篇文章 [start, end] 内每小时的统计（没有数据的小时补 0）"""
+    rows = {
+        row.hour: {field: getattr(row, field) for field in COUNTER_FIELDS}
+        for row in session.exec(
+            select(PostStatsHourly).where(
+                PostStatsHourly.post_id == post_id,
+                PostStatsHourly.hour >= start,
+                PostStatsHourly.hour <= end,
+            )
+        ).all()
+    }
+    series = []
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    while hour <= end:
+        series.append({"hour": hour, **rows.get(hour, dict.fromkeys(COUNTER_FIELDS, 0))})
+        hour += timedelta(hours=1)
+    return series
@@ -1,18 +1,51 @@
 import aiohttp
-import ssl
+import asyncio
 import json
 from datetime import datetime, date
 from typing import List, Dict, Optional, Tuple
-from sqlmodel import Session, select
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session, delete, select
 from app.models.tagCloud import (
     TagCloud, TagCloudCreate, TagCloudUpdate, TagCloudFetchHistory,
     TagSize, TagSource, FetchStatus
 )
-from app.models.system import SystemDefault
+from app.core.config import settings
+from app.core.http_client import http_session
+from app.services.settingsCache import settings_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 批量 IN 查询的分批大小
+BULK_CHUNK_SIZE = 500
+
+# 热门标签来源 -> 获取方法名
+TRENDING_SOURCES = {
+    "github": "_fetch_github_tags",
+    "stackoverflow": "_fetch_stackoverflow_tags",
+    "reddit": "_fetch_reddit_tags",
+}
+
+
+def tag_key(name: str) -> str:
+    """标签名的比较键：tag_cloud.name 的唯一键使用不区分大小写的排序规则"""
+    return name.strip().casefold()
+
+
+def merge_tags(tags: List[Dict]) -> List[Dict]:
+    """合并名称只有大小写或首尾空白不同的标签，保留第一次出现的写法和最大的使用次数"""
+    merged: Dict[str, Dict] = {}
+    for tag_data in tags:
+        name = tag_data["name"].strip()
+        if not name:
+            continue
+        key = tag_key(name)
+        if key in merged:
+            merged[key]["count"] = max(merged[key]["count"], tag_data["count"])
+        else:
+            merged[key] = {**tag_data, "name": name}
+    return list(merged.values())
+
 
 class TagCloudService:
     def __init__(self, session: Session):
@@ -37,11 +70,6 @@ class TagCloudService:
             else:
                 prompt = ai_settings["ai_prompt_template"].replace("{keywords}", keywords_text)
 
-            # 创建SSL上下文
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
             # 准备请求数据
             request_data = {
                 "model": ai_settings.get("model", "gpt-3.5-turbo"),
@@ -61,8 +89,8 @@ class TagCloudService:
 
             timeout = aiohttp.ClientTimeout(total=int(ai_settings.get("timeout", 30)))
 
-            async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-                async with session.post(url, json=request_data, headers=headers) as response:
+            async with http_session() as session:
+                async with session.post(url, json=request_data, headers=headers, timeout=timeout) as response:
                     if response.status != 200:
                         error_text = await response.text()
                         logger.error(f"AI API请求失败: {response.status} - {error_text}")
@@ -128,16 +156,11 @@ class TagCloudService:
                 "temperature": float(ai_settings["ai_temperature"])
             }
 
-            # 创建SSL上下文
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
+            timeout = aiohttp.ClientTimeout(total=int(ai_settings.get("timeout") or 60))
 
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-
-            async with aiohttp.ClientSession(connector=connector) as session:
+            async with http_session() as session:
                 url = f"{ai_settings['ai_base_url']}/chat/completions"
-                async with session.post(url, headers=headers, json=data) as response:
+                async with session.post(url, headers=headers, json=data, timeout=timeout) as response:
                     if response.status == 200:
                         result = await response.json()
                         content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
@@ -185,22 +208,15 @@ class TagCloudService:
     async def get_ai_settings(self) -> Dict:
         """获取AI设置"""
         try:
-            from app.models.system_setting import SystemSetting
-            import json
-
-            # 首先从 SystemDefault 获取基础AI设置
-            statement = select(SystemDefault).where(SystemDefault.category == "AISettings")
-            settings = self.session.exec(statement).all()
-
+            # 首先从 SystemDefault 获取基础AI设置（读取设置缓存）
             ai_settings = {}
-            for setting in settings:
+            for setting in settings_cache.get_defaults_by_category("AISettings"):
                 ai_settings[setting.key_name] = setting.key_value
 
             # 然后从 SystemSetting 获取AI配置（优先级更高）
             try:
                 # 获取所有AI相关的系统设置
-                statement = select(SystemSetting).where(SystemSetting.category == "ai")
-                ai_system_settings = self.session.exec(statement).all()
+                ai_system_settings = settings_cache.get_settings_by_category("ai")
 
                 for setting in ai_system_settings:
                     if setting.key_name == "search_keywords" and setting.key_value:
@@ -221,7 +237,8 @@ class TagCloudService:
             if "ai_prompt_template" not in ai_settings:
                 ai_settings["ai_prompt_template"] = '请生成20个与"{keywords}"相关的热门技术标签，以JSON格式返回，格式为：[{"name": "标签名", "category": "分类", "count": 数量}]'
 
-            logger.info(f"获取到的AI设置: {ai_settings}")
+            # 设置中包含 API 密钥，只记录键名
+            logger.debug(f"获取到的AI设置项: {sorted(ai_settings)}")
             return ai_settings
         except Exception as e:
             logger.error(f"获取AI设置失败: {e}")
@@ -269,140 +286,149 @@ class TagCloudService:
         category_hash = hash(category) % len(beautiful_colors)
         return beautiful_colors[category_hash]
 
+    async def _fetch_github_tags(self, client: aiohttp.ClientSession) -> List[Dict]:
+        """GitHub 热门仓库的语言标签（请求失败时抛出异常）"""
+        # GitHub API获取热门仓库的语言标签
+        url = "https://api.github.com/search/repositories"
+        params = {
+            "q": "stars:>1000",
+            "sort": "stars",
+            "order": "desc",
+            "per_page": 100
+        }
+
+        async with client.get(url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        languages = {}
+        for repo in data.get("items", []):
+            lang = repo.get("language")
+            if lang:
+                languages[lang] = languages.get(lang, 0) + 1
+
+        # 转换为标签格式
+        tags = []
+        for lang, count in sorted(languages.items(), key=lambda x: x[1], reverse=True)[:20]:
+            tags.append({
+                "name": lang,
+                "count": count,
+                "category": "programming",
+                "source": "github"
+            })
+        return tags
+
+    async def _fetch_stackoverflow_tags(self, client: aiohttp.ClientSession) -> List[Dict]:
+        """Stack Overflow 热门标签（请求失败时抛出异常）"""
+        # Stack Overflow API获取热门标签
+        url = "https://api.stackexchange.com/2.3/tags"
+        params = {
+            "order": "desc",
+            "sort": "popular",
+            "site": "stackoverflow",
+            "pagesize": 50
+        }
+
+        async with client.get(url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        tags = []
+        for item in data.get("items", []):
+            tags.append({
+                "name": item["name"],
+                "count": item["count"],
+                "category": "programming",
+                "source": "stackoverflow"
+            })
+        return tags
+
+    async def _fetch_reddit_tags(self, client: aiohttp.ClientSession) -> List[Dict]:
+        """Reddit 热门帖子中的技术关键词（请求失败时抛出异常）"""
+        # Reddit API获取热门帖子标签
+        url = "https://www.reddit.com/r/programming/hot.json"
+        params = {"limit": 100}
+
+        async with client.get(url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        tags = {}
+        # 简单的关键词提取
+        keywords = ["python", "javascript", "react", "vue", "node", "css", "html", "java", "c++", "go", "rust", "typescript"]
+        for post in data.get("data", {}).get("children", []):
+            post_data = post.get("data", {})
+            # 从标题中提取标签
+            title = post_data.get("title", "").lower()
+            for keyword in keywords:
+                if keyword in title:
+                    tags[keyword] = tags.get(keyword, 0) + 1
+
+        # 转换为标签格式
+        result = []
+        for tag, count in sorted(tags.items(), key=lambda x: x[1], reverse=True)[:15]:
+            result.append({
+                "name": tag.title(),
+                "count": count,
+                "category": "programming",
+                "source": "reddit"
+            })
+        return result
+
+    async def fetch_trending_tags(self, sources: Optional[List[str]] = None) -> Tuple[List[Dict], Dict[str, str]]:
+        """并发获取多个热门来源的标签
+
+        所有来源共享同一个连接池客户端并发请求，受并发上限约束；
+        每个来源有独立的超时，慢或失败的来源不会拖住其他来源。
+
+        返回 (合并后的标签列表, {来源: 错误信息})。
+        """
+        if sources is None:
+            sources = settings.tag_cloud_trending_sources
+        semaphore = asyncio.Semaphore(settings.tag_cloud_max_concurrency)
+        timeout = settings.tag_cloud_source_timeout
+
+        async def run_source(client: aiohttp.ClientSession, name: str):
+            fetcher = TRENDING_SOURCES.get(name)
+            if fetcher is None:
+                return name, [], "未知的标签来源"
+            async with semaphore:
+                try:
+                    tags = await asyncio.wait_for(getattr(self, fetcher)(client), timeout)
+                    return name, tags, None
+                except asyncio.TimeoutError:
+                    return name, [], f"超时（{timeout}s）"
+                except Exception as e:
+                    return name, [], str(e) or e.__class__.__name__
+
+        async with http_session() as client:
+            results = await asyncio.gather(*(run_source(client, name) for name in sources))
+
+        tags: List[Dict] = []
+        errors: Dict[str, str] = {}
+        for name, source_tags, error in results:
+            if error:
+                logger.error(f"Error fetching from {name}: {error}")
+                errors[name] = error
+            else:
+                logger.info(f"Fetched {len(source_tags)} tags from {name}")
+                tags.extend(source_tags)
+        return tags, errors
+
     async def fetch_trending_tags_from_github(self) -> List[Dict]:
         """从GitHub获取热门标签"""
-        try:
-            import ssl
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                # GitHub API获取热门仓库的语言标签
-                url = "https://api.github.com/search/repositories"
-                params = {
-                    "q": "stars:>1000",
-                    "sort": "stars",
-                    "order": "desc",
-                    "per_page": 100
-                }
-
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        languages = {}
-
-                        for repo in data.get("items", []):
-                            lang = repo.get("language")
-                            if lang:
-                                languages[lang] = languages.get(lang, 0) + 1
-
-                        # 转换为标签格式
-                        tags = []
-                        for lang, count in sorted(languages.items(), key=lambda x: x[1], reverse=True)[:20]:
-                            tags.append({
-                                "name": lang,
-                                "count": count,
-                                "category": "programming",
-                                "source": "github"
-                            })
-
-                        return tags
-                    else:
-                        logger.error(f"GitHub API error: {response.status}")
-                        return []
-        except Exception as e:
-            logger.error(f"Error fetching from GitHub: {e}")
-            return []
+        tags, _ = await self.fetch_trending_tags(["github"])
+        return tags
 
     async def fetch_trending_tags_from_stackoverflow(self) -> List[Dict]:
         """从Stack Overflow获取热门标签"""
-        try:
-            import ssl
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                # Stack Overflow API获取热门标签
-                url = "https://api.stackexchange.com/2.3/tags"
-                params = {
-                    "order": "desc",
-                    "sort": "popular",
-                    "site": "stackoverflow",
-                    "pagesize": 50
-                }
-
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        tags = []
-
-                        for item in data.get("items", []):
-                            tags.append({
-                                "name": item["name"],
-                                "count": item["count"],
-                                "category": "programming",
-                                "source": "stackoverflow"
-                            })
-
-                        return tags
-                    else:
-                        logger.error(f"Stack Overflow API error: {response.status}")
-                        return []
-        except Exception as e:
-            logger.error(f"Error fetching from Stack Overflow: {e}")
-            return []
+        tags, _ = await self.fetch_trending_tags(["stackoverflow"])
+        return tags
 
     async def fetch_trending_tags_from_reddit(self) -> List[Dict]:
         """从Reddit获取热门标签"""
-        try:
-            import ssl
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                # Reddit API获取热门帖子标签
-                url = "https://www.reddit.com/r/programming/hot.json"
-                params = {"limit": 100}
-
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        tags = {}
-
-                        for post in data.get("data", {}).get("children", []):
-                            post_data = post.get("data", {})
-                            # 从标题中提取标签
-                            title = post_data.get("title", "").lower()
-
-                            # 简单的关键词提取
-                            keywords = ["python", "javascript", "react", "vue", "node", "css", "html", "java", "c++", "go", "rust", "typescript"]
-                            for keyword in keywords:
-                                if keyword in title:
-                                    tags[keyword] = tags.get(keyword, 0) + 1
-
-                        # 转换为标签格式
-                        result = []
-                        for tag, count in sorted(tags.items(), key=lambda x: x[1], reverse=True)[:15]:
-                            result.append({
-                                "name": tag.title(),
-                                "count": count,
-                                "category": "programming",
-                                "source": "reddit"
-                            })
-
-                        return result
-                    else:
-                        logger.error(f"Reddit API error: {response.status}")
-                        return []
-        except Exception as e:
-            logger.error(f"Error fetching from Reddit: {e}")
-            return []
+        tags, _ = await self.fetch_trending_tags(["reddit"])
+        return tags
 
     def determine_tag_size(self, count: int) -> TagSize:
         """根据使用次数确定标签大小"""
@@ -446,52 +472,108 @@ class TagCloudService:
         category_hash = hash(category) % len(beautiful_colors)
         return beautiful_colors[category_hash]
 
+    def bulk_update_tags(self, rows: List[Dict]) -> int:
+        """按主键批量更新标签（不提交事务）
+
+        rows 中每项包含 id 以及要更新的字段，字段相同的行合并为
+        一条批量执行的 UPDATE 语句。返回更新的行数。
+        """
+        table = TagCloud.__table__
+        groups: Dict[Tuple[str, ...], List[Dict]] = {}
+        for row in rows:
+            fields = tuple(sorted(key for key in row if key != "id"))
+            if fields:
+                groups.setdefault(fields, []).append(row)
+
+        for fields, group in groups.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values({field: bindparam(f"b_{field}") for field in fields})
+            )
+            self.session.exec(statement, params=[
+                {f"b_{key}": value for key, value in row.items()}
+                for row in group
+            ])
+
+        return sum(len(group) for group in groups.values())
+
     async def update_tag_cloud(self, tags: List[Dict], source: str, clear_existing: bool = False) -> Tuple[int, int]:
-        """更新标签云数据"""
-        new_tags = 0
-        updated_tags = 0
+        """更新标签云数据
+
+        以集合方式写入：一次 IN 查询找出已存在的标签，新标签批量插入，
+        已存在的标签批量更新，清空自动标签只执行一条 DELETE，
+        全部在同一个事务中提交。
+        """
+        now = datetime.utcnow()
 
-        # 如果需要清空现有标签
+        # 如果需要清空现有标签：删除所有自动获取的标签
         if clear_existing:
-            # 删除所有自动获取的标签
-            statement = select(TagCloud).where(TagCloud.source == TagSource.AUTO)
-            existing_auto_tags = self.session.exec(statement).all()
-            for tag in existing_auto_tags:
-                self.session.delete(tag)
-            self.session.commit()
-            logger.info(f"Cleared {len(existing_auto_tags)} existing auto-generated tags")
+            result = self.session.exec(
+                delete(TagCloud).where(TagCloud.source == TagSource.AUTO)
+            )
+            logger.info(f"Cleared {result.rowcount} existing auto-generated tags")
 
-        for tag_data in tags:
-            # 检查标签是否已存在
-            statement = select(TagCloud).where(TagCloud.name == tag_data["name"])
-            existing_tag = self.session.exec(statement).first()
+        # 合并同名标签（不区分大小写），保留最大的使用次数
+        incoming: Dict[str, Dict] = {
+            tag_key(tag_data["name"]): tag_data for tag_data in merge_tags(tags)
+        }
 
-            if existing_tag:
+        # 一次查询出已存在的标签（名称过多时分批）；按比较键对应，
+        # 已存储的 "python" 与传入的 "Python" 视为同一个标签
+        existing: Dict[str, Tuple[int, int]] = {}
+        names = list({
+            value
+            for key, tag_data in incoming.items()
+            for value in (tag_data["name"], key)
+        })
+        for i in range(0, len(names), BULK_CHUNK_SIZE):
+            statement = select(TagCloud.id, TagCloud.name, TagCloud.count).where(
+                TagCloud.name.in_(names[i:i + BULK_CHUNK_SIZE])
+            )
+            for tag_id, name, count in self.session.exec(statement):
+                existing[tag_key(name)] = (tag_id, count)
+
+        new_rows = []
+        update_rows = []
+        for key, tag_data in incoming.items():
+            name = tag_data["name"]
+            category = tag_data.get("category", "general")
+            if key in existing:
                 # 更新现有标签
-                existing_tag.count = max(existing_tag.count, tag_data["count"])
-                existing_tag.size = self.determine_tag_size(existing_tag.count)
-                existing_tag.color = self.determine_tag_color(tag_data.get("category", "general"))
-                existing_tag.source = TagSource.AUTO
-                existing_tag.last_fetched_at = datetime.utcnow()
-                existing_tag.updated_at = datetime.utcnow()
-                updated_tags += 1
+                tag_id, current_count = existing[key]
+                count = max(current_count, tag_data["count"])
+                update_rows.append({
+                    "id": tag_id,
+                    "count": count,
+                    "size": self.determine_tag_size(count),
+                    "color": self.determine_tag_color(category),
+                    "source": TagSource.AUTO,
+                    "last_fetched_at": now,
+                    "updated_at": now
+                })
             else:
                 # 创建新标签
-                new_tag = TagCloud(
-                    name=tag_data["name"],
-                    count=tag_data["count"],
-                    size=self.determine_tag_size(tag_data["count"]),
-                    color=self.determine_tag_color(tag_data.get("category", "general")),
-                    category=tag_data.get("category", "general"),
-                    source=TagSource.AUTO,
-                    is_active=True,
-                    last_fetched_at=datetime.utcnow()
-                )
-                self.session.add(new_tag)
-                new_tags += 1
+                new_rows.append({
+                    "name": name,
+                    "count": tag_data["count"],
+                    "size": self.determine_tag_size(tag_data["count"]),
+                    "color": self.determine_tag_color(category),
+                    "category": category,
+                    "source": TagSource.AUTO,
+                    "is_active": True,
+                    "last_fetched_at": now,
+                    "created_at": now,
+                    "updated_at": now
+                })
+
+        if new_rows:
+            self.session.exec(insert(TagCloud.__table__), params=new_rows)
+        if update_rows:
+            self.bulk_update_tags(update_rows)
 
         self.session.commit()
-        return new_tags, updated_tags
+        return len(new_rows), len(update_rows)
 
     async def fetch_and_update_tags(self) -> Dict:
         """获取并更新标签云"""
@@ -503,22 +585,34 @@ class TagCloudService:
         error_message = None
 
         try:
-            logger.info("Starting AI-based tag fetch...")
+            logger.info("Starting multi-source tag fetch...")
+
+            # AI 与各热门来源并发获取
+            ai_tags, (trending_tags, errors) = await asyncio.gather(
+                self.fetch_tags_from_ai(),
+                self.fetch_trending_tags()
+            )
 
-            # 从AI获取标签
-            result = await self.fetch_tags_from_ai()
+            if ai_tags:
+                logger.info(f"AI generated {len(ai_tags)} tags")
+            else:
+                logger.warning("AI did not generate any tags")
+                errors["ai"] = "未生成标签"
 
+            # 各来源的大小写写法不同（GitHub "Python"、StackOverflow "python"），先合并
+            result = merge_tags(ai_tags + trending_tags)
             if result:
-                tags_count = len(result)
-                total_tags += tags_count
-                logger.info(f"AI generated {tags_count} tags")
+                total_tags += len(result)
 
-                new_count, updated_count = await self.update_tag_cloud(result, "ai", clear_existing=True)
+                new_count, updated_count = await self.update_tag_cloud(result, "multiple", clear_existing=True)
                 new_tags += new_count
                 updated_tags += updated_count
-                logger.info(f"AI tags: {new_count} new, {updated_count} updated")
-            else:
-                logger.warning("AI did not generate any tags")
+                logger.info(f"Fetched tags: {new_count} new, {updated_count} updated")
+
+            # 部分来源失败时记为部分成功，全部失败时记为失败
+            if errors:
+                status = FetchStatus.PARTIAL if result else FetchStatus.FAILED
+                error_message = "; ".join(f"{name}: {error}" for name, error in errors.items())
 
             # 记录获取历史
             history = TagCloudFetchHistory(
@@ -527,7 +621,8 @@ class TagCloudService:
                 total_tags=total_tags,
                 new_tags=new_tags,
                 updated_tags=updated_tags,
-                status=status
+                status=status,
+                error_message=error_message
             )
             self.session.add(history)
             self.session.commit()
@@ -536,6 +631,8 @@ class TagCloudService:
 
         except Exception as e:
             logger.error(f"Error in fetch_and_update_tags: {e}")
+            # 丢弃失败的写入，否则无法在同一会话中记录失败历史
+            self.session.rollback()
             status = FetchStatus.FAILED
             error_message = str(e)
 
@@ -639,13 +736,7 @@ class TagCloudService:
                 url = f"https://api.github.com/search/repositories?q={keyword}&sort=stars&order=desc&per_page=50"
                 headers = {"Accept": "application/vnd.github.v3+json"}
 
-                import ssl
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                async with aiohttp.ClientSession(connector=connector) as client_session:
+                async with http_session() as client_session:
                     async with client_session.get(url, headers=headers) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -672,13 +763,7 @@ class TagCloudService:
                 # 搜索Stack Overflow问题
                 url = f"https://api.stackexchange.com/2.3/questions?order=desc&sort=votes&tagged={keyword}&site=stackoverflow&pagesize=50"
 
-                import ssl
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                async with aiohttp.ClientSession(connector=connector) as client_session:
+                async with http_session() as client_session:
                     async with client_session.get(url) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -805,7 +890,6 @@ class TagCloudService:
             logger.info("开始清空所有标签数据...")
 
             # 删除所有标签
-            from sqlmodel import delete
             delete_stmt = delete(TagCloud)
             self.session.exec(delete_stmt)
 
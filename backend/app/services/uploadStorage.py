@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlmodel import Session
+
+from app.services import blobStore
+
+# 每次从上传文件读取的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+class StoredUpload:
+    """已保存的上传文件"""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+
+def size_limit_error(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"文件大小超过限制。最大允许: {max_size // (1024 * 1024)}MB"
+    )
+
+
+class _UploadWriter:
+    """把数据分块写入目标目录下的临时文件，同时计算哈希并检查大小
+
+    临时文件与目标文件在同一目录，完成后通过 os.replace 原子改名，
+    中途失败或超限时删除临时文件，不会留下半截文件。
+    """
+
+    def __init__(self, dest_dir: str, max_size: Optional[int]):
+        os.makedirs(dest_dir, exist_ok=True)
+        self.dest_dir = dest_dir
+        self.max_size = max_size
+        fd, self.tmp_path = tempfile.mkstemp(
+            prefix=".upload-", suffix=".part", dir=dest_dir
+        )
+        self.out = os.fdopen(fd, "wb")
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def check_size(self, size: int) -> None:
+        if self.max_size is not None and size > self.max_size:
+            raise size_limit_error(self.max_size)
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self.check_size(self.size)
+        self.hasher.update(chunk)
+        self.out.write(chunk)
+
+    def commit(self, filename: str) -> StoredUpload:
+        self.out.close()
+        dest_path = os.path.join(self.dest_dir, filename)
+        os.replace(self.tmp_path, dest_path)
+        return StoredUpload(dest_path, self.size, self.hasher.hexdigest())
+
+    def commit_blob(self, session: Session, extension: str) -> StoredUpload:
+        """按内容哈希保存到内容存储（相同内容只保留一份）"""
+        self.out.close()
+        sha256 = self.hasher.hexdigest()
+        blob = blobStore.put_file(
+            session, self.tmp_path, sha256, self.size, self.dest_dir, extension
+        )
+        return StoredUpload(blob.file_path, self.size, sha256)
+
+    def abort(self) -> None:
+        self.out.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+async def save_upload(
+    file: UploadFile,
+    dest_dir: str,
+    filename: str,
+    max_size: Optional[int] = None,
+) -> StoredUpload:
+    """分块保存上传文件（异步接口使用）
+
+    读取、哈希和写盘都在线程池中进行，不阻塞事件循环；
+    超过 max_size 时立即中止并返回 400。
+    """
+    if max_size is not None and file.size is not None and file.size > max_size:
+        raise size_limit_error(max_size)
+
+    writer = await asyncio.to_thread(_UploadWriter, dest_dir, max_size)
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(writer.write, chunk)
+        return await asyncio.to_thread(writer.commit, filename)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+
+
+def save_upload_sync(
+    file: UploadFile,
+    dest_dir: str,
+    filename: str,
+    max_size: Optional[int] = None,
+) -> StoredUpload:
+    """分块保存上传文件（同步接口使用，本身运行在线程池中）"""
+    if max_size is not None and file.size is not None and file.size > max_size:
+        raise size_limit_error(max_size)
+
+    writer = _UploadWriter(dest_dir, max_size)
+    try:
+        while True:
+            chunk = file.file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.commit(filename)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+async def save_upload_blob(
+    session: Session,
+    file: UploadFile,
+    dest_dir: str,
+    extension: str,
+    max_size: Optional[int] = None,
+) -> StoredUpload:
+    """分块保存上传文件到内容存储（异步接口使用）
+
+    文件以 ``<sha256><extension>`` 命名，相同内容复用已有文件并增加引用计数，
+    引用计数随 session 的事务提交。
+    """
+    if max_size is not None and file.size is not None and file.size > max_size:
+        raise size_limit_error(max_size)
+
+    writer = await asyncio.to_thread(_UploadWriter, dest_dir, max_size)
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(writer.write, chunk)
+        return await asyncio.to_thread(writer.commit_blob, session, extension)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+
+
+def save_upload_blob_sync(
+    session: Session,
+    file: UploadFile,
+    dest_dir: str,
+    extension: str,
+    max_size: Optional[int] = None,
+) -> StoredUpload:
+    """分块保存上传文件到内容存储（同步接口使用）"""
+    if max_size is not None and file.size is not None and file.size > max_size:
+        raise size_limit_error(max_size)
+
+    writer = _UploadWriter(dest_dir, max_size)
+    try:
+        while True:
+            chunk = file.file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.commit_blob(session, extension)
+    except BaseException:
+        writer.abort()
+        raise
@@ -0,0 +1,249 @@
+"""
+文章独立访客估算（HyperLogLog）
+
+每次浏览以 IP + User-Agent 的哈希作为访客指纹，记入该文章当天的
+HyperLogLog 草图（2^12 个寄存器，4KB，标准误差约 1.6%）。
+
+- 各进程先在内存中累积草图，由后台任务定期与数据库中的草图按寄存器取最大值合并，
+  合并是幂等且满足交换律的，多进程同时写回不会丢失访客
+- 每篇文章保存每天的草图和一份全部时间的汇总草图，汇总的估算值写入
+  post_stats.unique_visitors，文章列表随统计数据一起返回
+- 任意日期范围的独立访客数由范围内的每日草图合并后估算
+"""
+import hashlib
+import logging
+import math
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, tuple_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.post import Post
+from app.models.postStats import PostStats
+from app.models.postVisitorSketch import ALL_TIME_DAY, PostVisitorSketch
+from app.services.periodicTask import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# 寄存器数为 2^PRECISION；修改会使已保存的草图无法合并
+PRECISION = 12
+REGISTER_COUNT = 1 << PRECISION
+
+
+class HyperLogLog:
+    """HyperLogLog 基数估算（每个寄存器一个字节）"""
+
+    def __init__(self, registers: Optional[bytes] = None):
+        if registers is not None and len(registers) != REGISTER_COUNT:
+            raise ValueError("HyperLogLog 寄存器长度不匹配")
+        self.registers = bytearray(registers or REGISTER_COUNT)
+
+    @staticmethod
+    def hash(value: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+    def add_hash(self, hashed: int) -> None:
+        index = hashed >> (64 - PRECISION)
+        rest = hashed & ((1 << (64 - PRECISION)) - 1)
+        rank = (64 - PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value: str) -> None:
+        self.add_hash(self.hash(value))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """合并另一个草图（逐个寄存器取最大值）"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = REGISTER_COUNT
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # 小基数时使用线性计数
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+def visitor_fingerprint(user_ip: str, user_agent: Optional[str]) -> int:
+    return HyperLogLog.hash(f"{user_ip}\n{user_agent or ''}")
+
+
+class VisitorSketchBuffer:
+    """各进程内尚未写回数据库的访客草图"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sketches: Dict[Tuple[int, date], HyperLogLog] = defaultdict(HyperLogLog)
+
+    def add(self, post_id: int, user_ip: str, user_agent: Optional[str]) -> None:
+        hashed = visitor_fingerprint(user_ip, user_agent)
+        today = datetime.utcnow().date()
+        with self._lock:
+            self._sketches[(post_id, today)].add_hash(hashed)
+
+    def pending(self, post_id: int, days: Iterable[date]) -> HyperLogLog:
+        """本进程中某篇文章在这些日期内尚未写回的访客"""
+        result = HyperLogLog()
+        with self._lock:
+            for day in days:
+                sketch = self._sketches.get((post_id, day))
+                if sketch is not None:
+                    result.merge(sketch)
+        return result
+
+    def flush(self) -> int:
+        """与数据库中的草图合并写回，并更新汇总的独立访客数；返回涉及的文章数"""
+        with self._lock:
+            sketches = self._sketches
+            self._sketches = defaultdict(HyperLogLog)
+        if not sketches:
+            return 0
+
+        by_post: Dict[int, Dict[date, HyperLogLog]] = defaultdict(dict)
+        for (post_id, day), sketch in sketches.items():
+            by_post[post_id][day] = sketch
+
+        now = datetime.utcnow()
+        sketch_table = PostVisitorSketch.__table__
+        stats_table = PostStats.__table__
+        try:
+            with Session(engine) as session:
+                valid_ids = set(session.exec(
+                    select(Post.id).where(Post.id.in_(list(by_post)))
+                ).all())
+                merged: Dict[Tuple[int, date], HyperLogLog] = {}
+                for post_id in sorted(valid_ids):
+                    days = by_post[post_id]
+                    total = HyperLogLog()
+                    for day, sketch in days.items():
+                        total.merge(sketch)
+                        merged[(post_id, day)] = sketch
+                    merged[(post_id, ALL_TIME_DAY)] = total
+
+                # 一次查询锁定所有涉及的草图行（按主键顺序加锁，避免死锁）
+                stored = {
+                    (post_id, day): registers
+                    for post_id, day, registers in session.exec(
+                        select(
+                            sketch_table.c.post_id,
+                            sketch_table.c.day,
+                            sketch_table.c.registers,
+                        )
+                        .where(
+                            tuple_(sketch_table.c.post_id, sketch_table.c.day)
+                            .in_(list(merged))
+                        )
+                        .order_by(sketch_table.c.post_id, sketch_table.c.day)
+                        .with_for_update()
+                    ).all()
+                } if merged else {}
+
+                update_rows = []
+                insert_rows = []
+                for (post_id, day), sketch in merged.items():
+                    registers = stored.get((post_id, day))
+                    if registers is None:
+                        insert_rows.append({
+                            "post_id": post_id, "day": day,
+                            "registers": sketch.to_bytes(), "updated_at": now,
+                        })
+                    else:
+                        sketch.merge(HyperLogLog(registers))
+                        update_rows.append({
+                            "b_post_id": post_id, "b_day": day,
+                            "b_registers": sketch.to_bytes(), "b_updated_at": now,
+                        })
+
+                if update_rows:
+                    session.exec(
+                        update(sketch_table)
+                        .where(
+                            sketch_table.c.post_id == bindparam("b_post_id"),
+                            sketch_table.c.day == bindparam("b_day"),
+                        )
+                        .values(
+                            registers=bindparam("b_registers"),
+                            updated_at=bindparam("b_updated_at"),
+                        ),
+                        params=update_rows,
+                    )
+                if insert_rows:
+                    session.exec(insert(sketch_table), params=insert_rows)
+
+                # 全部时间草图的估算值批量写入统计行
+                visitor_rows = [
+                    {"b_post_id": post_id, "b_unique_visitors": sketch.count()}
+                    for (post_id, day), sketch in merged.items()
+                    if day == ALL_TIME_DAY
+                ]
+                if visitor_rows:
+                    session.exec(
+                        update(stats_table)
+                        .where(stats_table.c.post_id == bindparam("b_post_id"))
+                        .values(unique_visitors=bindparam("b_unique_visitors")),
+                        params=visitor_rows,
+                    )
+                session.commit()
+        except Exception as e:
+            logger.error(f"写回访客草图失败: {e}")
+            with self._lock:
+                for key, sketch in sketches.items():
+                    self._sketches[key].merge(sketch)
+            return 0
+        return len(valid_ids)
+
+
+def count_unique_visitors(
+    session: Session, post_id: int, start: date, end: date
+) -> int:
+    """合并 [start, end] 内的每日草图（包括本进程尚未写回的部分）估算独立访客数"""
+    sketch = HyperLogLog()
+    for registers in session.exec(
+        select(PostVisitorSketch.registers).where(
+            PostVisitorSketch.post_id == post_id,
+            PostVisitorSketch.day >= start,
+            PostVisitorSketch.day <= end,
+            PostVisitorSketch.day != ALL_TIME_DAY,
+        )
+    ).all():
+        sketch.merge(HyperLogLog(registers))
+    days = [
+        date.fromordinal(ordinal)
+        for ordinal in range(start.toordinal(), end.toordinal() + 1)
+    ]
+    sketch.merge(visitor_buffer.pending(post_id, days))
+    return sketch.count()
+
+
+# 全局访客草图缓冲实例
+visitor_buffer = VisitorSketchBuffer()
+
+_flusher = PeriodicTask(
+    "Visitor sketch flusher",
+    visitor_buffer.flush,
+    settings.visitor_sketch_flush_interval,
+    on_stop=visitor_buffer.flush,
+)
+
+
+def start_visitor_sketch_flusher() -> None:
+    """启动访客草图的定时写回任务（在应用启动时调用）"""
+    _flusher.start()
+
+
+async def stop_visitor_sketch_flusher() -> None:
+    """停止定时写回并写回剩余草图（在应用关闭时调用）"""
+    await _flusher.stop()
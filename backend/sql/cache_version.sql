@@ -0,0 +1,7 @@
+-- 创建缓存版本表，修改被缓存的数据时递增版本号，通知所有 worker 刷新内存缓存
+CREATE TABLE IF NOT EXISTS `cache_version` (
+  `name` varchar(64) NOT NULL COMMENT '缓存名称',
+  `version` int NOT NULL DEFAULT 0 COMMENT '版本号',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='缓存版本表';
@@ -0,0 +1,11 @@
+-- 创建文件内容存储表：按 SHA-256 去重存放上传文件，引用计数归零时才删除磁盘文件
+CREATE TABLE IF NOT EXISTS `file_blob` (
+  `sha256` char(64) NOT NULL COMMENT '文件内容的SHA-256',
+  `file_path` varchar(500) NOT NULL COMMENT '文件存储路径',
+  `file_size` bigint NOT NULL COMMENT '文件大小（字节）',
+  `ref_count` int NOT NULL DEFAULT 0 COMMENT '引用计数',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`sha256`),
+  KEY `idx_file_path` (`file_path`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='文件内容存储表';
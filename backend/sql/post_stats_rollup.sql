@@ -0,0 +1,32 @@
+-- 创建文章统计汇总表：由统计事件日志按小时、按天聚合，供后台图表按时间范围查询
+-- stats_event_segment 记录已汇总的日志分段，与汇总结果在同一事务中写入，重复处理同一分段时跳过
+
+CREATE TABLE IF NOT EXISTS `post_stats_hourly` (
+  `post_id` int NOT NULL COMMENT '文章ID',
+  `hour` datetime NOT NULL COMMENT '小时（UTC，整点）',
+  `view_count` int NOT NULL DEFAULT '0' COMMENT '观看次数',
+  `like_count` int NOT NULL DEFAULT '0' COMMENT '点赞次数（扣除取消点赞）',
+  `share_count` int NOT NULL DEFAULT '0' COMMENT '分享次数',
+  `comment_count` int NOT NULL DEFAULT '0' COMMENT '评论次数',
+  PRIMARY KEY (`post_id`, `hour`),
+  CONSTRAINT `fk_post_stats_hourly_post_id` FOREIGN KEY (`post_id`) REFERENCES `post` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='文章每小时统计';
+
+CREATE TABLE IF NOT EXISTS `post_stats_daily` (
+  `post_id` int NOT NULL COMMENT '文章ID',
+  `day` date NOT NULL COMMENT '日期（UTC）',
+  `view_count` int NOT NULL DEFAULT '0' COMMENT '观看次数',
+  `like_count` int NOT NULL DEFAULT '0' COMMENT '点赞次数（扣除取消点赞）',
+  `share_count` int NOT NULL DEFAULT '0' COMMENT '分享次数',
+  `comment_count` int NOT NULL DEFAULT '0' COMMENT '评论次数',
+  PRIMARY KEY (`post_id`, `day`),
+  KEY `idx_day` (`day`),
+  CONSTRAINT `fk_post_stats_daily_post_id` FOREIGN KEY (`post_id`) REFERENCES `post` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='文章每日统计';
+
+CREATE TABLE IF NOT EXISTS `stats_event_segment` (
+  `name` varchar(255) NOT NULL COMMENT '分段文件名',
+  `event_count` int NOT NULL DEFAULT '0' COMMENT '事件数',
+  `processed_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='已汇总的统计事件日志分段';
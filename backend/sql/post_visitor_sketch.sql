@@ -0,0 +1,10 @@
+-- 创建文章访客估算表：每篇文章每天一个 HyperLogLog 草图（IP + User-Agent 指纹），
+-- 多天的草图可以合并得到一周、一个月的独立访客数；day 为 1970-01-01 的行是全部时间的汇总
+CREATE TABLE IF NOT EXISTS `post_visitor_sketch` (
+  `post_id` int NOT NULL COMMENT '文章ID',
+  `day` date NOT NULL COMMENT '日期（UTC），1970-01-01 表示全部时间',
+  `registers` blob NOT NULL COMMENT 'HyperLogLog 寄存器',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`post_id`, `day`),
+  CONSTRAINT `fk_post_visitor_sketch_post_id` FOREIGN KEY (`post_id`) REFERENCES `post` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='文章访客估算表';
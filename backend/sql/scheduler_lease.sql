@@ -0,0 +1,8 @@
+-- 创建定时任务租约表，多个 worker 通过租约选出唯一执行定时任务的进程
+CREATE TABLE IF NOT EXISTS `scheduler_lease` (
+  `name` varchar(64) NOT NULL COMMENT '租约名称',
+  `owner` varchar(128) NOT NULL COMMENT '持有者标识（主机:进程号:随机串）',
+  `expires_at` datetime NOT NULL COMMENT '租约过期时间',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最近续约时间',
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='定时任务租约表';
@@ -0,0 +1,19 @@
+-- 创建断点续传会话表，记录分块上传的进度和完成后要创建的记录信息
+CREATE TABLE IF NOT EXISTS `upload_session` (
+  `id` varchar(32) NOT NULL COMMENT '上传会话ID',
+  `purpose` varchar(20) NOT NULL COMMENT '用途：music / attachment',
+  `filename` varchar(255) NOT NULL COMMENT '原始文件名',
+  `content_type` varchar(100) DEFAULT NULL COMMENT 'MIME类型',
+  `total_size` bigint NOT NULL COMMENT '文件总大小（字节）',
+  `received_size` bigint NOT NULL DEFAULT 0 COMMENT '已接收的连续字节数',
+  `sha256` varchar(64) DEFAULT NULL COMMENT '整个文件的SHA-256（可选，完成时校验）',
+  `form_data` text COMMENT '完成时创建记录使用的表单数据（JSON）',
+  `status` varchar(20) NOT NULL DEFAULT 'uploading' COMMENT '状态：uploading / completed',
+  `result_id` int DEFAULT NULL COMMENT '完成后创建的附件或音乐ID',
+  `uploaded_by` int NOT NULL COMMENT '上传者ID',
+  `expires_at` datetime NOT NULL COMMENT '过期时间，过期未完成的会话会被清理',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_status_expires` (`status`, `expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='断点续传会话表';
@@ -0,0 +1,6 @@
+-- 为 music_track 表添加码率和采样率字段，由上传时解析的音频元数据填充
+-- 这个脚本用于更新现有的数据库表结构
+-- 已有曲目可执行 python -m app.scripts.backfill_music_metadata 补全时长、码率等信息
+
+ALTER TABLE music_track ADD COLUMN bitrate INT DEFAULT NULL COMMENT '码率(kbps)' AFTER duration;
+ALTER TABLE music_track ADD COLUMN sample_rate INT DEFAULT NULL COMMENT '采样率(Hz)' AFTER bitrate;
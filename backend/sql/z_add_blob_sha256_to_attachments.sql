@@ -0,0 +1,5 @@
+-- 为 attachments 表添加 blob_sha256 字段，指向 file_blob 中去重存储的文件
+-- 这个脚本用于更新现有的数据库表结构，旧记录为空，删除时仍直接删除文件
+
+ALTER TABLE attachments ADD COLUMN blob_sha256 CHAR(64) DEFAULT NULL COMMENT '文件内容SHA-256';
+ALTER TABLE attachments ADD INDEX idx_blob_sha256 (blob_sha256);
@@ -0,0 +1,4 @@
+-- 为 attachments 表的 file_url 添加索引，下载次数按访问地址批量写回
+-- 这个脚本用于更新现有的数据库表结构
+
+ALTER TABLE attachments ADD INDEX idx_file_url (file_url(191));
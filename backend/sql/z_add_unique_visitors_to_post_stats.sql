@@ -0,0 +1,4 @@
+-- 为 post_stats 表添加独立访客数字段，由 post_visitor_sketch 的汇总草图估算后写入
+-- 这个脚本用于更新现有的数据库表结构（需先执行 post_visitor_sketch.sql）
+
+ALTER TABLE post_stats ADD COLUMN unique_visitors INT NOT NULL DEFAULT 0 COMMENT '独立访客数（估算）' AFTER comment_count;
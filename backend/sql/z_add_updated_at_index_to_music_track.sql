@@ -0,0 +1,4 @@
+-- 为 music_track 表的 updated_at 添加索引，搜索索引按修改时间增量同步曲目
+-- 这个脚本用于更新现有的数据库表结构
+
+ALTER TABLE music_track ADD INDEX idx_updated_at (updated_at);
@@ -0,0 +1,31 @@
+-- 文章统计行改为与文章一起创建，计数修改都是单条原子 UPDATE
+-- 这个脚本用于更新现有的数据库：合并重复的统计行、补齐缺失的统计行，并确保 post_id 唯一
+
+-- 1. 合并同一篇文章的重复统计行（保留 id 最小的一行，计数相加）
+UPDATE post_stats keep
+JOIN (
+  SELECT post_id, MIN(id) AS keep_id,
+         SUM(view_count) AS view_count, SUM(like_count) AS like_count,
+         SUM(share_count) AS share_count, SUM(comment_count) AS comment_count
+  FROM post_stats
+  GROUP BY post_id
+  HAVING COUNT(*) > 1
+) dup ON keep.id = dup.keep_id
+SET keep.view_count = dup.view_count,
+    keep.like_count = dup.like_count,
+    keep.share_count = dup.share_count,
+    keep.comment_count = dup.comment_count;
+
+DELETE extra FROM post_stats extra
+JOIN post_stats keep ON keep.post_id = extra.post_id AND keep.id < extra.id;
+
+-- 2. post_id 唯一（post_stats.sql 建表时已有 UNIQUE KEY `post_id`；
+--    SHOW INDEX FROM post_stats WHERE Key_name = 'post_id' 没有结果时才需要执行）
+-- ALTER TABLE post_stats ADD UNIQUE KEY `post_id` (`post_id`);
+
+-- 3. 为还没有统计行的文章补齐统计行
+INSERT INTO post_stats (post_id, view_count, like_count, share_count, comment_count, created_at, updated_at)
+SELECT p.id, 0, 0, 0, 0, UTC_TIMESTAMP(), UTC_TIMESTAMP()
+FROM post p
+LEFT JOIN post_stats ps ON ps.post_id = p.id
+WHERE ps.id IS NULL;
@@ -0,0 +1,13 @@
+-- playlist_track.position 改为带间隔的排名：插入、移动和移除只修改一行
+-- 这个脚本用于更新现有的数据库表结构（需要 MySQL 8.0 以上）
+
+-- 按现有顺序（position, id）把排名重写为 1024 的倍数
+UPDATE playlist_track pt
+JOIN (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position, id) AS rn
+  FROM playlist_track
+) ranked ON pt.id = ranked.id
+SET pt.position = ranked.rn * 1024;
+
+-- 按播放列表取排名区间和最大排名
+ALTER TABLE playlist_track ADD INDEX idx_playlist_position (playlist_id, position);
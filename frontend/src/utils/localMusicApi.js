@@ -34,6 +34,17 @@ class LocalMusicApiService {
     }
   }
 
+  // 按前缀补全音乐（标题、艺术家、专辑，支持拼音）
+  async suggestMusic(q, limit = 20) {
+    try {
+      const response = await get(`${this.baseURL}/search/suggest`, { q, limit });
+      return response;
+    } catch (error) {
+      console.error('补全音乐失败:', error);
+      throw error;
+    }
+  }
+
   // 获取音乐详情
   async getMusicDetail(musicId) {
     try {
@@ -188,6 +199,17 @@ class LocalMusicApiService {
     }
   }
 
+  // 获取播放器启动数据（公开播放列表和自动播放设置，未变化时浏览器按 ETag 复用缓存）
+  async getPlayerManifest() {
+    try {
+      const response = await get(`${this.baseURL}/settings/player-manifest`);
+      return response;
+    } catch (error) {
+      console.error('获取播放器启动数据失败:', error);
+      throw error;
+    }
+  }
+
   // 获取公开播放列表（用于博客首页）
   async getPublicPlaylist() {
     try {